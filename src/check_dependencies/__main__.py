@@ -2,42 +2,262 @@
 
 from __future__ import annotations
 
+import contextlib
 import logging
+import os
 import sys
 from typing import TYPE_CHECKING
 
-from check_dependencies.app_config import AppConfig
-from check_dependencies.main import yield_outputs
+from check_dependencies import daemon, distributed, git_rev, lsp, shard, watch
+from check_dependencies.app_config import LOG_FORMAT, AppConfig
+from check_dependencies.main import limit_findings, yield_outputs
+from check_dependencies.output_stream import open_output
+from check_dependencies.provides import mappings_for_env
+from check_dependencies.stats import Statistics
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Callable, Iterable, Iterator, Sequence
 
-_logger = logging.getLogger("check_dependencies.__main__")
+    from check_dependencies.cache import Cache
+    from check_dependencies.outputs import Output
 
+    WriterT = Callable[[Iterable[str]], None]
 
-def _writer(lines: Iterable[str]) -> None:
-    for line in lines:
-        sys.stdout.write(line)
-        sys.stdout.write("\n")
+_logger = logging.getLogger("check_dependencies.__main__")
 
 
 def main() -> int:
     """CLI entry point for check_dependencies."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(filename)s: "
-        "%(levelname)-8s: "
-        "%(funcName)s(): "
-        "%(lineno)d:\t"
-        "%(message)s",
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    try:
+        return _main(sys.argv[1:])
+    except BrokenPipeError:
+        # The reader closed stdout, e.g. `check-dependencies ... | head`. Point
+        # stdout to devnull, so the flush at exit does not fail again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+def _main(
+    argv: Sequence[str], *, writer: WriterT | None = None, cache: Cache | None = None
+) -> int:
+    """Run a single check, in this process or in the daemon.
+
+    :param argv: Command line arguments, without the program name.
+    :param writer: Write the output lines, defaults to a buffered stdout (or the
+        ``--output`` file of a check).
+    :param cache: Warm state of the daemon, None for a cold run.
+    """
+    if cache is not None and argv[:1] in (["daemon"], ["lsp"], ["worker"]):
+        sys.stderr.write(f"{argv[0]} cannot be run by the daemon\n")
+        return 2
+    if argv[:1] == ["daemon"]:
+        with _open_writer(writer) as writer_:
+            return daemon.main(argv[1:], runner=_main, writer=writer_)
+    if argv[:1] == ["lsp"]:
+        return lsp.main(argv[1:])
+    if argv[:1] == ["merge"]:
+        with _open_writer(writer) as writer_:
+            return _merge(argv[1:], writer_)
+    if argv[:1] == ["worker"]:
+        return _worker(argv[1:])
+    return _check(argv, writer, cache)
+
+
+def _open_writer(
+    writer: WriterT | None, app_cfg: AppConfig | None = None
+) -> contextlib.AbstractContextManager[WriterT]:
+    """Use the given writer, or write to stdout or the ``--output`` file.
+
+    The ``--output`` file of a check replaces the given writer, e.g. the daemon
+    writes it instead of forwarding the lines.
+    """
+    if app_cfg is None:
+        app_cfg = AppConfig(file_names=[])
+    if writer is not None and app_cfg.output is None:
+        return contextlib.nullcontext(writer)
+    return open_output(
+        app_cfg.output,
+        buffer_size=app_cfg.output_buffer_size,
+        flush=app_cfg.flush,
     )
-    app_cfg = AppConfig.from_argv()
-    formatter = app_cfg.mk_formatter()
-    outputs = yield_outputs(app_cfg)
+
+
+def _check(argv: Sequence[str], writer: WriterT | None, cache: Cache | None) -> int:
+    """Check the files given on the command line."""
+    app_cfg = AppConfig.from_argv(
+        argv, env_mappings=cache.env_mappings if cache else mappings_for_env
+    )
+    if cache is not None and (app_cfg.watch or app_cfg.coordinator):
+        sys.stderr.write("--watch and --coordinator cannot be run by the daemon\n")
+        return 2
+    single_run_options = [
+        option
+        for option, value in (
+            ("--report", app_cfg.reports),
+            ("--max-findings/--fail-fast", app_cfg.max_findings is not None),
+            ("--stats", app_cfg.stats),
+            ("--rev", app_cfg.rev),
+        )
+        if value
+    ]
+    if single_run_options and (app_cfg.watch or app_cfg.shard):
+        options = ", ".join(single_run_options)
+        sys.stderr.write(f"{options} cannot be combined with --watch or --shard\n")
+        return 2
+    if app_cfg.changed_first and app_cfg.shard:
+        sys.stderr.write("--changed-first cannot be combined with --shard\n")
+        return 2
+    if app_cfg.rev and app_cfg.coordinator:
+        sys.stderr.write("--rev cannot be combined with --coordinator\n")
+        return 2
+    try:
+        with (
+            _open_writer(writer, app_cfg) as writer_,
+            _open_reports(app_cfg, writer, writer_) as reports,
+        ):
+            return _run_check(app_cfg, writer_, reports, cache)
+    except (distributed.NoWorkerError, git_rev.GitError) as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 2
+
+
+@contextlib.contextmanager
+def _open_reports(
+    app_cfg: AppConfig, writer: WriterT | None, main_writer: WriterT
+) -> Iterator[list[tuple[AppConfig, WriterT]]]:
+    """Open the writers of the ``--report`` options, see `_open_writer`.
+
+    Reports to the same file (or stdout) as the main output share its writer.
+    """
+    writers = {app_cfg.output: main_writer}
+    reports = []
+    with contextlib.ExitStack() as stack:
+        for report_cfg in app_cfg.report_configs():
+            if report_cfg.output not in writers:
+                writers[report_cfg.output] = stack.enter_context(
+                    _open_writer(writer, report_cfg)
+                )
+            reports.append((report_cfg, writers[report_cfg.output]))
+        yield reports
+
+
+def _run_check(
+    app_cfg: AppConfig,
+    writer: WriterT,
+    reports: Sequence[tuple[AppConfig, WriterT]],
+    cache: Cache | None,
+) -> int:
+    if app_cfg.shard:
+        # The exit code of a sharded run is reported by the merge.
+        writer([shard.dumps(shard.partial_result(app_cfg, app_cfg.shard))])
+        return 0
+    if app_cfg.watch:
+        return _watch(app_cfg, writer)
+    kinds = app_cfg.output_kinds
+    stats = Statistics() if app_cfg.stats else None
+    with contextlib.ExitStack() as stack:
+        if app_cfg.coordinator:
+            outputs = distributed.coordinate_outputs(
+                app_cfg, app_cfg.coordinator, kinds=kinds, stats=stats
+            )
+        elif app_cfg.rev:
+            revision = git_rev.GitRevision(app_cfg.rev)
+            stack.callback(revision.close)
+            outputs = git_rev.revision_outputs(
+                app_cfg, revision, kinds=kinds, stats=stats
+            )
+        elif cache is None:
+            outputs = yield_outputs(app_cfg, kinds=kinds, stats=stats)
+        else:
+            outputs = yield_outputs(app_cfg, cache, kinds=kinds, stats=stats)
+        exit_code = _write_outputs(
+            app_cfg, limit_findings(outputs, app_cfg.max_findings), writer, reports
+        )
+    if stats is not None:
+        _write_stats(app_cfg, stats)
+    return exit_code
+
+
+def _write_stats(app_cfg: AppConfig, stats: Statistics) -> None:
+    """Write the statistics to the ``--stats-file``, or to stderr."""
+    if app_cfg.stats_file is None:
+        sys.stderr.writelines(f"{line}\n" for line in stats.to_text())
+        return
+    with open_output(app_cfg.stats_file) as writer:
+        writer(stats.to_text())
+
+
+def _merge(argv: Sequence[str], writer: WriterT) -> int:
+    """Merge the partial results of a sharded run."""
+    args = shard.merge_arg_parser().parse_args(argv)
+    try:
+        partials = [shard.load(path) for path in args.partial]
+        app_cfg = shard.load_partials(
+            partials,
+            verbose=args.verbose,
+            output_format=args.output_format,
+            reports=args.report,
+        )
+        outputs = shard.merge_outputs(app_cfg, partials)
+    except ValueError as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 1
+    with _open_reports(app_cfg, writer, writer) as reports:
+        return _write_outputs(app_cfg, outputs, writer, reports)
+
+
+def _watch(app_cfg: AppConfig, writer: WriterT) -> int:
+    """Print outputs for every change until interrupted."""
+    exit_code = 0
+    flush = getattr(writer, "flush", None)  # Buffered unless a writer was given
+    try:
+        for outputs in watch.watch_outputs(app_cfg, app_cfg.watch_interval):
+            exit_code = _write_outputs(app_cfg, outputs, writer)
+            if flush is not None:
+                flush()
+    except KeyboardInterrupt:
+        pass
+    return exit_code
+
+
+def _worker(argv: Sequence[str]) -> int:
+    """Scan files for a coordinator."""
+    args = distributed.worker_arg_parser().parse_args(argv)
+    try:
+        n_files = distributed.run_worker(
+            args.coordinator, connect_timeout=args.connect_timeout
+        )
+    except OSError as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 1
+    _logger.info("Processed %d files", n_files)
+    return 0
+
+
+def _write_outputs(
+    app_cfg: AppConfig,
+    outputs: Iterable[Output],
+    writer: WriterT,
+    reports: Sequence[tuple[AppConfig, WriterT]] = (),
+) -> int:
+    """Format and write the outputs of a single scan, return the exit code.
+
+    :param reports: Config and writer of every ``--report``, each report has its
+        own formatter (and state, like the outputs seen so far).
+    """
+    sinks = [
+        (*cfg.mk_report(), writer_) for cfg, writer_ in [(app_cfg, writer), *reports]
+    ]
+    for _, start, _, writer_ in sinks:
+        writer_(start)
     exit_code = 0
     for output in outputs:
-        _writer(formatter(output))
+        for formatter, _, _, writer_ in sinks:
+            writer_(formatter(output))
         exit_code |= output.exit_code
+    for _, _, end, writer_ in sinks:
+        writer_(end)
     return exit_code
 
 
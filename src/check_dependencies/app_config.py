@@ -4,15 +4,25 @@ from __future__ import annotations
 
 import argparse
 import enum
+import functools
+import itertools
+import os
 import textwrap
-from dataclasses import dataclass, field
+import zlib
+from dataclasses import asdict, dataclass, field, replace
 from importlib.metadata import PackageNotFoundError, version
 from itertools import chain
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, TypeVar
 
 from check_dependencies.builtin_module import BUILTINS
+from check_dependencies.github_annotations import (
+    DEFAULT_MAX_ANNOTATIONS,
+    DEFAULT_MAX_FILE_ANNOTATIONS,
+    GithubAnnotations,
+)
 from check_dependencies.lib import Module, Package, Packages
+from check_dependencies.outputs import module_output_kinds, sarif_log
 from check_dependencies.provides import mappings_for_env
 from check_dependencies.pyproject_toml import ConfigToml, PyProjectToml
 
@@ -20,16 +30,21 @@ if TYPE_CHECKING:
     from collections.abc import (
         Callable,
         Collection,
+        Hashable,
         Iterable,
         Iterator,
         Mapping,
         Sequence,
     )
 
-    from check_dependencies.outputs import Output, SeenT
+    from check_dependencies.outputs import Output, SeenT, WithModule
 
 _T = TypeVar("_T")
+_H = TypeVar("_H", Module, Package)
 _DIST_NAME = "check-dependencies"
+_SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+DEFAULT_OUTPUT_BUFFER_SIZE = 64 * 1024
+LOG_FORMAT = "%(filename)s: %(levelname)-8s: %(funcName)s(): %(lineno)d:\t%(message)s"
 
 
 class OutputFormat(enum.Enum):
@@ -38,6 +53,141 @@ class OutputFormat(enum.Enum):
     GITHUB = "github"
     FULL = "full"
     CONCISE = "concise"
+    JSONL = "jsonl"
+    SARIF = "sarif"
+
+
+class FlushPolicy(enum.Enum):
+    """When buffered output lines are written."""
+
+    AUTO = "auto"
+    """``output`` on a terminal, else ``buffer``."""
+    OUTPUT = "output"
+    """After the lines of every output."""
+    BUFFER = "buffer"
+    """When the buffer is full and at the end."""
+
+
+class Parser(enum.Enum):
+    """Engine to find the imports of a source file."""
+
+    AST = "ast"
+    FAST = "fast"
+
+
+@dataclass(frozen=True)
+class ReadOptions:
+    """How the source files are read and how their imports are found."""
+
+    parser: Parser = Parser.AST
+    large_file_size: int = 8 * 1024**2
+    """Files above this size (bytes) are memory-mapped and only scanned."""
+    max_file_size: int | None = None
+    """Files above this size (bytes) are reported without reading them."""
+    large_file_timeout: float = 10.0
+    """Seconds to scan a large file for."""
+    parse_timeout: float | None = None
+    """Seconds to read a file for in an isolated process."""
+    parse_memory: int | None = None
+    """Memory limit (bytes) of the isolated process."""
+
+    @property
+    def isolated(self) -> bool:
+        """Whether files are read in an isolated process."""
+        return self.parse_timeout is not None or self.parse_memory is not None
+
+    def to_json(self) -> dict[str, Any]:
+        """Get the options in a JSON-serializable form, see `from_json`."""
+        return {**asdict(self), "parser": self.parser.value}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> ReadOptions:
+        """Get the options from their JSON-serializable form."""
+        return cls(**{**data, "parser": Parser(data["parser"])})
+
+
+DEFAULT_READ_OPTIONS = ReadOptions()
+
+
+@dataclass(frozen=True, order=True)
+class Shard:
+    """One of ``count`` deterministic partitions of the discovered source files."""
+
+    index: int
+    count: int
+
+    def __post_init__(self) -> None:
+        """Validate the shard bounds."""
+        if not 1 <= self.index <= self.count:
+            msg = f"Shard index must be between 1 and {self.count}, got {self.index}"
+            raise ValueError(msg)
+
+    @classmethod
+    def parse(cls, value: str) -> Shard:
+        """Parse a shard specification of the form ``I/N`` (1-based)."""
+        index, sep, count = value.partition("/")
+        if not sep:
+            msg = f"Expected shard as I/N, got {value!r}"
+            raise ValueError(msg)
+        return cls(int(index), int(count))
+
+    def __str__(self) -> str:
+        """Get the ``I/N`` representation of the shard."""
+        return f"{self.index}/{self.count}"
+
+    def includes(self, path: Path) -> bool:
+        """Check if a source file belongs to this shard.
+
+        The partition only depends on the path, so it is stable across machines and
+        runs as long as the same file names are passed on the command line.
+        """
+        return zlib.crc32(path.as_posix().encode()) % self.count == self.index - 1
+
+
+@dataclass(frozen=True)
+class Address:
+    """TCP address of a coordinator for distributed scanning."""
+
+    host: str
+    port: int
+
+    @classmethod
+    def parse(cls, value: str) -> Address:
+        """Parse an address of the form ``HOST:PORT``."""
+        host, sep, port = value.rpartition(":")
+        if not sep:
+            msg = f"Expected address as HOST:PORT, got {value!r}"
+            raise ValueError(msg)
+        return cls(host or "localhost", int(port))
+
+    def __str__(self) -> str:
+        """Get the ``HOST:PORT`` representation of the address."""
+        return f"{self.host}:{self.port}"
+
+
+@dataclass(frozen=True)
+class Report:
+    """Additional output of a check in another format, see ``--report``."""
+
+    output_format: OutputFormat
+    path: Path | None = None
+    """File to write the report to, None for stdout."""
+
+    @classmethod
+    def parse(cls, value: str) -> Report:
+        """Parse a report specification of the form ``FORMAT[:PATH]``."""
+        output_format, sep, path = value.partition(":")
+        try:
+            return cls(OutputFormat(output_format), Path(path) if sep else None)
+        except ValueError:
+            choices = ", ".join(fmt.value for fmt in OutputFormat)
+            msg = f"Expected report as FORMAT[:PATH] with FORMAT one of {choices}"
+            raise ValueError(msg) from None
+
+    def __str__(self) -> str:
+        """Get the ``FORMAT[:PATH]`` representation of the report."""
+        fmt = self.output_format.value
+        return fmt if self.path is None else f"{fmt}:{self.path}"
 
 
 @dataclass(frozen=True)
@@ -51,6 +201,45 @@ class AppConfig:
     include_dev: bool = False
     verbose: bool = False
     output_format: OutputFormat = OutputFormat.CONCISE
+    shard: Shard | None = None
+    coordinator: Address | None = None
+    worker_timeout: float = 60.0
+    worker_connect_timeout: float = 300.0
+    watch: bool = False
+    watch_interval: float = 0.5
+    parser: Parser = Parser.AST
+    large_file_size: int = ReadOptions.large_file_size
+    max_file_size: int | None = None
+    large_file_timeout: float = ReadOptions.large_file_timeout
+    parse_timeout: float | None = None
+    parse_memory: int | None = None
+    output: Path | None = None
+    output_buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE
+    flush: FlushPolicy = FlushPolicy.AUTO
+    reports: Sequence[Report] = ()
+    max_findings: int | None = None
+    changed_first: bool = False
+    stats: bool = False
+    stats_file: Path | None = None
+    """File to write the import statistics to instead of stderr."""
+    max_annotations: int = DEFAULT_MAX_ANNOTATIONS
+    max_file_annotations: int = DEFAULT_MAX_FILE_ANNOTATIONS
+    step_summary: Path | None = None
+    """Markdown file to append the summary of the ``github`` format to."""
+    rev: str | None = None
+    """Git revision to read the files and configs from instead of the working tree."""
+
+    @property
+    def read_options(self) -> ReadOptions:
+        """Get the options to read the source files with."""
+        return ReadOptions(
+            parser=self.parser,
+            large_file_size=self.large_file_size,
+            max_file_size=self.max_file_size,
+            large_file_timeout=self.large_file_timeout,
+            parse_timeout=self.parse_timeout,
+            parse_memory=self.parse_memory,
+        )
 
     @classmethod
     def from_cli_args(  # noqa: PLR0913
@@ -65,8 +254,39 @@ class AppConfig:
         includes: Sequence[Path] = (),
         provides_from_venv: Path | None = None,
         output_format: OutputFormat = OutputFormat.CONCISE,
+        env_mappings: Callable[[Path | None], Iterable[tuple[str, str]]] = (
+            mappings_for_env
+        ),
+        shard: Shard | None = None,
+        coordinator: Address | None = None,
+        worker_timeout: float = 60.0,
+        worker_connect_timeout: float = 300.0,
+        watch: bool = False,
+        watch_interval: float = 0.5,
+        parser: Parser = Parser.AST,
+        large_file_size: int = ReadOptions.large_file_size,
+        max_file_size: int | None = None,
+        large_file_timeout: float = ReadOptions.large_file_timeout,
+        parse_timeout: float | None = None,
+        parse_memory: int | None = None,
+        output: Path | None = None,
+        output_buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE,
+        flush: FlushPolicy = FlushPolicy.AUTO,
+        reports: Sequence[Report] = (),
+        max_findings: int | None = None,
+        changed_first: bool = False,
+        stats: bool = False,
+        stats_file: Path | None = None,
+        max_annotations: int = DEFAULT_MAX_ANNOTATIONS,
+        max_file_annotations: int = DEFAULT_MAX_FILE_ANNOTATIONS,
+        step_summary: Path | None = None,
+        rev: str | None = None,
     ) -> AppConfig:
-        """Construct an AppConfig from CLI arguments."""
+        """Construct an AppConfig from CLI arguments.
+
+        :param env_mappings: Get the (package, module) mappings of the environment
+            given by `provides_from_venv`, e.g. to use cached mappings.
+        """
         includes_cfg = [ConfigToml.for_path(incl) for incl in includes]
 
         def chained(
@@ -96,16 +316,47 @@ class AppConfig:
                 known_packages=(),
                 packages=chained(
                     (inc.provides for inc in includes_cfg),
-                    _get_provides(provides, provides_from_venv),
+                    _get_provides(provides, env_mappings(provides_from_venv)),
                 ),
             ),
             include_dev=include_dev,
             verbose=verbose,
             output_format=output_format,
+            shard=shard,
+            coordinator=coordinator,
+            worker_timeout=worker_timeout,
+            worker_connect_timeout=worker_connect_timeout,
+            watch=watch,
+            watch_interval=watch_interval,
+            parser=parser,
+            large_file_size=large_file_size,
+            max_file_size=max_file_size,
+            large_file_timeout=large_file_timeout,
+            parse_timeout=parse_timeout,
+            parse_memory=parse_memory,
+            output=output,
+            output_buffer_size=output_buffer_size,
+            flush=flush,
+            reports=reports,
+            max_findings=max_findings,
+            changed_first=changed_first,
+            stats=stats or stats_file is not None,
+            stats_file=stats_file,
+            max_annotations=max_annotations,
+            max_file_annotations=max_file_annotations,
+            step_summary=step_summary,
+            rev=rev,
         )
 
     @classmethod
-    def from_argv(cls, sysv: list[str] | None = None) -> AppConfig:
+    def from_argv(
+        cls,
+        sysv: Sequence[str] | None = None,
+        *,
+        env_mappings: Callable[[Path | None], Iterable[tuple[str, str]]] = (
+            mappings_for_env
+        ),
+    ) -> AppConfig:
         """Construct an AppConfig from sys.argv or a provided list of arguments."""
         parser = argparse.ArgumentParser(
             description="Find undeclared and unused (or all) imports in Python files",
@@ -199,10 +450,12 @@ class AppConfig:
             Toml Key: [tool.check-dependencies] includes=[]
             """),
         )
-        full, concise, github = (
+        full, concise, github, jsonl, sarif = (
             OutputFormat.FULL.value,
             OutputFormat.CONCISE.value,
             OutputFormat.GITHUB.value,
+            OutputFormat.JSONL.value,
+            OutputFormat.SARIF.value,
         )
         parser.add_argument(
             "--output-format",
@@ -215,9 +468,244 @@ class AppConfig:
             - {concise}:  Print only problematic imports (missing or extra)
             - {github}:   Print only problematic imports in a format suitable
                 for GitHub Actions annotations
+            - {jsonl}:    Print one JSON object per line for every import,
+                extra package and error
+            - {sarif}:    Print only problematic imports as a SARIF log for
+                code scanning platforms
             """),
             default=OutputFormat.CONCISE,
         )
+        parser.add_argument(
+            "--output",
+            "-o",
+            type=Path,
+            metavar="FILE",
+            help="Write the output to FILE instead of stdout.",
+        )
+        parser.add_argument(
+            "--output-buffer-size",
+            type=_parse_size,
+            metavar="BYTES",
+            default=DEFAULT_OUTPUT_BUFFER_SIZE,
+            help=textwrap.dedent("""\
+            Write the output in chunks of about this size.
+            Accepts K, M and G suffixes (default: 64K).
+            """),
+        )
+        parser.add_argument(
+            "--flush",
+            type=FlushPolicy,
+            metavar="{auto,output,buffer}",
+            default=FlushPolicy.AUTO,
+            help=textwrap.dedent("""\
+            When to write the buffered output:
+            - output:  After every import, extra package or error.
+            - buffer:  When the buffer is full and at the end.
+            - auto:    output on a terminal, else buffer (default).
+            """),
+        )
+        parser.add_argument(
+            "--report",
+            type=Report.parse,
+            action="append",
+            metavar="FORMAT[:PATH]",
+            default=[],
+            help=textwrap.dedent("""\
+            Also write the outputs in FORMAT (see --output-format) to PATH, or
+            to stdout without a PATH. All reports are written from one scan.
+            Can be specified multiple times, e.g. --report full:deps.log.
+            """),
+        )
+        parser.add_argument(
+            "--max-findings",
+            type=_parse_positive_int,
+            metavar="N",
+            help=textwrap.dedent("""\
+            Stop after N findings failing the check (e.g. missing modules).
+            The remaining files and the unused dependencies are not checked.
+            """),
+        )
+        parser.add_argument(
+            "--fail-fast",
+            action="store_const",
+            const=1,
+            dest="max_findings",
+            help="Stop after the first finding, same as --max-findings 1.",
+        )
+        parser.add_argument(
+            "--changed-first",
+            action="store_true",
+            default=False,
+            help=textwrap.dedent("""\
+            Scan the most recently modified files first, e.g. with --fail-fast.
+            Else the files are scanned in the order given on the command line.
+            """),
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            default=False,
+            help=textwrap.dedent("""\
+            Write import statistics per project to stderr: files, imports,
+            distinct modules, imports per package, files with the most imports,
+            unused dependencies and parse errors.
+            """),
+        )
+        parser.add_argument(
+            "--stats-file",
+            type=Path,
+            metavar="FILE",
+            help="Write the import statistics to FILE instead, implies --stats.",
+        )
+        parser.add_argument(
+            "--max-annotations",
+            type=_parse_non_negative_int,
+            metavar="N",
+            default=DEFAULT_MAX_ANNOTATIONS,
+            help=textwrap.dedent(f"""\
+            Annotate at most N findings in the github format, 0 for all
+            (default: {DEFAULT_MAX_ANNOTATIONS}). GitHub does not show more.
+            """),
+        )
+        parser.add_argument(
+            "--max-file-annotations",
+            type=_parse_non_negative_int,
+            metavar="N",
+            default=DEFAULT_MAX_FILE_ANNOTATIONS,
+            help=textwrap.dedent(f"""\
+            Annotate at most N findings per file in the github format, 0 for
+            all (default: {DEFAULT_MAX_FILE_ANNOTATIONS}).
+            """),
+        )
+        parser.add_argument(
+            "--step-summary",
+            type=Path,
+            metavar="FILE",
+            default=os.environ.get("GITHUB_STEP_SUMMARY") or None,
+            help=textwrap.dedent("""\
+            Append a markdown table of the findings of the github format to
+            FILE (default: $GITHUB_STEP_SUMMARY, set by GitHub Actions).
+            """),
+        )
+        parser.add_argument(
+            "--rev",
+            metavar="REF",
+            help=textwrap.dedent("""\
+            Check the files as they are in a git revision (commit, tag or
+            branch), read from the object store without a checkout. The paths
+            are relative to the working directory in the repository.
+            --changed-first has no effect.
+            """),
+        )
+        parser.add_argument(
+            "--shard",
+            type=Shard.parse,
+            metavar="I/N",
+            help=textwrap.dedent("""\
+            Only scan the I-th of N deterministic partitions of the source files
+            and print a partial result (JSON) instead of diagnostics.
+            Combine the partial results with `check-dependencies merge`.
+            """),
+        )
+        parser.add_argument(
+            "--coordinator",
+            type=Address.parse,
+            metavar="HOST:PORT",
+            help=textwrap.dedent("""\
+            Listen on HOST:PORT and distribute the source files to workers
+            started with `check-dependencies worker HOST:PORT`.
+            Only use on a trusted network.
+            """),
+        )
+        parser.add_argument(
+            "--worker-timeout",
+            type=float,
+            metavar="SECONDS",
+            default=60.0,
+            help="Reassign a batch of files if a worker does not return it in time.",
+        )
+        parser.add_argument(
+            "--worker-connect-timeout",
+            type=float,
+            metavar="SECONDS",
+            default=300.0,
+            help=(
+                "Fail the coordinator if no worker connects within this time, or "
+                "takes the remaining batches after all workers are lost."
+            ),
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            default=False,
+            help=textwrap.dedent("""\
+            Keep running and re-check changed files and configs.
+            Only the outputs affected by a change are printed again.
+            """),
+        )
+        parser.add_argument(
+            "--watch-interval",
+            type=float,
+            metavar="SECONDS",
+            default=0.5,
+            help="Seconds between two checks for changes in watch mode.",
+        )
+        parser.add_argument(
+            "--parser",
+            type=Parser,
+            metavar="{ast,fast}",
+            default=Parser.AST,
+            help=textwrap.dedent("""\
+            Engine to find the imports of a file:
+            - ast:   Parse the syntax tree of every file (default).
+            - fast:  Scan the source text, only parse files the scanner cannot
+                handle for certain. Also finds the imports of files with
+                syntax errors.
+            """),
+        )
+        parser.add_argument(
+            "--large-file-size",
+            type=_parse_size,
+            metavar="BYTES",
+            default=ReadOptions.large_file_size,
+            help=textwrap.dedent("""\
+            Memory-map larger files (e.g. generated protobuf modules) and only
+            scan them for imports, as with --parser fast. Large files the
+            scanner cannot handle are reported instead of parsed.
+            Accepts K, M and G suffixes (default: 8M).
+            """),
+        )
+        parser.add_argument(
+            "--max-file-size",
+            type=_parse_size,
+            metavar="BYTES",
+            help="Report larger files without reading them.",
+        )
+        parser.add_argument(
+            "--large-file-timeout",
+            type=float,
+            metavar="SECONDS",
+            default=ReadOptions.large_file_timeout,
+            help="Report large files that are not scanned within this time.",
+        )
+        parser.add_argument(
+            "--parse-timeout",
+            type=float,
+            metavar="SECONDS",
+            help=textwrap.dedent("""\
+            Read and parse the files in an isolated process and report files
+            that are not parsed within this time instead of stalling the run.
+            """),
+        )
+        parser.add_argument(
+            "--parse-memory",
+            type=_parse_size,
+            metavar="BYTES",
+            help=textwrap.dedent("""\
+            Limit the address space of the isolated parser process (not on
+            Windows); files exceeding it are reported. Implies isolation.
+            """),
+        )
         args = parser.parse_args(sysv)
 
         return AppConfig.from_cli_args(
@@ -230,18 +718,119 @@ class AppConfig:
             includes=args.include,
             provides_from_venv=args.provides_from_venv,
             output_format=args.output_format,
+            env_mappings=env_mappings,
+            shard=args.shard,
+            coordinator=args.coordinator,
+            worker_timeout=args.worker_timeout,
+            worker_connect_timeout=args.worker_connect_timeout,
+            watch=args.watch,
+            watch_interval=args.watch_interval,
+            parser=args.parser,
+            large_file_size=args.large_file_size,
+            max_file_size=args.max_file_size,
+            large_file_timeout=args.large_file_timeout,
+            parse_timeout=args.parse_timeout,
+            parse_memory=args.parse_memory,
+            output=args.output,
+            output_buffer_size=args.output_buffer_size,
+            flush=args.flush,
+            reports=args.report,
+            max_findings=args.max_findings,
+            changed_first=args.changed_first,
+            stats=args.stats,
+            stats_file=args.stats_file,
+            max_annotations=args.max_annotations,
+            max_file_annotations=args.max_file_annotations,
+            step_summary=args.step_summary,
+            rev=args.rev,
+        )
+
+    @property
+    def output_kinds(self) -> frozenset[type[WithModule]]:
+        """Get the kinds of module outputs the formatters need.
+
+        Other module outputs, e.g. `OkDependency` unless a format is ``full``,
+        are neither shown nor change the exit code, so they need not be built.
+        """
+        return module_output_kinds(
+            show_all=any(
+                fmt in (OutputFormat.FULL, OutputFormat.JSONL)
+                for fmt in chain(
+                    [self.output_format],
+                    (report.output_format for report in self.reports),
+                )
+            )
         )
 
+    def report_configs(self) -> list[AppConfig]:
+        """Get a config per ``--report``, to format and write its outputs.
+
+        The step summary is only written once, by the first ``github`` format.
+        """
+        configs = []
+        step_summary = (
+            None if self.output_format == OutputFormat.GITHUB else self.step_summary
+        )
+        for report in self.reports:
+            configs.append(
+                replace(
+                    self,
+                    output_format=report.output_format,
+                    output=report.path,
+                    reports=(),
+                    step_summary=step_summary,
+                )
+            )
+            if report.output_format == OutputFormat.GITHUB:
+                step_summary = None
+        return configs
+
     def mk_formatter(self) -> Callable[[Output], Iterator[str]]:
         """Format outputs."""
         if self.output_format == OutputFormat.GITHUB:
+            return self._mk_github_annotations()
+        if self.output_format == OutputFormat.JSONL:
+            verbose = self.verbose
+
+            def jsonl_formatter(output: Output) -> Iterator[str]:
+                yield from output.as_jsonl(verbose=verbose)
+
+            return jsonl_formatter
+        if self.output_format == OutputFormat.SARIF:
+            separators = itertools.chain([""], itertools.repeat(","))
 
-            def formatter(output: Output) -> Iterator[str]:
-                yield from output.as_github()
+            def sarif_formatter(output: Output) -> Iterator[str]:
+                for result in output.as_sarif():
+                    yield f"{next(separators)}{result}"
 
-            return formatter
+            return sarif_formatter
         return self._mk_text_formatter()
 
+    def mk_report(
+        self,
+    ) -> tuple[Callable[[Output], Iterator[str]], Iterable[str], Iterable[str]]:
+        """Get the formatter and the lines to write before and after the outputs.
+
+        A ``sarif`` document has a start and an end, e.g. to write the results of
+        a SARIF log without keeping them in memory. The end of the ``github``
+        format is only computed after the outputs were formatted, see
+        `GithubAnnotations.end`.
+        """
+        if self.output_format == OutputFormat.GITHUB:
+            annotations = self._mk_github_annotations()
+            return annotations, [], annotations.end()
+        if self.output_format == OutputFormat.SARIF:
+            start, end = sarif_log(_get_version())
+            return self.mk_formatter(), [start], [end]
+        return self.mk_formatter(), [], []
+
+    def _mk_github_annotations(self) -> GithubAnnotations:
+        return GithubAnnotations(
+            max_annotations=self.max_annotations,
+            max_file_annotations=self.max_file_annotations,
+            summary=self.step_summary,
+        )
+
     def _mk_text_formatter(self) -> Callable[[Output], Iterator[str]]:
         seen = set()
 
@@ -272,50 +861,140 @@ class ProjectConfig:
     optional_dependencies: Mapping[Path, Collection[Package]] = field(
         default_factory=dict
     )
+    missing_dependencies: Collection[Package] = frozenset()
+    """Packages named like the known missing modules of the project, allowed in
+    addition to the `allowed_dependencies` shared by identical projects."""
+
+    @functools.cached_property
+    def allowed_bits(self) -> int:
+        """Get the allowed and missing dependencies as a bitset of `packages`."""
+        return self.packages.bits(
+            chain(self.allowed_dependencies, self.missing_dependencies)
+        )
+
+    @functools.cached_property
+    def known_extra_bits(self) -> int:
+        """Get the known extra packages as a bitset of `packages`."""
+        return self.packages.bits(self.known_extra)
 
     @classmethod
-    def from_config(cls, app_cfg: AppConfig, pyproject: PyProjectToml) -> ProjectConfig:
-        """Initialize an empty ProjectDependencies instance."""
+    def from_config(
+        cls,
+        app_cfg: AppConfig,
+        pyproject: PyProjectToml,
+        shared: dict[Hashable, Any] | None = None,
+    ) -> ProjectConfig:
+        """Initialize an empty ProjectDependencies instance.
+
+        :param shared: Parts which are identical for many projects (e.g. in a
+            monorepo), like the dependencies and the `Packages` index, are only
+            built once and shared by the configs built with the same mapping, e.g.
+            of a registry. None to share nothing.
+        """
+        dependencies = _shared_set(shared, pyproject.dependencies)
+        project_missing = _shared_set(shared, pyproject.known_missing)
+        known_extra = _shared_set(
+            shared, {*app_cfg.known_extra, *pyproject.known_extra}
+        )
+        provides = pyproject.provides
         return cls(
-            known_missing=frozenset([*app_cfg.known_missing, *pyproject.known_missing]),
-            defined_dependencies=frozenset(pyproject.dependencies),
-            allowed_dependencies=frozenset(
-                chain.from_iterable(
-                    [
-                        pyproject.dependencies,
-                        app_cfg.known_extra,
-                        pyproject.known_extra,
-                        map(Package, BUILTINS),
-                        (Package(m.name) for m in pyproject.known_missing),
-                    ]
-                )
+            known_missing=_shared_set(
+                shared, [*app_cfg.known_missing, *project_missing]
+            ),
+            defined_dependencies=dependencies,
+            allowed_dependencies=_shared(
+                shared,
+                ("allowed", _value_key(dependencies), _value_key(known_extra)),
+                lambda: frozenset(
+                    chain(dependencies, known_extra, map(Package, BUILTINS))
+                ),
+            ),
+            known_extra=known_extra,
+            packages=_shared(
+                shared,
+                (
+                    "packages",
+                    app_cfg.provides,
+                    _value_key(dependencies),
+                    frozenset((repr(pkg), repr(mod)) for pkg, mod in provides),
+                ),
+                lambda: app_cfg.provides | Packages(dependencies, provides),
             ),
-            known_extra=frozenset({*app_cfg.known_extra, *pyproject.known_extra}),
-            packages=app_cfg.provides
-            | Packages(pyproject.dependencies, pyproject.provides),
             optional_dependencies=pyproject.optional_dependencies_cfg,
             path=pyproject.path,
+            missing_dependencies=frozenset(Package(m.name) for m in project_missing),
         )
 
 
+def _shared(
+    shared: dict[Hashable, Any] | None, key: Hashable, build: Callable[[], _T]
+) -> _T:
+    """Get a value shared by all configs with the same key, build it on first use.
+
+    :param shared: Values shared so far, None to build the value every time.
+    :param key: Key of the value by the values it is built from, see `_value_key`.
+    """
+    if shared is None:
+        return build()
+    if (value := shared.get(key)) is None:
+        value = shared[key] = build()
+    return value
+
+
+def _shared_set(
+    shared: dict[Hashable, Any] | None, items: Iterable[_H]
+) -> frozenset[_H]:
+    """Get a shared frozenset of packages or modules."""
+    items = frozenset(items)
+    return _shared(shared, ("set", _value_key(items)), lambda: items)
+
+
+def _value_key(items: Iterable[Module | Package]) -> frozenset[str]:
+    """Get a key of packages or modules by value.
+
+    The representation keeps the original names, as equal packages may differ in
+    their spelling, which is part of the outputs.
+    """
+    return frozenset(map(repr, items))
+
+
 def _get_provides(
-    provides: Iterable[str], provides_from_venv: Path | None
+    provides: Iterable[str], env_mappings: Iterable[tuple[str, str]]
 ) -> Iterable[tuple[Package, Module]]:
-    """Parse the provides argument and collect provides from a virtual environment."""
+    """Parse the provides argument and add the provides of a virtual environment."""
     return [
         (Package(pkg.strip()), Module(mod.strip()))
         for pkg, sep, mods in chain(
             (map1.partition("=") for map1 in provides),
-            (
-                (str(pkg), "=", str(mod))
-                for pkg, mod in mappings_for_env(provides_from_venv)
-            ),
+            ((str(pkg), "=", str(mod)) for pkg, mod in env_mappings),
         )
         for mod in mods.split(",")
         if sep and pkg.strip() and mod.strip()
     ]
 
 
+def _parse_size(value: str) -> int:
+    """Parse a size in bytes with an optional ``K``, ``M`` or ``G`` suffix."""
+    factor = _SIZE_SUFFIXES.get(value[-1:].upper(), 1)
+    return int(value[:-1] if factor > 1 else value) * factor
+
+
+def _parse_positive_int(value: str) -> int:
+    """Parse an integer of at least 1."""
+    if (number := int(value)) < 1:
+        msg = f"must be at least 1, got {number}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
+def _parse_non_negative_int(value: str) -> int:
+    """Parse an integer of at least 0."""
+    if (number := int(value)) < 0:
+        msg = f"must be at least 0, got {number}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
 class _MultiSepAction(argparse.Action):
     """Custom argparse action to split comma-separated values into a list.
 
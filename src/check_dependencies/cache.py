@@ -0,0 +1,175 @@
+"""Warm state shared between the runs of a long-lived process.
+
+Every cached value remembers the ``stat`` data (mtime and size) of the files it
+was derived from and is only reused while those files are unchanged:
+
+- imports of source files (of in-memory sources by the digest of their content),
+- parsed ``pyproject.toml`` files, including their ``includes``,
+- package to module mappings of virtual environments (``--provides-from-venv``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING
+
+from check_dependencies.app_config import DEFAULT_READ_OPTIONS
+from check_dependencies.main import ImportsT, _file_imports, source_imports
+from check_dependencies.outputs import FileError
+from check_dependencies.provides import mappings_for_paths, site_paths
+from check_dependencies.pyproject_toml import PyProjectToml, config_files
+
+if TYPE_CHECKING:
+    import os
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from check_dependencies.app_config import ReadOptions
+
+StatT = tuple[int, int] | None
+
+
+class Cache:
+    """Stat-validated caches of imports, configs and environment mappings.
+
+    Files are cached by their absolute path, so a cache can be shared by runs from
+    different working directories.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty caches."""
+        self._imports: dict[tuple[Path, ReadOptions], tuple[StatT, ImportsT]] = {}
+        self._source_imports: dict[
+            tuple[Path, ReadOptions], tuple[bytes, ImportsT]
+        ] = {}
+        self._pyprojects: dict[
+            tuple[Path, Path, bool], tuple[dict[Path, StatT], PyProjectToml]
+        ] = {}
+        self._site_paths: dict[Path, tuple[StatT, list[Path]]] = {}
+        self._env_mappings: dict[
+            tuple[Path, ...], tuple[dict[Path, StatT], list[tuple[str, str]]]
+        ] = {}
+
+    def __len__(self) -> int:
+        """Get the number of source files with cached imports."""
+        return len(self._imports)
+
+    def imports(
+        self, file: Path, options: ReadOptions = DEFAULT_READ_OPTIONS
+    ) -> ImportsT:
+        """Get the imports of a source file, or the error if it cannot be parsed."""
+        st = _stat(file)
+        cached = self._imports.get(key := (file.absolute(), options))
+        if cached and st is not None and cached[0] == st:
+            imports = cached[1]
+        else:
+            imports = _file_imports(file, options, None if st is None else st[1])
+            self._imports[key] = (st, imports)
+        if isinstance(imports, FileError):
+            # Report the error for the path as given in this run.
+            return FileError(file, imports.message)
+        return imports
+
+    def source_imports(
+        self,
+        file: Path,
+        source: str | bytes,
+        options: ReadOptions = DEFAULT_READ_OPTIONS,
+    ) -> ImportsT:
+        """Get the imports of in-memory source code, see `main.source_imports`.
+
+        :param file: Path of the source, it is not read.
+        """
+        digest = hashlib.blake2b(
+            source.encode() if isinstance(source, str) else source, digest_size=16
+        ).digest()
+        cached = self._source_imports.get(key := (file.absolute(), options))
+        if cached and cached[0] == digest:
+            imports = cached[1]
+        else:
+            imports = source_imports(source, file, options)
+            self._source_imports[key] = (digest, imports)
+        if isinstance(imports, FileError):
+            return FileError(file, imports.message)
+        return imports
+
+    def pyproject(self, path: Path, *, include_dev: bool) -> PyProjectToml:
+        """Get a parsed pyproject.toml file."""
+        # The parsed config keeps the path as given, which is part of the outputs.
+        key = (path.absolute(), path, include_dev)
+        if (cached := self._pyprojects.get(key)) and _unchanged(cached[0]):
+            return cached[1]
+        stats = _stats(config_files(path))
+        pyproject = PyProjectToml.for_path(path, include_dev=include_dev)
+        self._pyprojects[key] = (stats, pyproject)
+        return pyproject
+
+    def invalidate(self, paths: Iterable[Path] | None = None) -> None:
+        """Forget the values derived from files, e.g. if their stat data is unchanged.
+
+        :param paths: Files and directories (including all files below them) to
+            forget the values of, None to forget all values.
+        """
+        if paths is None:
+            self._imports.clear()
+            self._source_imports.clear()
+            self._pyprojects.clear()
+            self._site_paths.clear()
+            self._env_mappings.clear()
+            return
+        roots = [path.absolute() for path in paths]
+
+        def _affected(files: Iterable[Path]) -> bool:
+            return any(file.is_relative_to(root) for file in files for root in roots)
+
+        for imports in (self._imports, self._source_imports):
+            for key in [key for key in imports if _affected([key[0]])]:
+                del imports[key]
+        for key in [key for key in self._site_paths if _affected([key])]:
+            del self._site_paths[key]
+        for cache in (self._pyprojects, self._env_mappings):
+            for key in [key for key, (stats, _) in cache.items() if _affected(stats)]:
+                del cache[key]
+
+    def env_mappings(self, python: Path | None) -> list[tuple[str, str]]:
+        """Get the (package, module) mappings of a virtual environment.
+
+        Installing or removing a package changes the mtime of its site-packages
+        directory, which invalidates the mappings.
+        """
+        if not python:
+            return []
+        st = _stat(python)
+        cached_paths = self._site_paths.get(key := python.absolute())
+        if cached_paths and st is not None and cached_paths[0] == st:
+            paths = cached_paths[1]
+        else:
+            paths = site_paths(python)
+            self._site_paths[key] = (st, paths)
+
+        cached = self._env_mappings.get(key := tuple(paths))
+        if cached and _unchanged(cached[0]):
+            return cached[1]
+        stats = _stats(paths)
+        mappings = mappings_for_paths(paths)
+        self._env_mappings[key] = (stats, mappings)
+        return mappings
+
+
+def _stats(paths: Iterable[Path]) -> dict[Path, StatT]:
+    return {path.absolute(): _stat(path) for path in paths}
+
+
+def _unchanged(stats: dict[Path, StatT]) -> bool:
+    return all(_stat(path) == st for path, st in stats.items())
+
+
+def _stat(path: Path) -> StatT:
+    try:
+        return _stat_result(path.stat())
+    except OSError:
+        return None
+
+
+def _stat_result(st: os.stat_result) -> tuple[int, int]:
+    return st.st_mtime_ns, st.st_size
@@ -0,0 +1,190 @@
+"""Check dependencies from Python, with warm caches across calls.
+
+A `Checker` is built once from an `AppConfig` and checks files any number of
+times, e.g. for every checkout or pull request state in a loop. Between the calls
+it keeps a `Cache` of the parsed configs (including their ``includes``), the
+environment mappings (``--provides-from-venv``) and the imports of every source
+file. Cached values are only reused while the stat data of their files is
+unchanged. The nearest pyproject.toml of a directory is only looked up once, so
+call `Checker.invalidate` after adding or removing pyproject.toml files, or to
+forget values explicitly, e.g. after a checkout that restores modification times.
+
+`Checker.check_sources` checks source code which is not on disk, e.g. editor
+buffers, generated modules or blobs of a review tool, by virtual paths. Only the
+configs are read from disk; the imports of a source are cached by its content.
+
+**Example:**
+
+.. code-block:: python
+
+    checker = Checker.from_argv(["--include-dev"])
+    for checkout in checkouts:
+        result = checker.check([checkout / "src"])
+        if result.exit_code:
+            print(checkout, result.findings)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from check_dependencies.app_config import AppConfig
+from check_dependencies.cache import Cache
+from check_dependencies.main import (
+    _imports_outputs,
+    _project_outputs,
+    _ProjectRegistry,
+    yield_outputs,
+)
+from check_dependencies.outputs import InfoMessage, NoPyprojectError
+from check_dependencies.pyproject_toml import NoPyProjectFileError, get_pyproject_toml
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from check_dependencies.outputs import Output
+
+PathT = str | os.PathLike[str]
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """Outputs of a single check."""
+
+    outputs: Sequence[Output]
+    """Imports, unused dependencies and errors, in the order of the CLI output.
+
+    Info messages are only included for ``verbose`` configs.
+    """
+    exit_code: int
+    """Exit code of the CLI for the outputs, see `OutputConfig.exit_code`."""
+
+    @property
+    def findings(self) -> list[Output]:
+        """Get the outputs failing the check, e.g. missing modules."""
+        return [output for output in self.outputs if output.exit_code]
+
+
+class Checker:
+    """Check files against their pyproject.toml, reusing work of earlier checks."""
+
+    def __init__(self, app_cfg: AppConfig, *, cache: Cache | None = None) -> None:
+        """Initialize the checker.
+
+        :param app_cfg: Options of every check, the file names are the default
+            paths of `check`. The output format selects the kinds of module
+            outputs, e.g. ``full`` includes the correct imports.
+        :param cache: Warm state to start with, e.g. shared by several checkers.
+        """
+        self.app_cfg = app_cfg
+        self.cache = Cache() if cache is None else cache
+
+    @classmethod
+    def from_argv(
+        cls, argv: Sequence[str] = (), *, cache: Cache | None = None
+    ) -> Checker:
+        """Get a checker for command line options, without file names.
+
+        The environment mappings of ``--provides-from-venv`` are cached as well.
+        """
+        cache = Cache() if cache is None else cache
+        app_cfg = AppConfig.from_argv(
+            [*argv, os.curdir], env_mappings=cache.env_mappings
+        )
+        return cls(replace(app_cfg, file_names=[]), cache=cache)
+
+    def check(self, paths: Iterable[PathT] | None = None) -> CheckResult:
+        """Check source files and directories.
+
+        :param paths: Files and directories to check, None for the file names of
+            the config.
+        """
+        app_cfg = self.app_cfg
+        if paths is not None:
+            app_cfg = replace(app_cfg, file_names=[Path(path) for path in paths])
+        return self._result(
+            yield_outputs(app_cfg, self.cache, kinds=app_cfg.output_kinds)
+        )
+
+    def check_sources(
+        self,
+        sources: Iterable[tuple[PathT, str | bytes]],
+        pyproject: PathT | None = None,
+        *,
+        unused: bool = False,
+    ) -> CheckResult:
+        """Check source code which is not on disk, e.g. editor buffers.
+
+        The imports are found and resolved as for files, only the configs are read
+        from disk. The imports of unchanged sources are cached by their content.
+
+        :param sources: Virtual path and source code of every module. The path is
+            reported in the outputs and selects the optional dependencies and,
+            without `pyproject`, the project of the source.
+        :param pyproject: pyproject.toml of all sources, None to use the nearest
+            one of every path.
+        :param unused: Also report unused dependencies, only if the sources are
+            all modules of their projects.
+        """
+        return self._result(self._source_outputs(sources, pyproject, unused=unused))
+
+    def _source_outputs(
+        self,
+        sources: Iterable[tuple[PathT, str | bytes]],
+        pyproject: PathT | None,
+        *,
+        unused: bool,
+    ) -> Iterator[Output]:
+        app_cfg = replace(self.app_cfg, file_names=[])
+        options, kinds = app_cfg.read_options, app_cfg.output_kinds
+        registry = _ProjectRegistry(app_cfg, self.cache)
+        pyproject_pth = None if pyproject is None else Path(pyproject)
+        for path_, source in sources:
+            path = Path(path_)
+            try:
+                entry = registry.for_pyproject(_source_pyproject(path, pyproject_pth))
+            except NoPyProjectFileError as exc:
+                yield NoPyprojectError(str(exc))
+                continue
+            imports = self.cache.source_imports(path, source, options)
+            yield from _imports_outputs(path, imports, entry, kinds)
+        if unused:
+            yield from _project_outputs(registry)
+
+    def _result(self, outputs: Iterable[Output]) -> CheckResult:
+        verbose = self.app_cfg.verbose
+        shown = [
+            output
+            for output in outputs
+            if verbose or not isinstance(output, InfoMessage)
+        ]
+        exit_code = 0
+        for output in shown:
+            exit_code |= output.exit_code
+        return CheckResult(shown, exit_code)
+
+    def invalidate(self, paths: Iterable[PathT] | None = None) -> None:
+        """Forget cached values, so the next check reads the files again.
+
+        The nearest pyproject.toml of every directory is looked up again as well.
+
+        :param paths: Files and directories (including all files below them) to
+            forget, None to forget everything.
+        """
+        get_pyproject_toml.cache_clear()
+        self.cache.invalidate(None if paths is None else [Path(path) for path in paths])
+
+
+def _source_pyproject(path: Path, pyproject: Path | None) -> Path:
+    """Get the pyproject.toml of a source, the given one or the nearest one.
+
+    :raises NoPyProjectFileError: If the pyproject.toml does not exist.
+    """
+    if pyproject is None:
+        return get_pyproject_toml(path.parent)
+    if not pyproject.is_file():
+        raise NoPyProjectFileError(pyproject.as_posix())
+    return pyproject
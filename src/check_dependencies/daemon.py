@@ -0,0 +1,334 @@
+"""Persistent daemon with a thin client, to avoid the startup cost of every run.
+
+``check-dependencies daemon start`` starts a server in the background that keeps
+a `Cache` of parsed configs, environment mappings (``--provides-from-venv``) and
+the imports of every source file it has seen. ``check-dependencies daemon run
+ARGS...`` forwards the arguments over a Unix socket, the daemon checks the files
+in the working directory of the client and streams the formatted output back.
+Without a reachable daemon, ``run`` checks the files in the client itself.
+
+The protocol is one JSON object per line:
+
+- client: ``{"op": "run", "argv": [...], "cwd": ..., "env": {...}}``,
+  ``{"op": "status"}`` or ``{"op": "stop"}``
+- daemon: ``{"lines": [...]}`` for every output of a run, then a single
+  ``{"exit": N, "stdout": ..., "stderr": ...}``
+
+The ``env`` of a run holds the variables of the client the options default to,
+e.g. ``GITHUB_STEP_SUMMARY``; the daemon sets them for the run, instead of its
+own. The log messages of a run are part of its ``stderr``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Protocol
+
+from check_dependencies.app_config import LOG_FORMAT
+from check_dependencies.cache import Cache
+from check_dependencies.pyproject_toml import get_pyproject_toml
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+
+    WriterT = Callable[[Iterable[str]], None]
+
+logger = logging.getLogger("check_dependencies.daemon")
+
+DEFAULT_SOCKET = Path(".check-dependencies.sock")
+_START_TIMEOUT = 10.0
+_START_INTERVAL = 0.05
+_CLIENT_ENV = ("GITHUB_STEP_SUMMARY",)
+"""Environment variables of the client the options of a run default to."""
+
+
+class Runner(Protocol):
+    """Run a single check, see ``check_dependencies.__main__``."""
+
+    def __call__(
+        self, argv: Sequence[str], *, writer: WriterT | None, cache: Cache | None
+    ) -> int:
+        """Run the check and return the exit code."""
+
+
+def main(argv: Sequence[str], *, runner: Runner, writer: WriterT) -> int:
+    """Run ``check-dependencies daemon``.
+
+    :param argv: Command line arguments after ``daemon``.
+    :param runner: Run a single check, in the daemon or in the client.
+    :param writer: Write the output lines of a forwarded run.
+    :returns: The exit code.
+    """
+    args = arg_parser().parse_args(argv)
+    if not hasattr(socket, "AF_UNIX"):  # pragma: no cover
+        sys.stderr.write("The daemon needs Unix domain sockets\n")
+        return 1
+    if args.command == "run":
+        exit_code = forward(args.socket, args.args, writer)
+        if exit_code is None:
+            logger.info("No daemon running on %s, checking in-process", args.socket)
+            exit_code = runner(args.args, writer=writer, cache=None)
+        return exit_code
+    if args.command == "serve":
+        serve(args.socket, runner)
+        return 0
+    if args.command == "start":
+        return start(args.socket)
+    return _control(args.socket, args.command)
+
+
+def _control(path: Path, command: str) -> int:
+    """Send a status or stop request and report the result."""
+    status = request(path, {"op": command})
+    if status is None:
+        sys.stderr.write(f"No daemon running on {path.as_posix()}\n")
+        return 1
+    if command == "status":
+        sys.stdout.write(
+            f"Daemon running on {path.as_posix()} (pid {status['pid']}, "
+            f"{status['files']} files cached)\n"
+        )
+    return 0
+
+
+def arg_parser() -> argparse.ArgumentParser:
+    """Get the argument parser for ``check-dependencies daemon``."""
+    parser = argparse.ArgumentParser(
+        prog="check-dependencies daemon",
+        description="Check files in a persistent background process",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        metavar="PATH",
+        default=DEFAULT_SOCKET,
+        help=f"Unix socket of the daemon, default: {DEFAULT_SOCKET}",
+    )
+    parser.add_argument(
+        "command",
+        choices=["start", "status", "stop", "serve", "run"],
+        help="start/stop the daemon in the background, show its status, serve in "
+        "the foreground, or run a check (arguments as for check-dependencies)",
+    )
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser
+
+
+def start(path: Path) -> int:
+    """Start the daemon in the background and wait until it answers.
+
+    :param path: Unix socket of the daemon.
+    :returns: The exit code.
+    """
+    if request(path, {"op": "status"}) is not None:
+        sys.stderr.write(f"Daemon already running on {path.as_posix()}\n")
+        return 1
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            *("-m", "check_dependencies", "daemon"),
+            *("--socket", path.as_posix(), "serve"),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + _START_TIMEOUT
+    while process.poll() is None and time.monotonic() < deadline:
+        if request(path, {"op": "status"}) is not None:
+            sys.stdout.write(f"Daemon started on {path.as_posix()}\n")
+            return 0
+        time.sleep(_START_INTERVAL)
+    sys.stderr.write(f"Daemon did not start on {path.as_posix()}\n")
+    return 1
+
+
+def serve(path: Path, runner: Runner) -> None:
+    """Serve requests until a stop request.
+
+    :param path: Unix socket to listen on. A stale socket file is replaced.
+    :param runner: Run a single check.
+    """
+    if path.is_socket() and request(path, {"op": "status"}) is None:
+        path.unlink()
+    with _Server(path, runner) as server:
+        logger.info("Daemon listening on %s", path)
+        try:
+            while not server.stopped:
+                server.handle_request()
+        finally:
+            server.socket_path.unlink(missing_ok=True)
+
+
+def forward(path: Path, argv: Sequence[str], writer: WriterT) -> int | None:
+    """Forward a check to the daemon and write its outputs.
+
+    :param path: Unix socket of the daemon.
+    :param argv: Arguments of the check.
+    :param writer: Write the output lines.
+    :returns: The exit code, or None if no daemon is running.
+    """
+    try:
+        sock = _connect(path)
+    except OSError:
+        return None
+    with sock, sock.makefile("rwb") as stream:
+        env = {name: os.environ[name] for name in _CLIENT_ENV if name in os.environ}
+        _send(
+            stream,
+            {"op": "run", "argv": list(argv), "cwd": str(Path.cwd()), "env": env},
+        )
+        while (response := _recv(stream)) is not None:
+            if "lines" in response:
+                writer(response["lines"])
+                continue
+            sys.stdout.write(response["stdout"])
+            sys.stderr.write(response["stderr"])
+            return response["exit"]
+    sys.stderr.write("The daemon closed the connection\n")
+    return 1
+
+
+def request(path: Path, message: Mapping[str, Any]) -> dict[str, Any] | None:
+    """Send a single request to the daemon.
+
+    :returns: The response, or None if no daemon is running.
+    """
+    try:
+        with _connect(path) as sock, sock.makefile("rwb") as stream:
+            _send(stream, message)
+            return _recv(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def _connect(path: Path) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path.as_posix())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _send(stream: BinaryIO, message: Mapping[str, Any]) -> None:
+    stream.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    stream.flush()
+
+
+def _recv(stream: BinaryIO) -> dict[str, Any] | None:
+    """Read the next message sent with `_send`, None at the end of the stream.
+
+    :raises ValueError: If the message is not valid JSON.
+    """
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer a single request of a client."""
+
+    server: _Server
+
+    def handle(self) -> None:
+        """Answer the request; a lost client only aborts its own run."""
+        try:
+            message = _recv(self.rfile) or {}
+            if message["op"] == "run":
+                self._run(message["argv"], message["cwd"], message.get("env", {}))
+            elif message["op"] == "status":
+                _send(self.wfile, {"pid": os.getpid(), "files": len(self.server.cache)})
+            elif message["op"] == "stop":
+                self.server.stopped = True
+                _send(self.wfile, {"exit": 0})
+        except (OSError, ValueError, KeyError):
+            logger.warning("Lost client", exc_info=True)
+
+    def _run(self, argv: Sequence[str], cwd: str, env: Mapping[str, str]) -> None:
+        """Run a check in the working directory and environment of the client."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        old_cwd = Path.cwd()
+        # Nearest pyproject.toml lookups depend on the file system and cwd.
+        get_pyproject_toml.cache_clear()
+        try:
+            os.chdir(cwd)
+            with (
+                contextlib.redirect_stdout(stdout),
+                contextlib.redirect_stderr(stderr),
+                _client_env(env),
+                _log_to(stderr),
+            ):
+                exit_code = self.server.runner(
+                    argv,
+                    writer=lambda lines: _send(self.wfile, {"lines": list(lines)}),
+                    cache=self.server.cache,
+                )
+        except SystemExit as exc:  # argparse errors and --help/--version
+            exit_code = exc.code if isinstance(exc.code, int) else int(bool(exc.code))
+        finally:
+            os.chdir(old_cwd)
+        _send(
+            self.wfile,
+            {
+                "exit": exit_code,
+                "stdout": stdout.getvalue(),
+                "stderr": stderr.getvalue(),
+            },
+        )
+
+
+@contextlib.contextmanager
+def _client_env(env: Mapping[str, str]) -> Iterator[None]:
+    """Set the environment variables of a client, unset those it does not have."""
+    old = {name: os.environ.get(name) for name in _CLIENT_ENV}
+    try:
+        for name in _CLIENT_ENV:
+            if name in env:
+                os.environ[name] = env[name]
+            else:
+                os.environ.pop(name, None)
+        yield
+    finally:
+        for name, value in old.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextlib.contextmanager
+def _log_to(stream: io.StringIO) -> Iterator[None]:
+    """Also write the log messages to a stream, e.g. the stderr of a run."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+
+
+class _Server(socketserver.UnixStreamServer):
+    """Single-threaded server holding the warm cache."""
+
+    def __init__(self, path: Path, runner: Runner) -> None:
+        """Initialize the server, listening on a Unix socket."""
+        self.runner = runner
+        self.cache = Cache()
+        self.stopped = False
+        self.socket_path = path.absolute()
+        super().__init__(path.as_posix(), _Handler)
@@ -0,0 +1,368 @@
+"""Coordinator/worker mode to scan a source tree on several machines.
+
+The coordinator owns the file discovery and the project registry. Workers connect
+over TCP, pull batches of files, and return the imports found in each file. The
+coordinator resolves the imports and yields the same outputs as a local run.
+
+Workers read the files from their own file system, so all machines need the same
+checkout at the same paths. The protocol is one JSON object per line:
+
+- worker: ``{"op": "next"}`` or ``{"op": "result", "batch": ID, "files": [...]}``
+- coordinator: ``{"op": "batch", "batch": ID, "files": [...], "read": {...}}`` or
+  ``{"op": "done"}``
+
+Batches of workers that disconnect are reassigned immediately, batches of workers
+that do not answer within the worker timeout are reassigned to the next idle
+worker. The first result of a batch wins. The coordinator fails if no live worker
+holds a batch for the connect timeout, e.g. once all workers are lost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from check_dependencies.app_config import (
+    DEFAULT_READ_OPTIONS,
+    Address,
+    ReadOptions,
+)
+from check_dependencies.daemon import _recv, _send
+from check_dependencies.lib import Module
+from check_dependencies.main import (
+    _file_imports,
+    _imports_outputs,
+    _project_outputs,
+    _ProjectRegistry,
+    _verbose_app_info,
+    iter_source_files,
+)
+from check_dependencies.outputs import (
+    FileError,
+    InfoMessage,
+    NoPyprojectError,
+    Output,
+    dump_location,
+    load_location,
+)
+from check_dependencies.pyproject_toml import NoPyProjectFileError
+
+if TYPE_CHECKING:
+    from collections.abc import Container, Generator, Mapping, Sequence
+
+    from check_dependencies.app_config import AppConfig
+    from check_dependencies.main import ImportsT
+    from check_dependencies.stats import Statistics
+
+logger = logging.getLogger("check_dependencies.distributed")
+
+_BATCH_SIZE = 64
+_CONNECT_INTERVAL = 0.1
+FactsT = dict[str, Any]
+
+
+class NoWorkerError(Exception):
+    """No live worker held a batch of the coordinator within the connect timeout."""
+
+
+def coordinate_outputs(
+    app_cfg: AppConfig,
+    address: Address,
+    *,
+    kinds: Container[type[Output]] | None = None,
+    stats: Statistics | None = None,
+) -> Generator[Output, None, None]:
+    """Yield output objects of missing/unused imports, scanned by remote workers.
+
+    :param app_cfg: Application configuration.
+    :param address: Address to listen on for workers.
+    :param kinds: Kinds of module outputs to yield, None for all.
+    :param stats: Count the files and imports of every project.
+    :raises NoWorkerError: If no worker connects, or takes the remaining batches
+        after all workers are lost, within the connect timeout.
+    """
+    yield from InfoMessage.from_iter(_verbose_app_info(app_cfg), verbose=True)
+    try:
+        registry = _ProjectRegistry(app_cfg, stats=stats)
+    except NoPyProjectFileError as exc:
+        logger.error("Could not find pyproject.toml for %s", exc)  # noqa: TRY400
+        yield NoPyprojectError(str(exc))
+        return
+
+    batches = _Batches(
+        list(iter_source_files(app_cfg)),
+        app_cfg.worker_timeout,
+        connect_timeout=app_cfg.worker_connect_timeout,
+    )
+    with _Server((address.host, address.port), batches, app_cfg.read_options) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info("Waiting for workers on %s:%d", *server.server_address[:2])
+        try:
+            for batch in range(len(batches)):
+                for src_pth, facts in zip(
+                    batches.files(batch), batches.result(batch), strict=True
+                ):
+                    try:
+                        current = registry.get(src_pth)
+                    except NoPyProjectFileError as exc:  # pragma: no cover
+                        yield NoPyprojectError(str(exc))
+                        return
+                    imports = _load_facts(src_pth, facts)
+                    yield from _imports_outputs(src_pth, imports, current, kinds)
+        finally:
+            batches.close()
+            server.shutdown()
+
+    yield from _project_outputs(registry)
+
+
+def run_worker(address: Address, *, connect_timeout: float = 30.0) -> int:
+    """Process batches of files for a coordinator until all files are done.
+
+    :param address: Address of the coordinator.
+    :param connect_timeout: Seconds to wait for the coordinator to come up.
+    :returns: The number of files processed by this worker.
+    :raises OSError: If the connection to the coordinator fails.
+    """
+    n_files = 0
+    with (
+        _connect(address, connect_timeout) as sock,
+        sock.makefile("rwb") as stream,
+    ):
+        request: dict[str, Any] = {"op": "next"}
+        while True:
+            _send(stream, request)
+            if (response := _recv(stream)) is None:
+                msg = f"Coordinator {address} closed the connection"
+                raise ConnectionError(msg)
+            if response["op"] == "done":
+                return n_files
+            options = ReadOptions.from_json(response["read"])
+            request = {
+                "op": "result",
+                "batch": response["batch"],
+                "files": [
+                    _file_facts(Path(name), options) for name in response["files"]
+                ],
+            }
+            n_files += len(response["files"])
+
+
+def worker_arg_parser() -> argparse.ArgumentParser:
+    """Get the argument parser for ``check-dependencies worker``."""
+    parser = argparse.ArgumentParser(
+        prog="check-dependencies worker",
+        description="Scan files for a coordinator (check-dependencies --coordinator)",
+    )
+    parser.add_argument(
+        "coordinator",
+        type=Address.parse,
+        metavar="HOST:PORT",
+        help="Address of the coordinator",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        metavar="SECONDS",
+        default=30.0,
+        help="Seconds to wait for the coordinator to come up",
+    )
+    return parser
+
+
+def _file_facts(file: Path, options: ReadOptions = DEFAULT_READ_OPTIONS) -> FactsT:
+    """Get the imports of a file in a compact, JSON-serializable form."""
+    imports = _file_imports(file, options)
+    if isinstance(imports, FileError):
+        return {"error": imports.message}
+    return {
+        "imports": [
+            [module.name, module.raw, *dump_location(location)]
+            for module, location in imports
+        ]
+    }
+
+
+def _load_facts(file: Path, facts: Mapping[str, Any]) -> ImportsT:
+    """Get the imports of a file from the result of `_file_facts`."""
+    if "error" in facts:
+        return FileError(file, facts["error"])
+    return [
+        (Module(name, raw=raw), load_location(location))
+        for name, raw, *location in facts["imports"]
+    ]
+
+
+def _connect(address: Address, timeout: float) -> socket.socket:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((address.host, address.port))
+        except ConnectionRefusedError:  # noqa: PERF203
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(_CONNECT_INTERVAL)
+
+
+class _Batches:
+    """Batches of files handed out to workers, shared by all connections."""
+
+    def __init__(
+        self, files: Sequence[Path], timeout: float, *, connect_timeout: float = 300.0
+    ) -> None:
+        self._files = [
+            files[start : start + _BATCH_SIZE]
+            for start in range(0, len(files), _BATCH_SIZE)
+        ]
+        self._timeout = timeout
+        self._connect_timeout = connect_timeout
+        self._pending = deque(range(len(self._files)))
+        self._deadlines: dict[int, float] = {}
+        self._results: dict[int, list[FactsT]] = {}
+        self._closed = False
+        self._taken = False
+        self._idle_deadline = time.monotonic() + connect_timeout
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        """Get the number of batches."""
+        return len(self._files)
+
+    def files(self, batch: int) -> Sequence[Path]:
+        """Get the files of a batch."""
+        return self._files[batch]
+
+    def take(self) -> int | None:
+        """Assign the next batch, or return None once all batches are done."""
+        with self._cond:
+            while not self._closed and len(self._results) < len(self._files):
+                self._requeue_expired()
+                while self._pending:
+                    if (batch := self._pending.popleft()) not in self._results:
+                        self._deadlines[batch] = time.monotonic() + self._timeout
+                        self._taken = True
+                        return batch
+                self._cond.wait(self._next_deadline())
+            return None
+
+    def complete(self, batch: int, facts: list[FactsT]) -> None:
+        """Store the result of a batch. Results of reassigned batches are dropped."""
+        with self._cond:
+            if len(facts) != len(self._files[batch]):
+                msg = f"Expected {len(self._files[batch])} results for batch {batch}"
+                raise ValueError(msg)
+            self._results.setdefault(batch, facts)
+            self._drop_deadline(batch)
+            self._cond.notify_all()
+
+    def release(self, batch: int) -> None:
+        """Reassign the batch of a lost worker."""
+        with self._cond:
+            if batch not in self._results and self._drop_deadline(batch):
+                self._pending.appendleft(batch)
+                self._cond.notify_all()
+
+    def result(self, batch: int) -> list[FactsT]:
+        """Wait for the result of a batch.
+
+        :raises NoWorkerError: If no worker holds a batch for the connect timeout.
+        """
+        with self._cond:
+            while batch not in self._results:
+                self._requeue_expired()
+                if self._deadlines:
+                    self._cond.wait(self._next_deadline())
+                elif (wait := self._idle_deadline - time.monotonic()) > 0:
+                    self._cond.wait(wait)
+                elif self._taken:
+                    msg = "All workers were lost, no worker took a batch in time"
+                    raise NoWorkerError(msg)
+                else:
+                    msg = "No worker connected to the coordinator in time"
+                    raise NoWorkerError(msg)
+            return self._results[batch]
+
+    def close(self) -> None:
+        """Release all waiting workers."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _requeue_expired(self) -> None:
+        now = time.monotonic()
+        for batch, deadline in list(self._deadlines.items()):
+            if deadline <= now:
+                logger.warning("Reassigning batch %d after worker timeout", batch)
+                self._drop_deadline(batch)
+                self._pending.appendleft(batch)
+                self._cond.notify_all()
+
+    def _drop_deadline(self, batch: int) -> bool:
+        """Forget the deadline of a batch, whether it was held by a worker.
+
+        Once no worker holds a batch, the connect timeout starts again.
+        """
+        held = self._deadlines.pop(batch, None) is not None
+        if not self._deadlines:
+            self._idle_deadline = time.monotonic() + self._connect_timeout
+        return held
+
+    def _next_deadline(self) -> float | None:
+        if not self._deadlines:
+            return None
+        return max(0.0, min(self._deadlines.values()) - time.monotonic())
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serve batches to a single worker connection."""
+
+    server: _Server
+
+    def handle(self) -> None:
+        """Answer requests until all batches are done or the worker is lost."""
+        batches = self.server.batches
+        batch: int | None = None
+        try:
+            while (request := _recv(self.rfile)) is not None:
+                if request["op"] == "result":
+                    batches.complete(request["batch"], request["files"])
+                batch = batches.take()
+                if batch is None:
+                    _send(self.wfile, {"op": "done"})
+                    return
+                _send(
+                    self.wfile,
+                    {
+                        "op": "batch",
+                        "batch": batch,
+                        "files": [path.as_posix() for path in batches.files(batch)],
+                        "read": self.server.read_options.to_json(),
+                    },
+                )
+        except (OSError, ValueError, KeyError):
+            logger.warning("Lost worker %s", self.client_address, exc_info=True)
+        finally:
+            if batch is not None:
+                batches.release(batch)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    """TCP server handing out batches of files to workers."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self, address: tuple[str, int], batches: _Batches, read_options: ReadOptions
+    ) -> None:
+        """Initialize the server for a set of batches, read with `read_options`."""
+        self.batches = batches
+        self.read_options = read_options
+        super().__init__(address, _Handler)
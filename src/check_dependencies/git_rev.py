@@ -0,0 +1,332 @@
+"""Check the files of a git revision, read from the object store without a checkout.
+
+``check-dependencies --rev REF PATH...`` checks the Python files below the paths
+as they are in the revision ``REF``, e.g. a release tag or an old branch. The
+working tree and the index are never touched. ``git ls-tree`` enumerates the
+files and a single long-lived ``git cat-file --batch`` process reads their
+content, the pyproject.toml files and their includes. Sources are found and
+resolved as files of the working tree (see `main.source_imports`), their paths
+are reported relative to the working directory as in a checkout.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import posixpath
+import subprocess
+from dataclasses import replace
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from check_dependencies.main import (
+    RegistryEntry,
+    _imports_outputs,
+    _project_outputs,
+    _ProjectRegistry,
+    _verbose_app_info,
+    source_imports,
+)
+from check_dependencies.outputs import FileError, InfoMessage, NoPyprojectError
+from check_dependencies.pyproject_toml import (
+    NoPyProjectFileError,
+    PyProjectToml,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Container, Generator, Iterator, Sequence
+    from typing import BinaryIO
+
+    from check_dependencies.app_config import AppConfig
+    from check_dependencies.outputs import Output
+    from check_dependencies.stats import Statistics
+
+logger = logging.getLogger("check_dependencies.git_rev")
+
+_PYPROJECT_TOML = "pyproject.toml"
+_SYMLINK_MODE = b"120000"
+_CHUNK_SIZE = 64 * 1024
+
+
+class GitError(Exception):
+    """A git command failed, e.g. for an unknown revision."""
+
+
+class GitRevision:
+    """Files of a git revision, read from the object store of the repository."""
+
+    def __init__(self, rev: str, cwd: Path | None = None) -> None:
+        """Resolve the tree of a revision.
+
+        :param rev: Revision, e.g. a tag, branch or commit.
+        :param cwd: Directory in the repository the paths are relative to,
+            defaults to the working directory.
+        :raises GitError: If the directory is not in a git repository or the
+            revision is unknown.
+        """
+        self.rev = rev
+        self.cwd = Path.cwd() if cwd is None else cwd
+        top_level, prefix = _git(
+            "rev-parse", "--show-toplevel", "--show-prefix", cwd=self.cwd
+        ).splitlines()
+        self.top_level = Path(top_level)
+        self.prefix = prefix
+        """Path of the working directory relative to the top level, e.g. ``src/``."""
+        try:
+            self.tree = _git(
+                "rev-parse", "--verify", "--quiet", f"{rev}^{{tree}}", cwd=self.cwd
+            ).strip()
+        except GitError:
+            msg = f"Unknown git revision: {rev}"
+            raise GitError(msg) from None
+        self._batch: subprocess.Popen[bytes] | None = None
+
+    def close(self) -> None:
+        """Stop the ``git cat-file`` process."""
+        if (batch := self._batch) is not None:
+            self._batch = None
+            batch.communicate()
+
+    def source_files(self, roots: Sequence[Path]) -> Iterator[tuple[Path, str]]:
+        """Yield the path and object id of every Python file below the roots.
+
+        Files given as roots are yielded whatever their suffix. Symbolic links and
+        submodules are skipped.
+
+        :param roots: Files and directories, relative to the working directory.
+        """
+        proc = subprocess.Popen(  # noqa: S603
+            ["git", "ls-tree", "-r", "-z", self.tree, "--", *map(str, roots)],  # noqa: S607
+            cwd=self.cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        files = {os.fsencode(root.as_posix()) for root in roots}
+        try:
+            for entry in _split_null(_stream(proc.stdout)):
+                info, _, name = entry.partition(b"\t")
+                mode, kind, oid = info.split()
+                if (
+                    kind == b"blob"
+                    and mode != _SYMLINK_MODE
+                    and (name.endswith(b".py") or name in files)
+                ):
+                    yield Path(os.fsdecode(name)), oid.decode()
+            if proc.wait():
+                msg = f"Could not list the files of {self.rev}"
+                raise GitError(msg)
+        finally:
+            if proc.poll() is None:  # Not read to the end
+                proc.kill()
+            proc.communicate()
+
+    def kind(self, path: Path) -> str | None:
+        """Get the object type of a path (``blob`` or ``tree``), None if missing."""
+        if (name := self._name(path)) is None:
+            return None
+        return self._read(name)[0]
+
+    def read(self, path: Path) -> bytes | None:
+        """Get the content of a file, None if it is not in the revision.
+
+        :param path: Path relative to the working directory, or absolute.
+        """
+        if (name := self._name(path)) is None:
+            return None
+        kind, content = self._read(name)
+        return content if kind == "blob" else None
+
+    def blob(self, oid: str) -> bytes:
+        """Get the content of a blob listed by `source_files`."""
+        kind, content = self._read(oid)
+        if kind != "blob":
+            msg = f"Object {oid} of {self.rev} is not a file"
+            raise GitError(msg)
+        return content
+
+    def _name(self, path: Path) -> str | None:
+        """Get the ``TREE:PATH`` object name of a path, None if outside the tree."""
+        if path.is_absolute():
+            relative = os.path.relpath(path, self.top_level)
+            name = posixpath.normpath(Path(relative).as_posix())
+        else:
+            name = posixpath.normpath(self.prefix + path.as_posix())
+        if name == ".":
+            return self.tree
+        if name.startswith("../") or name == ".." or "\n" in name:
+            return None
+        return f"{self.tree}:{name}"
+
+    def _read(self, name: str) -> tuple[str | None, bytes]:
+        """Get the type and content of an object, the type is None if missing."""
+        batch = self._start()
+        stdin, stdout = _stream(batch.stdin), _stream(batch.stdout)
+        try:
+            stdin.write(f"{name}\n".encode())
+            stdin.flush()
+            header = stdout.readline().split()
+            if len(header) != len(["oid", "type", "size"]):
+                return None, b""  # missing or ambiguous
+            size = int(header[2])
+            content = stdout.read(size + 1)[:size]
+        except (OSError, ValueError) as exc:
+            msg = f"Could not read {name} from git cat-file: {exc}"
+            raise GitError(msg) from exc
+        return header[1].decode(), content
+
+    def _start(self) -> subprocess.Popen[bytes]:
+        if self._batch is None:
+            self._batch = subprocess.Popen(
+                ["git", "cat-file", "--batch"],  # noqa: S607
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        return self._batch
+
+
+def revision_outputs(
+    app_cfg: AppConfig,
+    revision: GitRevision,
+    *,
+    kinds: Container[type[Output]] | None = None,
+    stats: Statistics | None = None,
+) -> Generator[Output, None, None]:
+    """Yield the outputs of the files of a revision, see `main.yield_outputs`.
+
+    :param app_cfg: Files and directories to check, relative to the working
+        directory, and the options of the check.
+    :param revision: Revision to read the files and configs from.
+    :param kinds: Kinds of module outputs to yield, None for all.
+    :param stats: Count the files and imports of every project.
+    """
+    yield from InfoMessage.from_iter(_verbose_app_info(app_cfg), verbose=True)
+    kinds_ = {
+        root: revision.kind(root)
+        for root in (_relative(root, revision.cwd) for root in app_cfg.file_names)
+    }
+    for root, kind in kinds_.items():
+        if kind is None:
+            yield FileError(root, f"Not found in {revision.rev}")
+    if not (roots := [root for root, kind in kinds_.items() if kind is not None]):
+        return
+    dirs = {root for root, kind in kinds_.items() if kind == "tree"}
+    try:
+        registry = _RevisionRegistry(
+            replace(app_cfg, file_names=roots), revision, dirs, stats
+        )
+    except NoPyProjectFileError as exc:
+        logger.error("Could not find pyproject.toml for %s", exc)  # noqa: TRY400
+        yield NoPyprojectError(str(exc))
+        return
+
+    options = app_cfg.read_options
+    for path, oid in revision.source_files(roots):
+        try:
+            current = registry.get(path)
+        except NoPyProjectFileError as exc:  # pragma: no cover
+            yield NoPyprojectError(str(exc))
+            return
+        imports = source_imports(revision.blob(oid), path, options)
+        yield from _imports_outputs(path, imports, current, kinds)
+
+    yield from _project_outputs(registry)
+
+
+class _RevisionRegistry(_ProjectRegistry):
+    """Project registry with the pyproject.toml files of a revision."""
+
+    def __init__(
+        self,
+        app_cfg: AppConfig,
+        revision: GitRevision,
+        dirs: Container[Path],
+        stats: Statistics | None = None,
+    ) -> None:
+        """Initialize the registry.
+
+        :param dirs: Root directories of the config, the other roots are files.
+        """
+        self.revision = revision
+        self._dirs = dirs
+        self._pyprojects: dict[Path, Path] = {}
+        self._configs: dict[Path, str | None] = {}
+        super().__init__(app_cfg, None, stats)
+
+    def get(self, path: Path) -> RegistryEntry:
+        """Get the entry of the nearest pyproject.toml of a file or root directory."""
+        return self.for_pyproject(
+            self._pyproject(path if path in self._dirs else path.parent)
+        )
+
+    def _pyproject(self, directory: Path) -> Path:
+        """Get the nearest pyproject.toml of a directory, see `get_pyproject_toml`."""
+        if (cached := self._pyprojects.get(directory)) is not None:
+            return cached
+        for parent in chain([directory], directory.parents):
+            if self._config(result := parent / _PYPROJECT_TOML) is not None:
+                self._pyprojects[directory] = result
+                return result
+        raise NoPyProjectFileError(directory.as_posix())
+
+    def _config(self, path: Path) -> str | None:
+        """Get the text of a config file of the revision, None if it is missing."""
+        if path not in self._configs:
+            content = self.revision.read(path)
+            self._configs[path] = None if content is None else content.decode("utf-8")
+        return self._configs[path]
+
+    def _read_config(self, path: Path) -> str:
+        if (text := self._config(path)) is None:
+            msg = f"{path.as_posix()} not found in {self.revision.rev}"
+            raise FileNotFoundError(msg)
+        return text
+
+    def _new_config(self, pyproject_pth: Path) -> RegistryEntry:
+        proj = PyProjectToml.for_path(
+            pyproject_pth, include_dev=self.include_dev, read=self._read_config
+        )
+        return RegistryEntry.from_project(self.app_cfg, proj, self.stats, self.shared)
+
+
+def _relative(path: Path, cwd: Path) -> Path:
+    """Get a path relative to the working directory, as listed by ``git ls-tree``."""
+    return Path(os.path.relpath(path, cwd)) if path.is_absolute() else path
+
+
+def _split_null(stream: BinaryIO) -> Iterator[bytes]:
+    """Split a stream at null bytes, e.g. the output of ``git ls-tree -z``."""
+    rest = b""
+    for chunk in iter(functools.partial(stream.read, _CHUNK_SIZE), b""):
+        *entries, rest = (rest + chunk).split(b"\0")
+        yield from entries
+    if rest:
+        yield rest
+
+
+def _stream(stream: BinaryIO | None) -> BinaryIO:
+    """Get a pipe of a git process."""
+    if stream is None:  # pragma: no cover
+        msg = "git process without a pipe"
+        raise GitError(msg)
+    return stream
+
+
+def _git(*args: str, cwd: Path) -> str:
+    try:
+        proc = subprocess.run(  # noqa: S603
+            ["git", *args],  # noqa: S607
+            cwd=cwd,
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        msg = f"git {args[0]} failed: {exc.stderr.strip() or exc}"
+        raise GitError(msg) from None
+    except OSError as exc:
+        msg = f"Could not run git: {exc}"
+        raise GitError(msg) from None
+    return proc.stdout
@@ -0,0 +1,110 @@
+"""GitHub Actions annotations of the outputs, capped and summarized.
+
+GitHub only shows a few annotations per step and job and drops the others, so
+a large run buries its first findings. `GithubAnnotations` annotates at most
+``max_file_annotations`` findings per file and ``max_annotations`` in total,
+followed by a notice with the number of findings not annotated. All findings are
+counted per check and written as a markdown table to the job summary (the
+``$GITHUB_STEP_SUMMARY`` file), so nothing is lost. Both are produced in the
+same pass over the outputs, without keeping them.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from check_dependencies.outputs import Output, OutputConfig
+
+DEFAULT_MAX_ANNOTATIONS = 50
+DEFAULT_MAX_FILE_ANNOTATIONS = 10
+
+
+class GithubAnnotations:
+    """Format outputs as GitHub annotations, up to a number per file and in total."""
+
+    def __init__(
+        self,
+        *,
+        max_annotations: int = DEFAULT_MAX_ANNOTATIONS,
+        max_file_annotations: int = DEFAULT_MAX_FILE_ANNOTATIONS,
+        summary: Path | None = None,
+    ) -> None:
+        """Initialize without findings.
+
+        :param max_annotations: Annotate at most this many findings, 0 for all.
+        :param max_file_annotations: Annotate at most this many findings of the
+            same file, 0 for all.
+        :param summary: Markdown file to append the summary to in `end`, e.g.
+            ``$GITHUB_STEP_SUMMARY``.
+        :raises ValueError: If a limit is negative.
+        """
+        if min(max_annotations, max_file_annotations) < 0:
+            msg = (
+                "annotation limits must be at least 0, got "
+                f"{max_annotations} and {max_file_annotations}"
+            )
+            raise ValueError(msg)
+        self.max_annotations = max_annotations
+        self.max_file_annotations = max_file_annotations
+        self.summary = summary
+        self.annotations = 0
+        self._file_annotations: Counter[Path | None] = Counter()
+        self._findings: Counter[OutputConfig] = Counter()
+        self._not_annotated: Counter[OutputConfig] = Counter()
+
+    def __call__(self, output: Output) -> Iterator[str]:
+        """Get the annotations of an output, unless a limit is reached."""
+        file = output.annotation_file
+        for line in output.as_github():
+            self._findings[output.config] += 1
+            if self._annotate(file):
+                yield line
+            else:
+                self._not_annotated[output.config] += 1
+
+    def end(self) -> Iterator[str]:
+        """Get the notice of the findings not annotated and write the summary.
+
+        Call after all outputs were formatted.
+        """
+        if not_annotated := self._not_annotated.total():
+            yield (
+                f"::notice title=check-dependencies::{not_annotated} more finding(s)"
+                f" not annotated (at most {self.max_file_annotations} per file and"
+                f" {self.max_annotations} in total), see the job summary"
+            )
+        if self.summary is not None:
+            with self.summary.open("a", encoding="utf-8") as stream:
+                stream.writelines(f"{line}\n" for line in self.summary_lines())
+
+    def summary_lines(self) -> Iterator[str]:
+        """Get the markdown table of the findings per check."""
+        yield "### check-dependencies"
+        yield ""
+        if not self._findings:
+            yield "No findings."
+            return
+        yield "| Check | Description | Findings | Not annotated |"
+        yield "| --- | --- | ---: | ---: |"
+        for config, count in self._findings.most_common():
+            yield (
+                f"| `{config.name}` | {config.description} | {count}"
+                f" | {self._not_annotated[config]} |"
+            )
+        yield ""
+
+    def _annotate(self, file: Path | None) -> bool:
+        """Count an annotation of a file, if it is within the limits."""
+        if (max_ := self.max_annotations) and self.annotations >= max_:
+            return False
+        max_file = self.max_file_annotations
+        if max_file and file is not None and self._file_annotations[file] >= max_file:
+            return False
+        self.annotations += 1
+        self._file_annotations[file] += 1
+        return True
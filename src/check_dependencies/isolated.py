@@ -0,0 +1,153 @@
+"""Run a function in a child process with a wall-clock timeout and a memory cap.
+
+A single child process serves all calls, so its start-up cost is paid once and
+the throughput stays close to calling the function directly. The timeout of a
+call starts once the child is ready, it does not include the start-up. If a call
+does not return in time or the child dies (e.g. a parser crash or the memory limit), the
+child is killed and the next call starts a new one.
+
+The child is started with ``spawn``, so the function must be importable by name.
+It exits when the parent closes its end of the pipe, e.g. when the `Isolated`
+object is garbage collected.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # ty:ignore[invalid-assignment]
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+logger = logging.getLogger("check_dependencies.isolated")
+
+_R = TypeVar("_R")
+_CONTEXT = multiprocessing.get_context("spawn")
+_JOIN_TIMEOUT = 5.0
+_START_TIMEOUT = 60.0
+_READY = "ready"
+
+
+class IsolationError(Exception):
+    """A call did not return within its timeout or its child process died."""
+
+
+class Isolated(Generic[_R]):
+    """Call a function in a child process, one call at a time."""
+
+    def __init__(
+        self,
+        function: Callable[..., _R],
+        *,
+        timeout: float | None = None,
+        memory_limit: int | None = None,
+    ) -> None:
+        """Initialize without starting the child process yet.
+
+        :param function: Module level function to call, its arguments and results
+            must be picklable.
+        :param timeout: Seconds to wait for the result of a call, None to wait
+            for ever.
+        :param memory_limit: Maximum address space of the child process in bytes
+            (not supported on Windows).
+        """
+        self.function = function
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._lock = threading.Lock()
+        self._child: tuple[BaseProcess, Connection] | None = None
+
+    def __call__(self, *args: Any) -> _R:  # noqa: ANN401
+        """Call the function in the child process.
+
+        :raises IsolationError: If the call timed out or the child process died.
+        """
+        with self._lock:
+            started = self._child is None
+            process, conn = self._child = self._child or self._start()
+            try:
+                if started:
+                    self._wait_ready(conn)
+                conn.send(args)
+                if not conn.poll(self.timeout):
+                    self.close()
+                    msg = f"No result within {self.timeout}s"
+                    raise IsolationError(msg)
+                ok, result = conn.recv()
+            except (EOFError, OSError):
+                process.join(_JOIN_TIMEOUT)
+                self.close()
+                msg = f"Child process died (exit code {process.exitcode})"
+                raise IsolationError(msg) from None
+            if not ok:
+                raise IsolationError(result)
+            return result
+
+    def close(self) -> None:
+        """Stop the child process, a later call starts a new one."""
+        if self._child is None:
+            return
+        process, conn = self._child
+        self._child = None
+        conn.close()
+        if process.is_alive():
+            process.kill()
+        process.join(_JOIN_TIMEOUT)
+
+    def _start(self) -> tuple[BaseProcess, Connection]:
+        conn, child_conn = _CONTEXT.Pipe()
+        process = _CONTEXT.Process(
+            target=_serve,
+            args=(child_conn, self.function, self.memory_limit),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        logger.debug("Started isolated process %d", process.pid)
+        return process, conn
+
+    def _wait_ready(self, conn: Connection) -> None:
+        """Wait until a new child process has started, e.g. imported the function.
+
+        :raises EOFError: If the child process died while starting.
+        :raises IsolationError: If the child process did not start in time.
+        """
+        if not conn.poll(_START_TIMEOUT):
+            self.close()
+            msg = f"Child process not ready within {_START_TIMEOUT}s"
+            raise IsolationError(msg)
+        if conn.recv() != _READY:  # pragma: no cover
+            self.close()
+            msg = "Child process did not start"
+            raise IsolationError(msg)
+
+
+def _serve(
+    conn: Connection, function: Callable[..., Any], memory_limit: int | None
+) -> None:
+    """Answer calls until the parent closes the pipe.
+
+    Exceptions are sent as ``(False, description)``, results as ``(True, result)``.
+    """
+    if memory_limit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    conn.send(_READY)
+    while True:
+        try:
+            args = conn.recv()
+        except EOFError:
+            return
+        try:
+            answer = True, function(*args)
+        except Exception as exc:  # noqa: BLE001
+            answer = False, ": ".join(filter(None, (type(exc).__name__, str(exc))))
+        conn.send(answer)
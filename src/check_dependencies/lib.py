@@ -2,37 +2,75 @@
 
 from __future__ import annotations
 
+import functools
 import logging
+import threading
+import weakref
 from dataclasses import dataclass
 from functools import total_ordering
 from itertools import groupby, takewhile
 from operator import itemgetter
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, ClassVar
 
 if TYPE_CHECKING:
-    from collections.abc import Collection, Iterable
+    from collections.abc import Callable, Collection, Iterable, Iterator
 
 logger = logging.getLogger("check_dependencies.lib")
 
+_INTERN_LOCK = threading.Lock()
+_PACKAGE_BITS_CACHE_SIZE = 16 * 1024
+
 
 @dataclass(frozen=True)
 @total_ordering
 class Module:
-    """Describe an imported Module."""
+    """Describe an imported Module.
 
-    name: str
-    raw: bool = False
+    Modules are interned while in use: creating a module with the same name twice
+    returns the same instance, with its hash and parent modules computed once.
+    """
 
-    def __post_init__(self) -> None:
-        """Initialize the Module."""
-        object.__setattr__(self, "name", self.name.strip())
+    __slots__ = ("__weakref__", "_hash", "_parents", "name", "raw")
+    name: str
+    raw: bool
+
+    _interned: ClassVar[weakref.WeakValueDictionary[tuple[str, bool], Module]] = (
+        weakref.WeakValueDictionary()
+    )
+
+    def __new__(cls, name: str, *, raw: bool = False) -> Module:  # noqa: PYI034
+        """Get the interned module of a name."""
+        key = name.strip(), raw
+        if (module := cls._interned.get(key)) is not None:
+            return module
+        parent, dot, _ = key[0].rpartition(".")
+        parents = Module(parent).parents if dot and not raw else ()
+        with _INTERN_LOCK:
+            if (module := cls._interned.get(key)) is not None:
+                return module
+            module = super().__new__(cls)
+            object.__setattr__(module, "name", key[0])
+            object.__setattr__(module, "raw", raw)
+            object.__setattr__(module, "_hash", hash(key))
+            object.__setattr__(module, "_parents", (module, *parents))
+            cls._interned[key] = module
+        return module
+
+    def __init__(self, name: str, *, raw: bool = False) -> None:
+        """Initialize the Module, see `__new__`."""
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Intern unpickled modules as well."""
+        return _module, (self.name, self.raw)
 
     def __hash__(self) -> int:
         """Hash based on the module name."""
-        return hash((self.name, self.raw))
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
         """Compare with another module."""
+        if self is other:
+            return True
         if not isinstance(other, Module):
             return NotImplemented
         return (self.name, self.raw) == (other.name, other.raw)
@@ -52,23 +90,20 @@ class Module:
         return f"Module({self.name!r})"
 
     @property
-    def parents(self) -> list[Module]:
+    def parents(self) -> tuple[Module, ...]:
         """Get the parent modules of the current module.
 
         **Examples:**
         >>> Module("numpy.linalg").parents
-        [Module("numpy.linalg"), Module("numpy")]
+        (Module('numpy.linalg'), Module('numpy'))
         >>> Module("sklearn").parents
-        [Module("sklearn")]
+        (Module('sklearn'),)
         >>> Module("PIL.Image").parents
-        [Module("PIL.Image"), Module("PIL")]
+        (Module('PIL.Image'), Module('PIL'))
 
-        :returns: A list of parent modules.
+        :returns: The module itself followed by its parent modules.
         """
-        if self.raw:
-            return [self]
-        parts = self.name.split(".")
-        return [Module(".".join(parts[:i])) for i in range(len(parts), 0, -1)]
+        return self._parents
 
 
 @dataclass(frozen=True)
@@ -79,16 +114,38 @@ class Package:
     The original name is preserved for display purposes, while the canonical name is
     used for hashing and comparison, ensuring that different representations of the
     same package are treated as equal.
+
+    Packages are interned by name while in use.
     """
 
-    __slots__ = ("_original", "canonical")
+    __slots__ = ("__weakref__", "_original", "canonical")
     _original: str
     canonical: str
 
+    _interned: ClassVar[weakref.WeakValueDictionary[str, Package]] = (
+        weakref.WeakValueDictionary()
+    )
+
+    def __new__(cls, package: str) -> Package:  # noqa: PYI034
+        """Get the interned package of a name."""
+        original = package.strip()
+        if (pkg := cls._interned.get(original)) is not None:
+            return pkg
+        with _INTERN_LOCK:
+            if (pkg := cls._interned.get(original)) is not None:
+                return pkg
+            pkg = super().__new__(cls)
+            object.__setattr__(pkg, "_original", original)
+            object.__setattr__(pkg, "canonical", _canonical(original))
+            cls._interned[original] = pkg
+        return pkg
+
     def __init__(self, package: str) -> None:
-        """Initialize the Package dataclass."""
-        object.__setattr__(self, "_original", package.strip())
-        object.__setattr__(self, "canonical", _canonical(package))
+        """Initialize the Package dataclass, see `__new__`."""
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Intern unpickled packages as well."""
+        return Package, (self._original,)
 
     def __hash__(self) -> int:
         """Use only canonical name for hashing."""
@@ -96,6 +153,8 @@ class Package:
 
     def __eq__(self, other: object) -> bool:
         """Compare with another package or a package name."""
+        if self is other:
+            return True
         if isinstance(other, Package):
             return self.canonical == other.canonical
         if isinstance(other, str):
@@ -129,11 +188,18 @@ class Package:
 
 
 class Packages:
-    """Translation layer to map between packages and modules."""
+    """Translation layer to map between packages and modules.
+
+    Sets of packages can be stored as bitsets (Python ints) of dense ids, see `bits`.
+    The ids are only valid for the instance which assigned them: packages with the
+    same canonical name share an id, the mapped packages get the first ones.
+    """
 
     _modules: dict[Package, set[Module]]
     _packages: dict[Module, set[Package]]
     _orig_packages: tuple[tuple[Package, Module], ...]
+    package_bits: Callable[[Module], int]
+    """Get the packages for a given module as a bitset (see `packages`), cached."""
 
     def __init__(
         self,
@@ -165,6 +231,12 @@ class Packages:
                 sorted(self._orig_packages, key=itemgetter(1)), key=itemgetter(1)
             )
         }
+        self._ids: dict[str, int] = {}
+        self._by_id: list[Package] = []
+        self.bits(self._modules)
+        self.package_bits = functools.lru_cache(maxsize=_PACKAGE_BITS_CACHE_SIZE)(
+            self._package_bits
+        )
 
     def __or__(self, other: Packages) -> Packages:
         """Combine two Packages instances."""
@@ -193,7 +265,59 @@ class Packages:
                 return self._packages[parent]
         return {Package(parent.name)}
 
+    def bit(self, package: Package) -> int:
+        """Get the bitset of a single package, assign it an id on first use."""
+        if (id_ := self._ids.get(package.canonical)) is None:
+            with _INTERN_LOCK:
+                if (id_ := self._ids.get(package.canonical)) is None:
+                    id_ = self._ids[package.canonical] = len(self._by_id)
+                    self._by_id.append(package)
+        return 1 << id_
+
+    def bits(self, packages: Iterable[Package]) -> int:
+        """Get the bitset of packages.
+
+        **Examples:**
+        >>> packages = Packages()
+        >>> packages.bits([Package("a"), Package("A")]) == packages.bit(Package("a"))
+        True
+        """
+        bits = 0
+        for package in packages:
+            bits |= self.bit(package)
+        return bits
+
+    def from_bits(self, bits: int) -> list[Package]:
+        """Get the packages of a bitset, one per canonical name, ordered by id.
+
+        The name of a mapped package is used if it has several spellings.
+        """
+        return [self._by_id[id_] for id_ in bit_ids(bits)]
+
+    def _package_bits(self, module: Module) -> int:
+        """Get the packages for a given module as a bitset, see `package_bits`."""
+        return self.bits(self.packages(module))
+
+
+def bit_ids(bits: int) -> Iterator[int]:
+    """Get the ids of a bitset in increasing order.
+
+    **Examples:**
+    >>> list(bit_ids(0b10110))
+    [1, 2, 4]
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _module(name: str, raw: bool) -> Module:  # noqa: FBT001
+    """Get a module from positional arguments, for unpickling."""
+    return Module(name, raw=raw)
+
 
+@functools.lru_cache(maxsize=4096)
 def _canonical(name: str) -> str:
     """Normalize a package name: lowercase and replace hyphens with underscores.
 
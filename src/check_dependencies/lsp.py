@@ -0,0 +1,305 @@
+"""Language server publishing diagnostics for unsaved editor buffers.
+
+``check-dependencies lsp [OPTIONS]`` speaks the Language Server Protocol over
+stdio. Options are the same as for a check; file names are taken from the opened
+documents. The text of every open document is kept in memory (full document
+sync). On each change only the changed document is parsed again, from its text,
+and resolved against a project registry kept across changes. Configs are only
+parsed again when a config file changes on disk.
+
+`MissingModule` (error) and `UnknownModule` (warning) outputs are published as
+diagnostics. While a document has syntax errors, its last diagnostics are kept.
+Changes arriving faster than they are checked are coalesced, so every document is
+checked at most once per batch of pending messages.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from check_dependencies.app_config import AppConfig
+from check_dependencies.cache import Cache
+from check_dependencies.main import _ProjectRegistry, _resolve_imports, parse_imports
+from check_dependencies.outputs import (
+    FileError,
+    MissingModule,
+    UnknownModule,
+    WithModule,
+)
+from check_dependencies.pyproject_toml import NoPyProjectFileError, get_pyproject_toml
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping, Sequence
+
+    from check_dependencies.pyproject_toml import PyProjectToml
+
+logger = logging.getLogger("check_dependencies.lsp")
+
+MessageT = dict[str, Any]
+
+_SOURCE = "check-dependencies"
+_SEVERITY = {"error": 1, "warning": 2}
+_TEXT_DOCUMENT_SYNC_FULL = 1
+_METHOD_NOT_FOUND = -32601
+# Line breaks of Python sources, `str.splitlines` also splits at e.g. form feeds.
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+def main(
+    argv: Sequence[str],
+    *,
+    stdin: BinaryIO | None = None,
+    stdout: BinaryIO | None = None,
+) -> int:
+    """Serve the language server protocol until the client exits.
+
+    :param argv: Options of a check, without file names.
+    :param stdin: Stream to read messages from, defaults to stdin.
+    :param stdout: Stream to write messages to, defaults to stdout.
+    :returns: 0 if the client shut the server down before exiting, else 1.
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    app_cfg = AppConfig.from_argv([*argv, os.curdir])
+    server = Server(app_cfg, lambda message: write_message(stdout, message))
+
+    messages: queue.Queue[MessageT | None] = queue.Queue()
+    threading.Thread(target=_read_all, args=(stdin, messages), daemon=True).start()
+    while (message := messages.get()) is not None:
+        batch = [message]
+        while not messages.empty() and (message := messages.get()) is not None:
+            batch.append(message)
+        if not server.handle_batch(batch) or message is None:
+            break
+    return 0 if server.shutdown else 1
+
+
+class Server:
+    """Documents, warm project registry and message handlers of the server."""
+
+    def __init__(self, app_cfg: AppConfig, send: Callable[[MessageT], None]) -> None:
+        """Initialize the server.
+
+        :param app_cfg: Check options; the file names are ignored.
+        :param send: Send a message to the client.
+        """
+        self.app_cfg = dataclasses.replace(app_cfg, file_names=[])
+        self.send = send
+        self.shutdown = False
+        self.documents: dict[str, str] = {}
+        self._cache = Cache()
+        self._registry = _ProjectRegistry(self.app_cfg, self._cache)
+        self._projects: dict[Path, PyProjectToml] = {}
+        self._published: dict[str, list[MessageT]] = {}
+
+    def handle_batch(self, messages: Iterable[MessageT]) -> bool:
+        """Handle messages, then check every changed document once.
+
+        :returns: False once the client sent ``exit``.
+        """
+        changed: dict[str, None] = {}
+        for message in messages:
+            method = message.get("method")
+            if method == "exit":
+                return False
+            uri = message.get("params", {}).get("textDocument", {}).get("uri")
+            if method in ("textDocument/didOpen", "textDocument/didSave"):
+                # New pyproject.toml files may have been created meanwhile.
+                get_pyproject_toml.cache_clear()
+            if self._handle(message):
+                changed[uri] = None
+        for uri in changed:
+            self.check(uri)
+        return True
+
+    def check(self, uri: str) -> None:
+        """Publish the diagnostics of an open document, if they changed."""
+        if (text := self.documents.get(uri)) is None or (path := _path(uri)) is None:
+            return
+        diagnostics = self.diagnostics(path, text)
+        if diagnostics is not None and diagnostics != self._published.get(uri):
+            self._publish(uri, diagnostics)
+
+    def diagnostics(self, path: Path, text: str) -> list[MessageT] | None:
+        """Get the diagnostics of a document, or None if it cannot be parsed."""
+        try:
+            imports = parse_imports(text, path, self.app_cfg.parser)
+        except (SyntaxError, ValueError):
+            return None
+        # Pathological buffers are reported as by the CLI, see `main.source_imports`
+        except RecursionError as exc:
+            return [_file_error(FileError(path, f"Too deeply nested to parse: {exc}"))]
+        except MemoryError:
+            return [_file_error(FileError(path, "Out of memory while parsing"))]
+        try:
+            entry = self._registry.for_pyproject(self._pyproject(path))
+        except (NoPyProjectFileError, OSError, ValueError) as exc:
+            logger.warning("No project for %s: %s", path, exc)
+            return []
+        entry.forget(path)  # Replace the imports of the previous text
+        lines = _LINE_BREAK.split(text)
+        return [
+            _diagnostic(output, lines)
+            for output in _resolve_imports(
+                path, imports, entry, (MissingModule, UnknownModule)
+            )
+        ]
+
+    def _pyproject(self, path: Path) -> Path:
+        """Get the pyproject.toml of a file, dropping its entry if it changed."""
+        pyproject_pth = get_pyproject_toml(path.parent)
+        proj = self._cache.pyproject(
+            pyproject_pth, include_dev=self.app_cfg.include_dev
+        )
+        if self._projects.get(pyproject_pth) is not proj:
+            self._projects[pyproject_pth] = proj
+            self._registry.entry.pop(pyproject_pth, None)
+        return pyproject_pth
+
+    def _handle(self, message: Mapping[str, Any]) -> bool:
+        """Handle a single message, return whether a document changed."""
+        method, params = message.get("method"), message.get("params", {})
+        if "id" in message and method is not None:
+            self._respond(message["id"], method)
+            return False
+        uri = params.get("textDocument", {}).get("uri")
+        if method == "textDocument/didOpen":
+            self.documents[uri] = params["textDocument"]["text"]
+            return True
+        if method == "textDocument/didChange" and params.get("contentChanges"):
+            self.documents[uri] = params["contentChanges"][-1]["text"]
+            return True
+        if method == "textDocument/didSave":
+            return uri in self.documents
+        if method == "textDocument/didClose":
+            self.documents.pop(uri, None)
+            if self._published.get(uri):
+                self._publish(uri, [])
+            self._published.pop(uri, None)
+        return False
+
+    def _respond(self, id_: int | str, method: str) -> None:
+        if method == "initialize":
+            result: Any = {
+                "capabilities": {
+                    "textDocumentSync": {
+                        "openClose": True,
+                        "change": _TEXT_DOCUMENT_SYNC_FULL,
+                        "save": True,
+                    }
+                },
+                "serverInfo": {"name": _SOURCE},
+            }
+        elif method == "shutdown":
+            self.shutdown = True
+            result = None
+        else:
+            self.send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": _METHOD_NOT_FOUND,
+                        "message": f"Unsupported method {method}",
+                    },
+                }
+            )
+            return
+        self.send({"jsonrpc": "2.0", "id": id_, "result": result})
+
+    def _publish(self, uri: str, diagnostics: list[MessageT]) -> None:
+        self._published[uri] = diagnostics
+        self.send(
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/publishDiagnostics",
+                "params": {"uri": uri, "diagnostics": diagnostics},
+            }
+        )
+
+
+def read_message(stream: BinaryIO) -> MessageT | None:
+    """Read a single message with a ``Content-Length`` header.
+
+    :returns: The message, or None at the end of the stream.
+    """
+    length = None
+    while line := stream.readline():
+        if not line.strip():
+            if length is None:
+                continue
+            return json.loads(stream.read(length))
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return None
+
+
+def write_message(stream: BinaryIO, message: Mapping[str, Any]) -> None:
+    """Write a single message with a ``Content-Length`` header."""
+    body = json.dumps(message, separators=(",", ":")).encode()
+    stream.write(b"Content-Length: %d\r\n\r\n%b" % (len(body), body))
+    stream.flush()
+
+
+def _read_all(stream: BinaryIO, messages: queue.Queue[MessageT | None]) -> None:
+    try:
+        while (message := read_message(stream)) is not None:
+            messages.put(message)
+    except (OSError, ValueError):
+        logger.exception("Could not read message")
+    finally:
+        messages.put(None)
+
+
+def _diagnostic(output: WithModule, lines: Sequence[str]) -> MessageT:
+    location = output.location
+    return {
+        "range": {
+            "start": _position(lines, location.lineno, location.col_offset),
+            "end": _position(lines, location.end_lineno, location.end_col_offset),
+        },
+        "severity": _SEVERITY[output.level],
+        "source": _SOURCE,
+        "code": output.name(verbose=True).strip(),
+        "message": f"module {output.module.name}",
+    }
+
+
+def _file_error(output: FileError) -> MessageT:
+    start = {"line": 0, "character": 0}
+    return {
+        "range": {"start": start, "end": start},
+        "severity": _SEVERITY["error"],
+        "source": _SOURCE,
+        "code": output.name(verbose=True).strip(),
+        "message": output.message,
+    }
+
+
+def _position(lines: Sequence[str], lineno: int, col_offset: int) -> MessageT:
+    """Convert an `ast` position (UTF-8 byte column) to a position (UTF-16 units)."""
+    line = lines[lineno - 1] if 0 < lineno <= len(lines) else ""
+    prefix = line.encode()[:col_offset].decode(errors="ignore")
+    return {
+        "line": max(lineno - 1, 0),
+        "character": len(prefix.encode("utf-16-le")) // 2,
+    }
+
+
+def _path(uri: str) -> Path | None:
+    parsed = urlparse(uri)
+    if parsed.scheme != "file":
+        return None
+    return Path(url2pathname(parsed.path))
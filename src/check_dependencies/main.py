@@ -3,42 +3,72 @@
 from __future__ import annotations
 
 import ast
+import functools
 import logging
+import mmap
+import os
+import time
+from collections import Counter, deque
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING
+from itertools import chain
+from typing import TYPE_CHECKING, Any
 
-from check_dependencies.app_config import ProjectConfig
-from check_dependencies.lib import Module, Package
+from check_dependencies.app_config import (
+    DEFAULT_READ_OPTIONS,
+    Parser,
+    ProjectConfig,
+)
+from check_dependencies.isolated import Isolated, IsolationError
+from check_dependencies.lib import Module, bit_ids
 from check_dependencies.outputs import (
     ExtraPackage,
     FileError,
+    ImportScope,
     InfoMessage,
+    Location,
     MissingModule,
     NoPyprojectError,
     OkDependency,
     Output,
     UnknownModule,
+    WithModule,
 )
 from check_dependencies.pyproject_toml import (
     NoPyProjectFileError,
     PyProjectToml,
     get_pyproject_toml,
 )
+from check_dependencies.scanner import scan_imports
 
 if TYPE_CHECKING:
-    from collections.abc import Collection, Generator, Iterable, Iterator
+    from collections.abc import Container, Generator, Hashable, Iterable, Iterator
     from pathlib import Path
 
-    from check_dependencies.app_config import AppConfig
+    from check_dependencies.app_config import AppConfig, ReadOptions
+    from check_dependencies.cache import Cache
+    from check_dependencies.lib import Package, Packages
+    from check_dependencies.stats import ProjectStats, Statistics
 
 logger = logging.getLogger("check_dependencies")
 
+ImportsT = list[tuple[Module, Location]] | FileError
+
 
-def yield_outputs(app_cfg: AppConfig) -> Generator[Output, None, None]:
+def yield_outputs(
+    app_cfg: AppConfig,
+    cache: Cache | None = None,
+    *,
+    kinds: Container[type[Output]] | None = None,
+    stats: Statistics | None = None,
+) -> Generator[Output, None, None]:
     """Yield output objects of missing/unused imports.
 
     :param app_cfg: Application configuration used to determine which files to
         scan and how to resolve and report project dependencies.
+    :param cache: Reuse configs and imports of unchanged files from earlier runs.
+    :param kinds: Kinds of module outputs to yield, e.g. `AppConfig.output_kinds`,
+        None for all. Imports are resolved and their usage recorded regardless.
+    :param stats: Count the files and imports of every project.
     """
     # Map pyproject path → per-project accumulator.
     # A regular dict is used because the factory would need the AppConfig; we
@@ -48,12 +78,40 @@ def yield_outputs(app_cfg: AppConfig) -> Generator[Output, None, None]:
     # the same project.
     yield from InfoMessage.from_iter(_verbose_app_info(app_cfg), verbose=True)
     try:
-        registry = _ProjectRegistry(app_cfg)
+        registry = _ProjectRegistry(app_cfg, cache, stats)
     except NoPyProjectFileError as exc:
         logger.error("Could not find pyproject.toml for %s", exc)  # noqa: TRY400
         yield NoPyprojectError(str(exc))
         return
 
+    for src_pth in iter_source_files(app_cfg):
+        try:
+            current = registry.get(src_pth)
+        except NoPyProjectFileError as exc:  # pragma: no cover
+            yield NoPyprojectError(str(exc))
+            return
+
+        yield from _source_imports_iter(
+            src_pth, current, cache, app_cfg.read_options, kinds
+        )
+
+    yield from _project_outputs(registry)
+
+
+def iter_source_files(app_cfg: AppConfig) -> Iterator[Path]:
+    """Yield all source files to scan, in a deterministic order without duplicates.
+
+    With ``changed_first``, the most recently modified files come first.
+
+    :param app_cfg: Application configuration with the files and directories to scan.
+    """
+    if app_cfg.changed_first:
+        yield from sorted(_iter_source_files(app_cfg), key=_modified_time, reverse=True)
+    else:
+        yield from _iter_source_files(app_cfg)
+
+
+def _iter_source_files(app_cfg: AppConfig) -> Iterator[Path]:
     seen: set[Path] = set()
     for src_pth in (
         src_pth
@@ -62,52 +120,194 @@ def yield_outputs(app_cfg: AppConfig) -> Generator[Output, None, None]:
         if src_pth not in seen
     ):
         seen.add(src_pth)
-        try:
-            current = registry.get(src_pth)
-        except NoPyProjectFileError as exc:  # pragma: no cover
-            yield NoPyprojectError(str(exc))
-            return
+        yield src_pth
+
+
+def _modified_time(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:  # Reported when the file is read
+        return 0
+
 
-        yield from _source_imports_iter(src_pth, current)
+def limit_findings(
+    outputs: Generator[Output, None, None], max_findings: int | None
+) -> Generator[Output, None, None]:
+    """Stop after a number of findings, i.e. outputs failing the check.
 
-    # After processing all files, check for superfluous requirements in each project.
+    Outputs are yielded while the files are scanned, so the remaining files are
+    not scanned and the unused dependencies (checked after all files) are not
+    checked. A warning tells which checks were skipped.
+
+    :param outputs: Outputs, e.g. of `yield_outputs`, closed when stopping.
+    :param max_findings: Number of findings to stop after (at least 1), None for
+        all.
+    :raises ValueError: If `max_findings` is less than 1.
+    """
+    if max_findings is None:
+        yield from outputs
+        return
+    if max_findings < 1:
+        msg = f"max_findings must be at least 1, got {max_findings}"
+        raise ValueError(msg)
+    findings = 0
+    for output in outputs:
+        yield output
+        findings += bool(output.exit_code)
+        if findings >= max_findings:
+            break
+    else:
+        return
+    outputs.close()
+    skipped = (
+        "the remaining unused dependencies were"
+        if isinstance(output, ExtraPackage)
+        else "the remaining files and unused dependencies were"
+    )
+    logger.warning(
+        "Stopped after %d finding(s) (--max-findings), %s not checked",
+        findings,
+        skipped,
+    )
+
+
+def _project_outputs(registry: _ProjectRegistry) -> Iterator[Output]:
+    """Check for superfluous requirements in each project after all files are done."""
     for entry in registry.entry.values():
         yield from InfoMessage.from_iter(
             _verbose_project_info(entry.project_cfg), verbose=False
         )
-        for pkg in entry.get_superfluous_dependencies():
+        unused = entry.get_superfluous_dependencies()
+        if entry.stats is not None:
+            entry.stats.unused = unused
+        for pkg in unused:
             yield ExtraPackage(entry.project_cfg, pkg)
 
 
+@dataclass
+class References:
+    """Packages imported by source files, with the contribution of every file.
+
+    Every package is reference-counted by the files importing it, so the imports
+    of a single file can be forgotten (and re-added after a change) without
+    resolving all other files again. Packages are stored as bitsets of the ids
+    of an index (see `Packages.bits`).
+    """
+
+    index: Packages
+    _counts: Counter[int] = field(default_factory=Counter, init=False)
+    _files: dict[Path, int] = field(default_factory=dict, init=False)
+    _bits: int = field(default=0, init=False)
+    _restored: int = field(default=0, init=False)
+
+    def add(self, path: Path, packages: int = 0) -> None:
+        """Record that a file was seen and imports the given packages (bitset)."""
+        contribution = self._files.get(path, 0)
+        new = packages & ~contribution
+        self._files[path] = contribution | new
+        if new:
+            self._counts.update(bit_ids(new))
+            self._bits |= new
+
+    def forget(self, path: Path) -> None:
+        """Remove the contribution of a file."""
+        for id_ in bit_ids(self._files.pop(path, 0)):
+            self._counts[id_] -= 1
+            if not self._counts[id_]:
+                del self._counts[id_]
+                self._bits &= ~(1 << id_)
+
+    def restore(self, packages: Iterable[Package]) -> None:
+        """Merge packages recorded elsewhere, e.g. by another shard."""
+        self._restored |= self.index.bits(packages)
+
+    def reset(self) -> None:
+        """Forget all files and packages."""
+        self._counts.clear()
+        self._files.clear()
+        self._bits = self._restored = 0
+
+    @property
+    def has_files(self) -> bool:
+        """Check if any file was recorded."""
+        return bool(self._files)
+
+    @property
+    def bits(self) -> int:
+        """Get all packages imported by at least one file as a bitset."""
+        return self._bits | self._restored
+
+    @property
+    def packages(self) -> frozenset[Package]:
+        """Get all packages imported by at least one file."""
+        return frozenset(self.index.from_bits(self.bits))
+
+
 @dataclass
 class OptionalDependencyConfig:
     """Configuration for optional dependencies."""
 
     path: Path
     dependencies: set[Package]
-    _used: bool = field(default=False, init=False)
-    _imported: set[Package] = field(default_factory=set, init=False)
+    packages: Packages
+    """Index of the project, the bitsets of imports are made of its ids."""
+    _references: References = field(init=False)
+    _restored_used: bool = field(default=False, init=False)
+
+    def __post_init__(self) -> None:
+        """Record the imports in the index of the project."""
+        self._references = References(self.packages)
+
+    @functools.cached_property
+    def dependency_bits(self) -> int:
+        """Get the dependencies as a bitset."""
+        return self.packages.bits(self.dependencies)
 
     def handles(self, path: Path) -> bool:
         """Check if this optional dependency handles the given path."""
         return path.is_relative_to(self.path)
 
-    def register_imports(self, packages: Iterable[Package]) -> set[Package]:
-        """Register imports for this optional dependency."""
-        self._used = True
-        seen = set(packages)
-        self._imported.update(seen)
-        return self.dependencies
+    def register_imports(self, path: Path, packages: int) -> int:
+        """Register imports (bitset) of a file, return the dependencies (bitset)."""
+        self._references.add(path, packages)
+        return self.dependency_bits
 
-    def mark_used(self) -> None:
-        """Mark this optional dependency as used."""
-        self._used = True
+    def mark_used(self, path: Path) -> None:
+        """Mark this optional dependency as used by a file."""
+        self._references.add(path)
+
+    def forget(self, path: Path) -> None:
+        """Forget the imports and usage of a file."""
+        self._references.forget(path)
+
+    @property
+    def used(self) -> bool:
+        """Check if any source file handled by this optional dependency was seen."""
+        return self._restored_used or self._references.has_files
+
+    @property
+    def imported(self) -> frozenset[Package]:
+        """Get all packages imported by source files handled by this dependency."""
+        return self._references.packages
+
+    def reset(self) -> None:
+        """Forget all imports and usage."""
+        self._restored_used = False
+        self._references.reset()
+
+    def restore(self, *, used: bool, imported: Iterable[Package]) -> None:
+        """Merge usage recorded elsewhere, e.g. by another shard."""
+        self._restored_used |= used
+        self._references.restore(imported)
 
     def superfluous_dependencies(self) -> set[Package]:
         """Get the set of superfluous dependencies for this optional dependency."""
-        if not self._used:
+        if not self.used:
             return set()
-        return self.dependencies - self._imported
+        imported = self._references.bits
+        return {
+            dep for dep in self.dependencies if not imported & self.packages.bit(dep)
+        }
 
 
 @dataclass
@@ -116,80 +316,136 @@ class RegistryEntry:
 
     project_cfg: ProjectConfig
     optionals: list[OptionalDependencyConfig]
-    _seen: set[Package] = field(default_factory=set, init=False)
+    stats: ProjectStats | None = None
+    _references: References = field(init=False)
+    _files: dict[Path, _FileDependencies] = field(default_factory=dict, init=False)
+
+    def __post_init__(self) -> None:
+        """Record the imports in the index of the project."""
+        self._references = References(self.project_cfg.packages)
 
     @classmethod
-    def from_project(cls, app_cfg: AppConfig, proj: PyProjectToml) -> RegistryEntry:
-        """Get an instance from a project and app config."""
+    def from_project(
+        cls,
+        app_cfg: AppConfig,
+        proj: PyProjectToml,
+        stats: Statistics | None = None,
+        shared: dict[Hashable, Any] | None = None,
+    ) -> RegistryEntry:
+        """Get an instance from a project and app config.
+
+        :param stats: Statistics to count the files and imports of the project in.
+        :param shared: Parts of the configs shared by identical projects, see
+            `ProjectConfig.from_config`.
+        """
+        project_cfg = ProjectConfig.from_config(app_cfg, proj, shared)
         return cls(
-            project_cfg=ProjectConfig.from_config(app_cfg, proj),
+            project_cfg=project_cfg,
             optionals=[
-                OptionalDependencyConfig(proj.path.parent / path, set(od))
+                OptionalDependencyConfig(
+                    proj.path.parent / path, set(od), project_cfg.packages
+                )
                 for path, od in proj.optional_dependencies_cfg.items()
             ],
+            stats=None if stats is None else stats.for_project(project_cfg),
         )
 
-    def _matched_optionals(self, path: Path) -> Iterable[OptionalDependencyConfig]:
-        return (option for option in self.optionals if option.handles(path))
+    def _file(self, path: Path) -> _FileDependencies:
+        """Get the optional dependencies of a file, matched once per path."""
+        if (deps := self._files.get(path)) is None:
+            cfg = self.project_cfg
+            deps = self._files[path] = _FileDependencies(
+                tuple(option for option in self.optionals if option.handles(path)),
+                cfg.packages.bits(
+                    package
+                    for dep_path, packages in cfg.optional_dependencies.items()
+                    if path.is_relative_to(cfg.path.parent / dep_path)
+                    for package in packages
+                ),
+            )
+        return deps
 
     def mark_used(self, path: Path) -> None:
         """Mark all associated dependency groups as used."""
-        for option in self._matched_optionals(path):
-            option.mark_used()
-
-    def _add_imports(self, path: Path, packages: Collection[Package]) -> None:
-        """Update the additional dependencies for this registry entry."""
-        seen = set(packages)
-        for option in self._matched_optionals(path):
-            seen -= option.register_imports(packages)
-        self._seen.update(seen)
+        for option in self._file(path).optionals:
+            option.mark_used(path)
+
+    @property
+    def seen(self) -> frozenset[Package]:
+        """Get all imported packages not handled by an optional dependency."""
+        return self._references.packages
+
+    def restore(self, seen: Iterable[Package]) -> None:
+        """Merge imported packages recorded elsewhere, e.g. by another shard."""
+        self._references.restore(seen)
+
+    def forget(self, path: Path) -> None:
+        """Forget the imports of a file, e.g. before resolving it again."""
+        self._references.forget(path)
+        for option in self.optionals:
+            option.forget(path)
+
+    def reset(self) -> None:
+        """Forget all imports, e.g. to resolve all files again."""
+        self._references.reset()
+        for option in self.optionals:
+            option.reset()
+
+    def _add_imports(self, path: Path, packages: int) -> None:
+        """Update the additional dependencies (bitset) for this registry entry."""
+        seen = packages
+        for option in self._file(path).optionals:
+            seen &= ~option.register_imports(path, packages)
+        self._references.add(path, seen)
 
     def get_superfluous_dependencies(self) -> list[Package]:
         """Get the set of superfluous dependencies for this registry entry."""
         # Expected dependencies are all [project.dependencies] + optional dependencies
-        expected = set(self.project_cfg.defined_dependencies) | {
-            dep
-            for option in self.optionals
-            for dep in option.superfluous_dependencies()
-        }
-        used = self._seen.union(self.project_cfg.known_extra)
+        expected = chain(
+            self.project_cfg.defined_dependencies,
+            *(option.superfluous_dependencies() for option in self.optionals),
+        )
+        used = self._references.bits | self.project_cfg.known_extra_bits
+        bit = self.project_cfg.packages.bit
         # Superfluous dependencies are all unused expected dependencies (from configs)
-        return sorted(expected - used)
-
-    def _optional_dependencies(self, path: Path) -> list[Package]:
-        cfg = self.project_cfg
-        project_path = cfg.path.parent
-        return [
-            package
-            for dep_path, packages in cfg.optional_dependencies.items()
-            if path.is_relative_to(project_path / dep_path)
-            for package in packages
-        ]
-
-    def _additional_dependencies(self, path: Path) -> set[Package]:
-        """Get the set of additional dependencies for this source file."""
-        return set(self._optional_dependencies(path))
+        return sorted({pkg for pkg in expected if not used & bit(pkg)})
 
     def is_known_module(self, file: Path, module: Module) -> bool:
         """Check if a module is a known module and update the used."""
         cfg = self.project_cfg
-        pkg_ = cfg.packages.packages(module)
-        self._add_imports(file, pkg_)
+        packages = cfg.packages.package_bits(module)
+        self._add_imports(file, packages)
         return bool(
             any(parent in cfg.known_missing for parent in module.parents)
-            or pkg_.intersection(cfg.allowed_dependencies)
-            or pkg_.intersection(self._additional_dependencies(file))
+            or packages & (cfg.allowed_bits | self._file(file).additional)
         )
 
 
+@dataclass(frozen=True)
+class _FileDependencies:
+    """Optional dependencies matching a source file."""
+
+    optionals: tuple[OptionalDependencyConfig, ...]
+    additional: int
+
+
 class _ProjectRegistry:
     """Registry of dependencies for a project, with formatters for output."""
 
-    def __init__(self, app_cfg: AppConfig) -> None:
+    def __init__(
+        self,
+        app_cfg: AppConfig,
+        cache: Cache | None = None,
+        stats: Statistics | None = None,
+    ) -> None:
         """Initialize ProjectRegistry."""
         self.app_cfg = app_cfg
         self.include_dev = app_cfg.include_dev
+        self.cache = cache
+        self.stats = stats
         self.entry: dict[Path, RegistryEntry] = {}
+        self.shared: dict[Hashable, Any] = {}
+        """Parts of the configs shared by identical projects."""
 
         # Pre-populate registry to fail fast if pyproject.toml files are missing.
         for path in app_cfg.file_names:
@@ -197,7 +453,12 @@ class _ProjectRegistry:
 
     def get(self, path: Path) -> RegistryEntry:
         """Get the set of packages associated with a given path."""
-        pyproject_pth = get_pyproject_toml(path if path.is_dir() else path.parent)
+        return self.for_pyproject(
+            get_pyproject_toml(path if path.is_dir() else path.parent)
+        )
+
+    def for_pyproject(self, pyproject_pth: Path) -> RegistryEntry:
+        """Get the entry for a known pyproject.toml path."""
         if pyproject_pth not in self.entry:
             self.entry[pyproject_pth] = self._new_config(pyproject_pth)
 
@@ -205,8 +466,11 @@ class _ProjectRegistry:
 
     def _new_config(self, pyproject_pth: Path) -> RegistryEntry:
         """Get the config associated with a given path."""
-        proj = PyProjectToml.for_path(pyproject_pth, include_dev=self.include_dev)
-        return RegistryEntry.from_project(self.app_cfg, proj)
+        if self.cache is not None:
+            proj = self.cache.pyproject(pyproject_pth, include_dev=self.include_dev)
+        else:
+            proj = PyProjectToml.for_path(pyproject_pth, include_dev=self.include_dev)
+        return RegistryEntry.from_project(self.app_cfg, proj, self.stats, self.shared)
 
 
 def _verbose_app_info(app_cfg: AppConfig) -> Iterable[str]:
@@ -229,28 +493,228 @@ def _verbose_project_info(project_cfg: ProjectConfig) -> Iterable[str]:
         yield f"PROVIDES {package} -> [{modules}]"
 
 
-def _source_imports_iter(file: Path, current: RegistryEntry) -> Iterator[Output]:
+def _source_imports_iter(
+    file: Path,
+    current: RegistryEntry,
+    cache: Cache | None = None,
+    options: ReadOptions = DEFAULT_READ_OPTIONS,
+    kinds: Container[type[Output]] | None = None,
+) -> Iterator[Output]:
     """Find missing imports in a Python file.
 
     :param file: Python file to analyze
     :param current: Registry entry for the current project.
+    :param cache: Reuse the imports of the file if it did not change.
+    :param options: How to read the file and find its imports.
+    :param kinds: Kinds of module outputs to yield, None for all.
     :yields: Tuple of status, module and import statement
     """
-    try:
-        parsed = ast.parse(file.read_bytes(), filename=file.as_posix())
-    except (SyntaxError, OSError, PermissionError, FileNotFoundError) as exc:
-        logger.warning("Could not parse %s", file, exc_info=False)
-        yield FileError(file, str(exc))
+    imports = (
+        cache.imports(file, options)
+        if cache is not None
+        else _file_imports(file, options)
+    )
+    yield from _imports_outputs(file, imports, current, kinds)
+
+
+def _imports_outputs(
+    file: Path,
+    imports: ImportsT,
+    current: RegistryEntry,
+    kinds: Container[type[Output]] | None = None,
+) -> Iterator[Output]:
+    """Resolve the imports of a file, or yield the error if it cannot be parsed."""
+    if isinstance(imports, FileError):
+        if current.stats is not None:
+            current.stats.add_error()
+        yield imports
         return
+    yield from _resolve_imports(file, imports, current, kinds)
+
+
+def _file_imports(
+    file: Path, options: ReadOptions = DEFAULT_READ_OPTIONS, size: int | None = None
+) -> ImportsT:
+    """Get the imports of a file, or the error if it cannot be parsed.
+
+    With a parse timeout or memory limit, the file is read in an isolated process.
+    """
+    if not options.isolated:
+        return _read_file_imports(file, options, size)
+    try:
+        return _isolated(options)(file, options, size)
+    except IsolationError as exc:
+        logger.warning("Could not parse %s: %s", file, exc)
+        return FileError(file, f"Parsing aborted: {exc}")
+
+
+def _read_file_imports(file: Path, options: ReadOptions, size: int | None) -> ImportsT:
+    try:
+        return read_imports(file, options, size)
+    except (
+        SyntaxError,
+        OSError,
+        PermissionError,
+        FileNotFoundError,
+        FileBudgetError,
+    ) as exc:
+        message = str(exc)
+    except RecursionError as exc:
+        message = f"Too deeply nested to parse: {exc}"
+    except MemoryError:
+        message = "Out of memory while parsing"
+    logger.warning("Could not parse %s", file, exc_info=False)
+    return FileError(file, message)
+
+
+def source_imports(
+    source: str | bytes, file: Path, options: ReadOptions = DEFAULT_READ_OPTIONS
+) -> ImportsT:
+    """Get the imports of source code, or the error if it cannot be parsed.
+
+    The source is handled like a file of the same size (see `read_imports`), but
+    is never read from disk nor parsed in an isolated process.
+
+    :param source: Source code, e.g. an editor buffer or a generated module.
+    :param file: Path of the source, used in the outputs and error messages.
+    :param options: How to find the imports.
+    """
+    try:
+        _check_size(len(source), options)
+        if len(source) <= options.large_file_size:
+            return parse_imports(source, file, options.parser)
+        return _scan_large_source(source, options)
+    except (SyntaxError, ValueError, FileBudgetError) as exc:
+        message = str(exc)
+    except RecursionError as exc:
+        message = f"Too deeply nested to parse: {exc}"
+    except MemoryError:
+        message = "Out of memory while parsing"
+    logger.warning("Could not parse %s", file, exc_info=False)
+    return FileError(file, message)
+
+
+@functools.lru_cache(maxsize=1)
+def _isolated(options: ReadOptions) -> Isolated[ImportsT]:
+    """Get the isolated process reading files with `options`.
+
+    The process of the previous options exits once they are evicted.
+    """
+    return Isolated(
+        _read_file_imports,
+        timeout=options.parse_timeout,
+        memory_limit=options.parse_memory,
+    )
+
+
+class FileBudgetError(Exception):
+    """A file is too large or takes too long to find its imports."""
+
+
+def read_imports(
+    file: Path, options: ReadOptions = DEFAULT_READ_OPTIONS, size: int | None = None
+) -> list[tuple[Module, Location]]:
+    """Read and parse a Python file and return all of its imports.
+
+    Files larger than ``options.large_file_size`` are memory-mapped and scanned
+    without parsing them, within ``options.large_file_timeout`` seconds.
+
+    :param file: Python file to analyze
+    :param options: How to read the file and find its imports.
+    :param size: Size of the file from the stat data of its discovery, if known.
+    :raises SyntaxError: If the file cannot be parsed.
+    :raises OSError: If the file cannot be read.
+    :raises FileBudgetError: If the file exceeds the size or time budget.
+    """
+    with file.open("rb") as stream:
+        if size is None:
+            size = os.fstat(stream.fileno()).st_size
+        _check_size(size, options)
+        if size <= options.large_file_size:
+            return parse_imports(stream.read(), file, options.parser)
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            return _scan_large_source(source, options)
+
+
+def _check_size(size: int, options: ReadOptions) -> None:
+    if options.max_file_size is not None and size > options.max_file_size:
+        msg = f"File size {size} exceeds the maximum of {options.max_file_size}"
+        raise FileBudgetError(msg)
+
+
+def _scan_large_source(
+    source: str | bytes | mmap.mmap, options: ReadOptions
+) -> list[tuple[Module, Location]]:
+    """Scan a large source (e.g. a memory-mapped file), never parse it."""
+    deadline = time.monotonic() + options.large_file_timeout
+    try:
+        imports = scan_imports(source, deadline)
+    except TimeoutError as exc:
+        msg = f"Large file not scanned within {options.large_file_timeout}s"
+        raise FileBudgetError(msg) from exc
+    if imports is None:
+        msg = "Large file cannot be scanned for certain and is not parsed"
+        raise FileBudgetError(msg)
+    return imports
+
+
+def parse_imports(
+    source: str | bytes, file: Path, parser: Parser = Parser.AST
+) -> list[tuple[Module, Location]]:
+    """Parse Python source code and return all of its imports.
+
+    Only the locations of the import statements are kept, the syntax tree is
+    freed when this returns.
+
+    :param source: Source code, e.g. an unsaved editor buffer.
+    :param file: Path of the source, used in error messages.
+    :param parser: Engine to find the imports with. The fast scanner falls back to
+        `ast` for sources it cannot handle for certain.
+    :raises SyntaxError: If the source cannot be parsed.
+    """
+    if parser is Parser.FAST and (imports := scan_imports(source)) is not None:
+        return imports
+    parsed = ast.parse(source, filename=file.as_posix())
+    return [
+        (module, Location.of(stmt, scope))
+        for module, stmt, scope in scoped_imports(
+            parsed.body, calls=_may_call_import(source)
+        )
+    ]
+
+
+def _resolve_imports(
+    file: Path,
+    imports: Iterable[tuple[Module, Location]],
+    current: RegistryEntry,
+    kinds: Container[type[Output]] | None = None,
+) -> Iterator[Output]:
+    """Resolve the imports of a parsed file against its project.
+
+    :param file: Python file the imports were read from.
+    :param imports: Imported modules with the locations of their statements.
+    :param current: Registry entry for the current project.
+    :param kinds: Kinds of outputs to build, None for all. The usage of the other
+        imports is recorded without building their outputs.
+    """
     current.mark_used(file)
-    for module, stmt in _imports_iter(parsed.body):
+    stats = current.stats
+    n_imports = 0
+    for module, location in imports:
+        kind: type[WithModule]
         if module.raw:
-            yield UnknownModule(file, stmt, module)
-            continue
-        if current.is_known_module(file, module):
-            yield OkDependency(file, stmt, module)
+            kind = UnknownModule
+        elif current.is_known_module(file, module):
+            kind = OkDependency
         else:
-            yield MissingModule(file, stmt, module)
+            kind = MissingModule
+        if stats is not None:
+            stats.add_import(module)
+            n_imports += 1
+        if kinds is None or kind in kinds:
+            yield kind(file, location, module, current.project_cfg)
+    if stats is not None:
+        stats.add_file(file, n_imports)
 
 
 def _imports_iter(body: list[ast.stmt]) -> Iterator[tuple[Module, ast.AST]]:
@@ -258,9 +722,87 @@ def _imports_iter(body: list[ast.stmt]) -> Iterator[tuple[Module, ast.AST]]:
 
     :param body: List of AST statements to analyze.
     """
-    for node in (node for stmt in body for node in ast.walk(stmt)):
-        yield from _imports(node)
-        yield from _import_builtin(node)
+    for module, stmt, _ in scoped_imports(body):
+        yield module, stmt
+
+
+# Nodes with statements among their children, visited even if no call can import.
+_STMT_CONTAINERS = (ast.stmt, ast.excepthandler, getattr(ast, "match_case", ast.stmt))
+_TRY = (ast.Try, getattr(ast, "TryStar", ast.Try))
+_IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+
+
+def scoped_imports(
+    body: list[ast.stmt], *, calls: bool = True
+) -> Iterator[tuple[Module, ast.AST, ImportScope]]:
+    """Yield all imports of a body of code with their scope, in a single pass.
+
+    Imports are yielded in the order of `ast.walk` over every statement, but only
+    subtrees that can contain imports are visited.
+
+    :param body: List of AST statements to analyze.
+    :param calls: Whether expressions can contain ``__import__`` calls, see
+        `_may_call_import`. If not, only statements are visited.
+    """
+    for stmt in body:
+        todo: deque[tuple[ast.AST, ImportScope]] = deque([(stmt, ImportScope.MODULE)])
+        while todo:
+            node, scope = todo.popleft()
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                for module, _ in _imports(node):
+                    yield module, node, scope
+                continue
+            if isinstance(node, ast.Call):
+                for module, _ in _import_builtin(node):
+                    yield module, node, scope
+            inner_scope, inner_fields = _inner_scope(node)
+            for name in node._fields:
+                value = getattr(node, name, None)
+                child_scope = scope | inner_scope if name in inner_fields else scope
+                for child in value if isinstance(value, list) else (value,):
+                    if isinstance(child, _STMT_CONTAINERS) or (
+                        calls and isinstance(child, ast.AST)
+                    ):
+                        todo.append((child, child_scope))
+
+
+def _may_call_import(source: str | bytes) -> bool:
+    """Cheap check whether a source can contain ``__import__`` calls.
+
+    Non-ASCII sources can spell identifiers in NFKC-equivalent characters.
+    """
+    if isinstance(source, bytes):
+        return b"__import__" in source or not source.isascii()
+    return "__import__" in source or not source.isascii()
+
+
+def _inner_scope(node: ast.AST) -> tuple[ImportScope, tuple[str, ...]]:
+    """Get the scope a node adds to some of its fields."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        return ImportScope.FUNCTION, ("body",)
+    if isinstance(node, ast.If) and _is_type_checking(node.test):
+        return ImportScope.TYPE_CHECKING, ("body",)
+    if isinstance(node, _TRY) and any(
+        _catches_import_error(handler.type) for handler in node.handlers
+    ):
+        return ImportScope.IMPORT_ERROR, ("body", "handlers")
+    return ImportScope.MODULE, ()
+
+
+def _is_type_checking(test: ast.expr) -> bool:
+    return (isinstance(test, ast.Name) and test.id == "TYPE_CHECKING") or (
+        isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING"
+    )
+
+
+def _catches_import_error(type_: ast.expr | None) -> bool:
+    if type_ is None:
+        return True
+    if isinstance(type_, ast.Tuple):
+        return any(map(_catches_import_error, type_.elts))
+    if isinstance(type_, ast.Name):
+        return type_.id in _IMPORT_ERRORS
+    return isinstance(type_, ast.Attribute) and type_.attr in _IMPORT_ERRORS
 
 
 def _imports(stmt: ast.AST) -> Iterable[tuple[Module, ast.AST]]:
@@ -0,0 +1,112 @@
+"""Buffered writing of output lines to stdout or a file.
+
+Formatters yield a few short lines per output; writing them one by one costs a
+system call per line once the stream is a pipe (e.g. to a CI log collector). An
+`OutputStream` joins the lines and writes them in chunks of about
+``buffer_size`` characters. On a terminal it writes the lines of every output as
+soon as they are formatted, see `FlushPolicy`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import sys
+from typing import TYPE_CHECKING
+
+from check_dependencies.app_config import DEFAULT_OUTPUT_BUFFER_SIZE, FlushPolicy
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from pathlib import Path
+    from typing import TextIO
+
+
+class OutputStream:
+    """Write output lines to a text stream, in chunks."""
+
+    def __init__(
+        self,
+        stream: TextIO,
+        *,
+        buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE,
+        flush: FlushPolicy = FlushPolicy.AUTO,
+    ) -> None:
+        """Initialize with an empty buffer.
+
+        :param stream: Stream to write to, it is not closed.
+        :param buffer_size: Write the buffered lines once they exceed this number
+            of characters.
+        :param flush: When to write the buffered lines, `FlushPolicy.AUTO` checks
+            if the stream is a terminal.
+        """
+        self.stream = stream
+        self.buffer_size = buffer_size
+        if flush == FlushPolicy.AUTO:
+            flush = FlushPolicy.OUTPUT if stream.isatty() else FlushPolicy.BUFFER
+        self.flush_policy = flush
+        self._lines: list[str] = []
+        self._size = 0
+        self.broken = False
+        """Whether the reader closed the pipe, nothing is written after that."""
+
+    def __call__(self, lines: Iterable[str]) -> None:
+        """Buffer the lines of an output, write them as given by the flush policy."""
+        buffer, size = self._lines, self._size
+        for line in lines:
+            buffer.append(line)
+            size += len(line) + 1
+        self._size = size
+        if size >= self.buffer_size or (
+            size and self.flush_policy == FlushPolicy.OUTPUT
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered lines and flush the stream.
+
+        :raises BrokenPipeError: Once, if the reader closed the pipe (e.g. the
+            output is piped to ``head``). Later lines are dropped.
+        """
+        if self.broken:
+            self._lines.clear()
+            self._size = 0
+            return
+        try:
+            if self._lines:
+                self._lines.append("")
+                self.stream.write("\n".join(self._lines))
+                self._lines.clear()
+                self._size = 0
+            self.stream.flush()
+        except BrokenPipeError:
+            self.broken = True
+            self._lines.clear()
+            self._size = 0
+            raise
+
+
+@contextlib.contextmanager
+def open_output(
+    path: Path | None,
+    *,
+    buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE,
+    flush: FlushPolicy = FlushPolicy.AUTO,
+) -> Iterator[OutputStream]:
+    """Write output lines to a file, or to stdout if no path is given.
+
+    The buffered lines are written when the context exits, also on errors.
+
+    :param path: File to write to, it is truncated.
+    :param buffer_size: See `OutputStream`.
+    :param flush: See `OutputStream`.
+    """
+    with (
+        contextlib.nullcontext(sys.stdout)
+        if path is None
+        else path.open("w", encoding="utf-8")
+    ) as stream:
+        output = OutputStream(stream, buffer_size=buffer_size, flush=flush)
+        try:
+            yield output
+        finally:
+            output.flush()
@@ -3,7 +3,10 @@
 from __future__ import annotations
 
 import abc
-import ast
+import enum
+import functools
+import json
+import urllib.parse
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import TYPE_CHECKING
@@ -11,12 +14,106 @@ from typing import TYPE_CHECKING
 from check_dependencies.lib import Module, Package
 
 if TYPE_CHECKING:
-    from collections.abc import Generator, Iterable, Iterator
+    import ast
+    from collections.abc import Generator, Iterable, Iterator, Sequence
 
     from check_dependencies.app_config import ProjectConfig
+    from check_dependencies.lib import Packages
 
 
 SeenT = set[tuple[type, Module | Package | Path | str]]
+LocationT = (
+    tuple[int, int, int | None, int | None]
+    | tuple[int, int, int | None, int | None, int]
+)
+
+_json_string = json.encoder.encode_basestring  # C accelerated if available
+_SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+_SARIF_VERSION = "2.1.0"
+_INFORMATION_URI = "https://github.com/schollm/check-dependencies"
+
+
+class ImportScope(enum.Flag):
+    """Guards around an import, see `main.scoped_imports`."""
+
+    MODULE = 0
+    TYPE_CHECKING = enum.auto()
+    """In the body of ``if TYPE_CHECKING:``."""
+    IMPORT_ERROR = enum.auto()
+    """In the body or a handler of a ``try`` statement catching ImportError."""
+    FUNCTION = enum.auto()
+    """In the body of a function or lambda."""
+
+
+@dataclass(frozen=True, slots=True)
+class Location:
+    """Source range of an import, kept instead of its syntax tree.
+
+    Lines are 1-based, columns are 0-based UTF-8 byte offsets as in `ast`.
+    """
+
+    lineno: int
+    col_offset: int
+    end_lineno: int
+    end_col_offset: int
+    scope: ImportScope | None = field(default=None, compare=False)
+    """Guards around the import, only known for sources parsed with `ast`."""
+
+    @classmethod
+    def of(cls, node: ast.AST, scope: ImportScope | None = None) -> Location:
+        """Get the location of a node, see `source_range`."""
+        return cls(*source_range(node), scope)
+
+
+_FILE_START = Location(1, 0, 1, 1)
+
+
+def dump_location(location: Location) -> LocationT:
+    """Get the (lineno, col_offset, end_lineno, end_col_offset) of a location.
+
+    The value of the scope is appended if it is known.
+    """
+    range_ = (
+        location.lineno,
+        location.col_offset,
+        location.end_lineno,
+        location.end_col_offset,
+    )
+    if location.scope is None:
+        return range_
+    return (*range_, location.scope.value)
+
+
+def load_location(location: Sequence[int | None]) -> Location:
+    """Get a location returned by `dump_location`.
+
+    Missing end positions default to a single character, as in `source_range`.
+    """
+    lineno, col_offset, end_lineno, end_col_offset, *scope = location
+    lineno, col_offset = lineno or 0, col_offset or 0
+    return Location(
+        lineno,
+        col_offset,
+        end_lineno or lineno,
+        end_col_offset or col_offset + 1,
+        ImportScope(scope[0]) if scope and scope[0] is not None else None,
+    )
+
+
+def source_range(stmt: ast.AST) -> tuple[int, int, int, int]:
+    """Get the (lineno, col_offset, end_lineno, end_col_offset) range of a statement.
+
+    Lines are 1-based, columns are 0-based UTF-8 byte offsets as in `ast`. Missing
+    end positions default to a single character.
+    """
+    lineno = getattr(stmt, "lineno", 0)
+    col_offset = getattr(stmt, "col_offset", 0) or 0
+    return (
+        lineno,
+        col_offset,
+        getattr(stmt, "end_lineno", lineno) or lineno,
+        getattr(stmt, "end_col_offset", 0) or col_offset + 1,
+    )
 
 
 @dataclass(frozen=True)
@@ -26,6 +123,7 @@ class OutputConfig:
     name: str
     short_name: str
     exit_code: int
+    description: str = ""
 
 
 @dataclass(frozen=True)
@@ -36,6 +134,11 @@ class Output(abc.ABC):
     def as_github(self) -> Iterator[str]:
         """Return a GitHub issue body for this output."""
 
+    @property
+    def annotation_file(self) -> Path | None:
+        """Get the file the GitHub issue of the output is annotated at, if any."""
+        return None
+
     @property
     @abc.abstractmethod
     def config(self) -> OutputConfig:
@@ -55,31 +158,193 @@ class Output(abc.ABC):
     def to_text(self, *, verbose: bool, show_all: bool, seen: SeenT) -> Iterable[str]:
         """Get the string representation of the Output."""
 
+    @abc.abstractmethod
+    def as_jsonl(self, *, verbose: bool) -> Iterator[str]:
+        """Get the JSON Lines record of the Output, see `json_record`."""
 
-def _github_issue(
-    output: Output, path: Path, stmt: ast.AST, msg: str, level: str = "error"
+    @abc.abstractmethod
+    def as_sarif(self) -> Iterator[str]:
+        """Get the SARIF result of the Output, see `sarif_result`."""
+
+
+def json_record(  # noqa: PLR0913
+    output: Output,
+    *,
+    file: Path | None = None,
+    location: Location | None = None,
+    module: Module | None = None,
+    package: str | None = None,
+    project: Path | None = None,
+    message: str | None = None,
 ) -> str:
-    check_name = output.name(verbose=True)
+    """Get a compact JSON object describing an output, as a single line.
+
+    The keys are always the same and in the same order: ``kind``, ``file``,
+    ``range`` (``[lineno, col_offset, end_lineno, end_col_offset]`` as in `ast`),
+    ``module``, ``package``, ``project`` (path of the ``pyproject.toml``),
+    ``message`` and ``exit_code``. Missing values are ``null``. The line is built
+    directly instead of from a dict, to stream millions of records quickly.
+    """
+    range_ = (
+        "null"
+        if location is None
+        else f"[{location.lineno},{location.col_offset},"
+        f"{location.end_lineno},{location.end_col_offset}]"
+    )
+    return (
+        f'{{"kind":"{type(output).__name__}",'
+        f'"file":{_json_path(file)},'
+        f'"range":{range_},'
+        f'"module":{"null" if module is None else _json_module(module)},'
+        f'"package":{"null" if package is None else _json_string(package)},'
+        f'"project":{_json_path(project)},'
+        f'"message":{"null" if message is None else _json_string(message)},'
+        f'"exit_code":{output.exit_code}}}'
+    )
+
+
+def _json_path(path: Path | None) -> str:
+    return "null" if path is None else _json_posix(path)
+
+
+# Outputs of the same files, modules and projects repeat, the caches are bounded
+# to keep the memory of a streamed run constant.
+@functools.lru_cache(maxsize=4096)
+def _json_posix(path: Path) -> str:
+    return _json_string(path.as_posix())
+
 
-    def _escape_prop(value: str) -> str:
-        return (
-            value.replace("%", "%25")
-            .replace("\r", "%0D")
-            .replace("\n", "%0A")
-            .replace(":", "%3A")
-            .replace(",", "%2C")
+@functools.lru_cache(maxsize=4096)
+def _json_module(module: Module) -> str:
+    return _json_string(module.name)
+
+
+@functools.lru_cache(maxsize=4096)
+def _sarif_uri(path: Path) -> str:
+    uri = path.as_uri() if path.is_absolute() else urllib.parse.quote(path.as_posix())
+    return _json_string(uri)
+
+
+@functools.lru_cache(maxsize=4096)
+def _package_names(packages: Packages, module: Module) -> str:
+    return ",".join(sorted(map(str, packages.packages(module))))
+
+
+def sarif_result(
+    output: Output,
+    message: str,
+    path: Path | None = None,
+    location: Location | None = None,
+) -> str:
+    """Get a SARIF result object of an output, as a single line.
+
+    The region uses the 1-based columns of the UTF-8 byte offsets, which are the
+    character columns for ASCII lines. Like `json_record`, the line is built
+    directly to stream many results quickly.
+    """
+    if path is None:
+        locations = ""
+    else:
+        region = (
+            ""
+            if location is None
+            else f',"region":{{"startLine":{location.lineno},'
+            f'"startColumn":{location.col_offset + 1},'
+            f'"endLine":{location.end_lineno},'
+            f'"endColumn":{location.end_col_offset + 1}}}'
+        )
+        locations = (
+            f',"locations":[{{"physicalLocation":{{'
+            f'"artifactLocation":{{"uri":{_sarif_uri(path)}}}{region}}}}}]'
         )
+    kind = type(output)
+    return (
+        f'{{"ruleId":"{kind.__name__}","ruleIndex":{_SARIF_RULE_INDEX[kind]},'
+        f'"level":"{_sarif_level(output.config)}",'
+        f'"message":{{"text":{_json_string(message)}}}{locations}}}'
+    )
+
+
+def sarif_log(version: str) -> tuple[str, str]:
+    """Get the start and the end of a SARIF log, to write the results between.
+
+    The rules are derived from the `OutputConfig` of the outputs reported as
+    results. Results are separated by commas.
 
+    :param version: Version of check-dependencies.
+    """
+    rules = [
+        {
+            "id": kind.__name__,
+            "shortDescription": {"text": kind.config.description},
+            "defaultConfiguration": {"level": _sarif_level(kind.config)},
+            "properties": {
+                "name": kind.config.name.strip(),
+                "exit_code": kind.config.exit_code,
+            },
+        }
+        for kind in _SARIF_RULE_INDEX
+    ]
+    log = json.dumps(
+        {
+            "$schema": _SARIF_SCHEMA,
+            "version": _SARIF_VERSION,
+            "runs": [
+                {
+                    "tool": {
+                        "driver": {
+                            "name": "check-dependencies",
+                            "version": version,
+                            "informationUri": _INFORMATION_URI,
+                            "rules": rules,
+                        }
+                    },
+                    "results": [],
+                }
+            ],
+        },
+        separators=(",", ":"),
+    )
+    # The results are the last (and only empty) list of the log.
+    start, _, end = log.rpartition("[]")
+    return f"{start}[", f"]{end}"
+
+
+def _sarif_level(config: OutputConfig) -> str:
+    return "error" if config.exit_code else "warning"
+
+
+def _escape_prop(value: str) -> str:
+    return (
+        value.replace("%", "%25")
+        .replace("\r", "%0D")
+        .replace("\n", "%0A")
+        .replace(":", "%3A")
+        .replace(",", "%2C")
+    )
+
+
+def _github_file(path: Path) -> str:
+    # Relative paths depend on the working directory, e.g. of a daemon run.
+    return _github_absolute_file(path.absolute())
+
+
+@functools.lru_cache(maxsize=4096)
+def _github_absolute_file(path: Path) -> str:
+    # Resolving costs a system call per path component, not per annotation.
+    return _escape_prop(path.resolve().as_posix())
+
+
+def _github_issue(
+    output: Output, path: Path, location: Location, msg: str, level: str = "error"
+) -> str:
+    check_name = output.name(verbose=True)
     full_msg = f"{path.as_posix()}: {check_name}: {msg}"
     title = f"check-dependencies ({_escape_prop(check_name)})"
-    lineno = getattr(stmt, "lineno", 0)
-    end_lineno = getattr(stmt, "end_lineno", lineno) or lineno
-    col_offset = (getattr(stmt, "col_offset", 0) or 0) + 1
-    end_col_offset = (getattr(stmt, "end_col_offset", 0) or col_offset) + 1
     return (
-        f"::{level} title={title},file={_escape_prop(path.resolve().as_posix())},"
-        f"line={lineno},col={col_offset},"
-        f"endLine={end_lineno},endColumn={end_col_offset}"
+        f"::{level} title={title},file={_github_file(path)},"
+        f"line={location.lineno},col={location.col_offset + 1},"
+        f"endLine={location.end_lineno},endColumn={location.end_col_offset + 1}"
         f"::{_escape_prop(full_msg)}"
     )
 
@@ -89,8 +354,9 @@ class WithModule(Output, abc.ABC):
     """Defines a module that can be imported."""
 
     path: Path
-    stmt: ast.AST
+    location: Location
     module: Module
+    project_cfg: ProjectConfig | None = field(default=None, compare=False, repr=False)
     show_default: bool = field(init=False, default=True)
     level: str = field(init=False, default="error")
 
@@ -100,14 +366,39 @@ class WithModule(Output, abc.ABC):
             yield _github_issue(
                 self,
                 self.path,
-                self.stmt,
+                self.location,
                 msg=f"module {self.module.name}",
                 level=self.level,
             )
 
-    def lineno(self, default: int = 1) -> int:
+    @property
+    def annotation_file(self) -> Path:
+        """Get the file of the import."""
+        return self.path
+
+    def lineno(self) -> int:
         """Get the line number of the statement."""
-        return getattr(self.stmt, "lineno", default)
+        return self.location.lineno
+
+    def as_jsonl(self, *, verbose: bool) -> Iterator[str]:
+        """Get the JSON Lines record of the import."""
+        del verbose
+        cfg = self.project_cfg
+        yield json_record(
+            self,
+            file=self.path,
+            location=self.location,
+            module=self.module,
+            package=None if cfg is None else _package_names(cfg.packages, self.module),
+            project=None if cfg is None else cfg.path,
+        )
+
+    def as_sarif(self) -> Iterator[str]:
+        """Get the SARIF result of the import, if shown by default."""
+        if self.show_default:
+            yield sarif_result(
+                self, f"module {self.module.name}", self.path, self.location
+            )
 
     def to_text(self, *, verbose: bool, show_all: bool, seen: SeenT) -> Iterable[str]:
         """Get the string representation of the WithModule."""
@@ -125,7 +416,10 @@ class WithModule(Output, abc.ABC):
 class OkDependency(WithModule):
     """Defines a module that is correctly imported and declared in the config file."""
 
-    config: OutputConfig = field(init=False, default=OutputConfig(" OK", " ", 0))
+    config: OutputConfig = field(
+        init=False,
+        default=OutputConfig(" OK", " ", 0, "Imported module is a dependency"),
+    )
     show_default: bool = field(init=False, default=False)
 
 
@@ -133,7 +427,12 @@ class OkDependency(WithModule):
 class MissingModule(WithModule):
     """Defines an unknown module - imported, but not defined as a dependency."""
 
-    config: OutputConfig = field(init=False, default=OutputConfig("!NA", "!", 2))
+    config: OutputConfig = field(
+        init=False,
+        default=OutputConfig(
+            "!NA", "!", 2, "Imported module is not provided by a dependency"
+        ),
+    )
 
 
 @dataclass(frozen=True)
@@ -144,7 +443,24 @@ class UnknownModule(WithModule):
     """
 
     level: str = field(init=False, default="warning")
-    config: OutputConfig = field(init=False, default=OutputConfig("?UNKNOWN", "?", 0))
+    config: OutputConfig = field(
+        init=False,
+        default=OutputConfig(
+            "?UNKNOWN", "?", 0, "Package of the imported module is unknown"
+        ),
+    )
+
+
+def module_output_kinds(*, show_all: bool) -> frozenset[type[WithModule]]:
+    """Get the kinds of module outputs shown by a formatter or failing the check.
+
+    :param show_all: Whether the formatter shows all outputs (``full`` format).
+    """
+    return frozenset(
+        kind
+        for kind in (OkDependency, MissingModule, UnknownModule)
+        if show_all or kind.show_default or kind.config.exit_code
+    )
 
 
 @dataclass(frozen=True)
@@ -153,18 +469,42 @@ class ExtraPackage(Output):
 
     project_cfg: ProjectConfig
     package: Package
-    config: OutputConfig = field(init=False, default=OutputConfig("+EXTRA", "+", 4))
+    config: OutputConfig = field(
+        init=False,
+        default=OutputConfig("+EXTRA", "+", 4, "Dependency is not imported"),
+    )
 
     def as_github(self) -> Iterator[str]:
         """Return a GitHub issue body for this output."""
         yield _github_issue(
             self,
             self.project_cfg.path,
-            stmt=ast.Pass(lineno=1, col_offset=0, end_lineno=1, end_col_offset=1),
+            _FILE_START,
             msg=f"Package {self.package!s} is not imported in the project"
             " but is defined as a dependency.",
         )
 
+    @property
+    def annotation_file(self) -> Path:
+        """Get the pyproject.toml of the project."""
+        return self.project_cfg.path
+
+    def as_jsonl(self, *, verbose: bool) -> Iterator[str]:
+        """Get the JSON Lines record of the package."""
+        del verbose
+        path = self.project_cfg.path
+        yield json_record(self, file=path, package=str(self.package), project=path)
+
+    def as_sarif(self) -> Iterator[str]:
+        """Get the SARIF result of the package, located at its project."""
+        yield sarif_result(
+            self,
+            f"Package {self.package!s} is not imported in the project"
+            " but is defined as a dependency.",
+            self.project_cfg.path,
+            _FILE_START,
+        )
+
     def to_text(self, *, verbose: bool, show_all: bool, seen: SeenT) -> Iterable[str]:
         """Get the string representation of the ExtraPackage."""
         name = self.name(verbose)
@@ -181,7 +521,8 @@ class NoPyprojectError(Output):
 
     msg: str
     config: OutputConfig = field(
-        init=False, default=OutputConfig("!!NOPYPROJECT", "!E", 8)
+        init=False,
+        default=OutputConfig("!!NOPYPROJECT", "!E", 8, "No pyproject.toml found"),
     )
 
     def as_github(self) -> Iterator[str]:
@@ -191,6 +532,15 @@ class NoPyprojectError(Output):
             f"::{self.name(verbose=True)} {self.msg}"
         )
 
+    def as_jsonl(self, *, verbose: bool) -> Iterator[str]:
+        """Get the JSON Lines record of the error."""
+        del verbose
+        yield json_record(self, message=self.msg)
+
+    def as_sarif(self) -> Iterator[str]:
+        """Get the SARIF result of the error, without a location."""
+        yield sarif_result(self, self.msg)
+
     def to_text(self, *, verbose: bool, show_all: bool, seen: SeenT) -> Iterable[str]:
         """Get the string CLI representation of the NoPyprojectError."""
         name = self.name(verbose)
@@ -207,17 +557,38 @@ class FileError(Output):
 
     path: Path
     message: str
-    config: OutputConfig = field(init=False, default=OutputConfig("!!FILE", "!!", 16))
+    config: OutputConfig = field(
+        init=False,
+        default=OutputConfig("!!FILE", "!!", 16, "File cannot be read or parsed"),
+    )
 
     def as_github(self) -> Iterator[str]:
         """Return a GitHub issue body for this output."""
         yield _github_issue(
             self,
             self.path,
-            stmt=ast.Pass(lineno=1, col_offset=0, end_lineno=1, end_col_offset=1),
+            _FILE_START,
             msg=f"File {self.path.as_posix()} could not be parsed: {self.message}",
         )
 
+    @property
+    def annotation_file(self) -> Path:
+        """Get the file which could not be read or parsed."""
+        return self.path
+
+    def as_jsonl(self, *, verbose: bool) -> Iterator[str]:
+        """Get the JSON Lines record of the error."""
+        del verbose
+        yield json_record(self, file=self.path, message=self.message)
+
+    def as_sarif(self) -> Iterator[str]:
+        """Get the SARIF result of the error, located at the file."""
+        yield sarif_result(
+            self,
+            f"File {self.path.as_posix()} could not be parsed: {self.message}",
+            self.path,
+        )
+
     def to_text(self, *, verbose: bool, show_all: bool, seen: SeenT) -> Iterable[str]:
         """Get the string representation of the FileError."""
         del show_all
@@ -239,6 +610,15 @@ class InfoMessage(Output):
         """GitHub Issue for info is empty."""
         yield from ()
 
+    def as_jsonl(self, *, verbose: bool) -> Iterator[str]:
+        """Get the JSON Lines record of the message, if shown."""
+        if verbose or self.verbose:
+            yield json_record(self, message=self.message)
+
+    def as_sarif(self) -> Iterator[str]:
+        """Info messages are not SARIF results."""
+        yield from ()
+
     def to_text(self, *, verbose: bool, show_all: bool, seen: SeenT) -> Iterable[str]:
         """Get the string representation of the InfoMessage."""
         del show_all
@@ -253,3 +633,11 @@ class InfoMessage(Output):
         """Create InfoMessage instances from an iterable of messages."""
         for message in messages:
             yield cls(message=message, verbose=verbose)
+
+
+_SARIF_RULE_INDEX: dict[type[Output], int] = {
+    kind: index
+    for index, kind in enumerate(
+        (MissingModule, UnknownModule, ExtraPackage, FileError, NoPyprojectError)
+    )
+}
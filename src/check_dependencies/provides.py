@@ -20,9 +20,26 @@ def mappings_for_env(python: Path | None) -> list[tuple[str, str]]:
     """
     if not python:
         return []
+    return mappings_for_paths(site_paths(python))
+
+
+def site_paths(python: Path) -> list[Path]:
+    """Get the module search path (``sys.path``) of a python executable.
+
+    :arg python: Path to python executable.
+    """
+    return list(_get_paths(python))
+
+
+def mappings_for_paths(paths: Iterable[Path]) -> list[tuple[str, str]]:
+    """Get the mappings of all packages installed in the given directories.
+
+    :arg paths: Directories to search for ``*.dist-info`` folders.
+    :return: a list of mappings of package name to module name.
+    """
     return sorted(
         (package_name, import_name)
-        for path in _get_paths(python)
+        for path in paths
         for record_file in path.glob("*.dist-info/")
         if record_file.is_dir()
         for package_name, import_name in _mapping_from_record(record_file)
@@ -14,7 +14,7 @@ from typing import TYPE_CHECKING, Any, TypeVar
 from check_dependencies.lib import Module, Package, Packages
 
 if TYPE_CHECKING:
-    from collections.abc import Collection, Mapping, Sequence
+    from collections.abc import Callable, Collection, Mapping, Sequence
 
 try:
     import tomllib  # ty:ignore[unresolved-import]
@@ -33,6 +33,10 @@ _PROVIDES_KEY = f"{_TOOL_KEY}.provides"
 _EXTRA_PACKAGES_KEY = f"{_TOOL_KEY}.optional-dependencies"
 
 
+def _read_text(path: Path) -> str:
+    return path.read_text("utf-8")
+
+
 @dataclass(frozen=True)
 class ConfigToml:
     """Additional config for check-dependencies options. Useful for mono-repos."""
@@ -118,21 +122,30 @@ class PyProjectToml(ConfigToml):
 
     @classmethod
     def for_path(
-        cls, path: Path, *, include_dev: bool = False, _seen: Collection[Path] = ()
+        cls,
+        path: Path,
+        *,
+        include_dev: bool = False,
+        read: Callable[[Path], str] = _read_text,
+        _seen: Collection[Path] = (),
     ) -> PyProjectToml:
         """Create a PyProjectToml instance from a known pyproject.toml path.
 
         :param path: Path to a pyproject.toml file.
         :param include_dev: Whether to include development dependencies.
+        :param read: Get the text of the file and of the files it includes, e.g.
+            from a git revision instead of the disk.
         :returns: A PyProjectToml instance with the parsed configuration.
         """
-        cfg = tomllib.loads(path.read_text("utf-8"))
+        cfg = tomllib.loads(read(path))
         _seen = {*_seen, path}
         parent = path.parent
         return cls(
             cfg=cfg,
             includes_cfg=tuple(
-                cls.for_path(parent / p, include_dev=include_dev, _seen=_seen)
+                cls.for_path(
+                    parent / p, include_dev=include_dev, read=read, _seen=_seen
+                )
                 for p in _nested_item(cfg, _INCLUDES_KEY, list)
                 if parent / p not in _seen
             ),
@@ -218,6 +231,28 @@ class PyProjectToml(ConfigToml):
         }
 
 
+def config_files(path: Path, *, _seen: Collection[Path] = ()) -> list[Path]:
+    """Get a config file and all config files it includes, recursively.
+
+    Missing or broken files are returned but not followed.
+    :param path: Path to a pyproject.toml or an included config file.
+    """
+    try:
+        cfg = tomllib.loads(path.read_text("utf-8"))
+    except (OSError, ValueError):
+        return [path]
+    _seen = {*_seen, path}
+    return [
+        path,
+        *(
+            included
+            for p in _nested_item(cfg, _INCLUDES_KEY, list)
+            if path.parent / p not in _seen
+            for included in config_files(path.parent / p, _seen=_seen)
+        ),
+    ]
+
+
 class NoPyProjectFileError(FileNotFoundError):
     """pyproject.toml file not found in the directory hierarchy of the given path."""
 
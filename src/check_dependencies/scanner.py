@@ -0,0 +1,424 @@
+"""Fast import scanner working on the source text instead of a syntax tree.
+
+Strings and comments are blanked out with a single regular expression, then the
+import statements are matched in the remaining code. Imports nested in compound
+statements are ordered by their depth like `ast.walk`; the depth is derived from
+the indentation and the keywords of the logical lines, in a line pass that only
+runs if a file has nested imports.
+
+`scan_imports` gives up on sources it cannot handle with certainty, e.g.
+``__import__`` calls or strings it cannot delimit; those need `ast.parse`.
+Sources with syntax errors are scanned as long as their import statements are
+well-formed. Memory-mapped files are decoded without reading them into a bytes
+object first.
+"""
+
+from __future__ import annotations
+
+import bisect
+import io
+import mmap
+import re
+import time
+import tokenize
+import unicodedata
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from check_dependencies.lib import Module
+from check_dependencies.outputs import Location
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+PathT = tuple[int, ...]
+"""Offsets of a statement and of its ancestors, starting at the module level."""
+
+_WS = r"(?:[ \t\f]|\\\r?\n)*"
+_WS_NL = r"(?:\s|\\\r?\n)*"
+_NAME = r"[^\W\d]\w*"
+_DOTTED = rf"{_NAME}(?:{_WS}\.{_WS}{_NAME})*"
+_END = rf"(?={_WS}(?:\r?\n|;|\Z))"
+_DOTTED_ALIAS = rf"{_DOTTED}(?:{_WS}\bas\b{_WS}{_NAME})?"
+_ALIAS = rf"{_NAME}(?:{_WS}\bas\b{_WS}{_NAME})?"
+_ALIAS_NL = rf"{_NAME}(?:{_WS_NL}\bas\b{_WS_NL}{_NAME})?"
+
+_KEYWORD = re.compile(r"import\b")  # A leading \b is slow, see `_is_word`
+_IMPORT = re.compile(
+    rf"import\b{_WS}(?P<names>{_DOTTED_ALIAS}(?:{_WS},{_WS}{_DOTTED_ALIAS})*){_END}"
+)
+_FROM = re.compile(
+    rf"{_WS}(?P<start>from)\b{_WS}(?P<dots>(?:\.{_WS})*)(?P<module>{_DOTTED})?"
+    rf"{_WS}\b(?P<keyword>import)\b{_WS}"
+    rf"(?:\({_WS_NL}(?P<nested>{_ALIAS_NL}(?:{_WS_NL},{_WS_NL}{_ALIAS_NL})*"
+    rf"(?:{_WS_NL},)?){_WS_NL}\)|(?P<names>\*|{_ALIAS}(?:{_WS},{_WS}{_ALIAS})*))"
+    rf"{_END}"
+)
+_AS = re.compile(r"\bas\b")
+_BLANK = re.compile(r"\s|\\")
+_LITERAL = re.compile(
+    r"""\#[^\r\n]*
+    |'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''
+    |\"\"\"[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*\"\"\"
+    |'[^'\\\r\n]*(?:\\(?:\r\n|.)[^'\\\r\n]*)*'
+    |"[^"\\\r\n]*(?:\\(?:\r\n|.)[^"\\\r\n]*)*"
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_BRACES = re.compile(r"\{\{|\}\}|[{}]")
+_NOT_NEWLINE = re.compile(r"[^\r\n]")
+_FIRST_WORD = re.compile(r"[^\W\d]\w*")
+_UNINDENTED = re.compile(r"^[^\s]", re.MULTILINE)
+
+_COMPOUND = frozenset({"async", "class", "def", "for", "if", "try", "while", "with"})
+_CLAUSES = frozenset({"elif", "else", "except", "finally"})
+
+
+def scan_imports(
+    source: str | bytes | mmap.mmap, deadline: float | None = None
+) -> list[tuple[Module, Location]] | None:
+    """Find all imports of a source in the order and with the locations of `ast`.
+
+    :param source: Source code, encoded as declared by its coding cookie.
+    :param deadline: `time.monotonic` value to give up at.
+    :returns: Imported modules with the locations of their statements, or None
+        if the source cannot be scanned with certainty.
+    :raises TimeoutError: If the deadline passed.
+    """
+    text = _decode(source)
+    if text is None or "\0" in text or text.count("\r") != text.count("\r\n"):
+        return None  # Lone carriage returns are line breaks for the parser.
+    if (stop := _scan_end(text)) is None:
+        return []
+    code = _mask(text, stop)
+    if code is None or "__import__" in (
+        code if code.isascii() else unicodedata.normalize("NFKC", code)
+    ):
+        return None
+    if (statements := _statements(code, stop, deadline)) is None:
+        return None
+    starts = [s.start for s in statements]
+    if (keys := _order_keys(code, starts, stop, deadline)) is None:
+        return None
+
+    positions = list(_positions(text, (o for stmt in statements for o in stmt.span())))
+    locations = [
+        Location(*start, *end)
+        for start, end in zip(positions[::2], positions[1::2], strict=True)
+    ]
+    return [
+        (module, locations[index])
+        for index in sorted(range(len(statements)), key=keys.__getitem__)
+        for module in statements[index].modules
+    ]
+
+
+@dataclass(frozen=True)
+class _Statement:
+    """Import statement found by the scanner."""
+
+    start: int
+    end: int
+    modules: list[Module]
+
+    def span(self) -> tuple[int, int]:
+        return self.start, self.end
+
+
+def _statements(
+    code: str, stop: int, deadline: float | None
+) -> list[_Statement] | None:
+    """Get the import statements before `stop` that import modules."""
+    statements = []
+    for keyword in _KEYWORD.finditer(code, 0, stop):
+        _check(deadline)
+        if keyword.start() and _is_word(code[keyword.start() - 1]):
+            continue
+        if (statement := _statement(code, keyword.start())) is None:
+            return None
+        if statement.modules:
+            statements.append(statement)
+    return statements
+
+
+def _check(deadline: float | None) -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        msg = "Scanning took too long"
+        raise TimeoutError(msg)
+
+
+def _decode(source: str | bytes | mmap.mmap) -> str | None:
+    if isinstance(source, str):
+        return source
+    if isinstance(source, mmap.mmap):
+        readline = source.readline
+        source.seek(0)
+    else:
+        readline = io.BytesIO(source).readline
+    try:
+        encoding, _ = tokenize.detect_encoding(readline)
+        return str(source, encoding)
+    except (SyntaxError, LookupError, UnicodeDecodeError):
+        return None
+
+
+def _scan_end(text: str) -> int | None:
+    """Get the offset after the last possible import, None if there is none.
+
+    Imports are usually at the top of a file, only the code before this offset is
+    scanned. ``__import__`` calls and non-ASCII identifiers need the whole file.
+    """
+    if "__import__" in text or not text.isascii():
+        return len(text)
+    if (last := max((m.start() for m in _KEYWORD.finditer(text)), default=-1)) < 0:
+        return None
+    end = text.find("\n", last)
+    if text.find("(", last, end) >= 0 and (close := text.find(")", last)) >= 0:
+        end = text.find("\n", close)
+    while end > 0 and text.endswith(("\\", "\\\r"), 0, end):
+        end = text.find("\n", end + 1)
+    return len(text) if end < 0 else end
+
+
+def _mask(text: str, stop: int) -> str | None:
+    """Blank out comments and strings before an offset, keeping line breaks.
+
+    Strings keep a ``$`` at their first quote, so lines starting with a string are
+    not blank. Returns None if a string cannot be delimited for certain.
+    """
+    try:
+        code = _LITERAL.sub(_blank, text[:stop])
+    except _UncertainError:
+        code = None
+    if code is None or "'" in code or '"' in code:
+        # The offset may split a literal, then only the whole text is certain.
+        return None if stop == len(text) else _mask(text, len(text))
+    return code + text[stop:]
+
+
+class _UncertainError(Exception):
+    """A literal cannot be delimited for certain."""
+
+
+def _blank(match: re.Match[str]) -> str:
+    literal = match.group()
+    if literal[0] == "#":
+        return " " * len(literal)
+    if len(literal) == 2 and match.string[match.end() : match.end() + 1] == literal[0]:  # noqa: PLR2004
+        raise _UncertainError  # Unterminated triple-quoted string
+    if "{" in literal:
+        prefix = match.string[max(match.start() - 2, 0) : match.start()].lower()
+        if ("f" in prefix or "t" in prefix) and not _balanced(literal):
+            raise _UncertainError  # Nested quotes of the same kind (PEP 701)
+    if "\n" in literal:
+        return "$" + _NOT_NEWLINE.sub(" ", literal[1:])
+    return "$" + " " * (len(literal) - 1)
+
+
+def _balanced(literal: str) -> bool:
+    """Check whether the replacement fields of an f-string are closed."""
+    depth = 0
+    for braces in _BRACES.findall(literal):
+        if depth or len(braces) == 1:  # Doubled braces are escapes outside fields
+            depth += braces.count("{") - braces.count("}")
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def _statement(code: str, keyword: int) -> _Statement | None:
+    """Match the import statement of an ``import`` keyword, None if malformed."""
+    if _starts_statement(code, keyword):
+        if not (match := _IMPORT.match(code, keyword)):
+            return None
+        modules = [Module(name) for name in _names(match.group("names"))]
+        return _Statement(keyword, match.end(), modules)
+
+    line = code.rfind("\n", 0, keyword)
+    while line > 0 and code.endswith(("\\", "\\\r"), 0, line):
+        line = code.rfind("\n", 0, line)
+    start = max(
+        line, code.rfind(";", line + 1, keyword), code.rfind(":", line + 1, keyword)
+    )
+    if not (match := _FROM.match(code, start + 1)) or match.start("keyword") != keyword:
+        return None
+    level = len(_BLANK.sub("", match.group("dots")))
+    module = match.group("module") and "".join(_names(match.group("module")))
+    modules = []
+    if module and not level:
+        names = match.group("nested") or match.group("names")
+        modules = [
+            Module(module if name == "*" else f"{module}.{name}")
+            for name in _names(names)
+        ]
+    return _Statement(match.start("start"), match.end(), modules)
+
+
+def _starts_statement(code: str, offset: int) -> bool:
+    """Check whether only blanks separate an offset from the start of a statement."""
+    while offset:
+        char = code[offset - 1]
+        if char in " \t\f":
+            offset -= 1
+        elif char == "\n" and code.endswith("\\", 0, offset - 1):
+            offset -= 2
+        elif char == "\n" and code.endswith("\\\r", 0, offset - 1):
+            offset -= 3
+        else:
+            return char in "\n;:"
+    return True
+
+
+def _names(names: str) -> Iterator[str]:
+    """Get the (dotted) names of comma separated aliases, normalized like `ast`."""
+    for alias in names.split(","):
+        if name := _BLANK.sub("", _AS.split(alias, maxsplit=1)[0]):
+            yield name if name.isascii() else unicodedata.normalize("NFKC", name)
+
+
+def _order_keys(
+    code: str, starts: list[int], stop: int, deadline: float | None
+) -> list[tuple[int, int, int]] | None:
+    """Get keys sorting statements in the order of `ast.walk` over the module body.
+
+    Statements of the same module level statement are ordered by depth, then by
+    offset. Returns None if the indentation is inconsistent.
+    """
+    keys = [(start, 1, start) for start in starts]
+    nested = [i for i, start in enumerate(starts) if start and code[start - 1] != "\n"]
+    if not nested:
+        return keys
+    tops = list(_module_level_lines(code, stop))
+    groups: dict[int, list[int]] = {}
+    for i in nested:
+        top = bisect.bisect_right(tops, starts[i]) - 1
+        while top > 0 and _first_word(code, tops[top]) in _CLAUSES:
+            top -= 1
+        groups.setdefault(tops[top] if top >= 0 else 0, []).append(i)
+    for top, group in groups.items():
+        end = code.find("\n", starts[group[-1]])
+        end = len(code) if end < 0 else end
+        if (structure := _structure(code, top, end, deadline)) is None:
+            return None
+        offsets, parents = structure
+        for i in group:
+            path = (*parents[bisect.bisect_right(offsets, starts[i]) - 1], starts[i])
+            keys[i] = (path[0], len(path), starts[i])
+    return keys
+
+
+def _module_level_lines(code: str, stop: int) -> Iterator[int]:
+    """Yield the offsets of the logical lines at the module level, up to `stop`."""
+    depth, last = 0, 0
+    for match in _UNINDENTED.finditer(code, 0, stop):
+        start = match.start()
+        depth += sum(code.count(char, last, start) for char in "([{")
+        depth -= sum(code.count(char, last, start) for char in ")]}")
+        depth, last = max(depth, 0), start
+        if not depth and not code.endswith(("\\\n", "\\\r\n"), 0, start):
+            yield start
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _first_word(code: str, offset: int) -> str:
+    return match.group() if (match := _FIRST_WORD.match(code, offset)) else ""
+
+
+def _positions(text: str, offsets: Iterable[int]) -> Iterator[tuple[int, int]]:
+    """Convert increasing offsets to line numbers and UTF-8 byte columns."""
+    lineno, last, line_start = 1, 0, 0
+    for offset in offsets:
+        if newlines := text.count("\n", last, offset):
+            lineno += newlines
+            line_start = text.rfind("\n", last, offset) + 1
+        last = offset
+        prefix = text[line_start:offset]
+        yield lineno, len(prefix) if prefix.isascii() else len(prefix.encode())
+
+
+@dataclass
+class _Block:
+    """Statements at the same indentation."""
+
+    indent: int
+    parent: PathT
+    match: bool = False
+    stmt: PathT | None = None
+    """Last compound statement, for its ``else``/``except``/... clauses."""
+    chain: PathT | None = None
+    """Last ``if``/``elif`` of `stmt`, ``elif`` is nested in the ``orelse``."""
+
+
+def _structure(
+    code: str, start: int, end: int, deadline: float | None
+) -> tuple[list[int], list[PathT]] | None:
+    """Get the offsets of the logical lines and the parents of their statements.
+
+    :param start: Offset of a module level statement.
+    :param end: Offset to stop at.
+    :param deadline: `time.monotonic` value to give up at.
+    :returns: Offsets of the logical lines, and the parents of the statements on
+        each line; statements following a compound statement header on the same
+        line are in its body. None if the indentation is inconsistent.
+    """
+    offsets: list[int] = []
+    parents: list[PathT] = []
+    blocks = [_Block(0, ())]
+    pending: tuple[PathT, bool] | None = None
+    depth, continued, offset = 0, False, start
+    for line in code[start:end].split("\n"):
+        _check(deadline)
+        stripped = line.lstrip(" \t\f")
+        if not depth and not continued and stripped.strip():
+            line_start = offset + len(line) - len(stripped)
+            whitespace = line[: len(line) - len(stripped)]
+            indent = len(whitespace.rpartition("\f")[2].expandtabs())
+            if indent > blocks[-1].indent:
+                parent, match = pending or (blocks[-1].parent, False)
+                blocks.append(_Block(indent, parent, match))
+            while indent < blocks[-1].indent:
+                blocks.pop()
+            if indent != blocks[-1].indent:
+                return None
+            inline, body, match = _classify(blocks[-1], line_start, stripped)
+            pending = None if body is None else (body, match)
+            offsets.append(line_start)
+            parents.append(inline)
+        depth += sum(map(line.count, "([{")) - sum(map(line.count, ")]}"))
+        depth = max(depth, 0)
+        continued = line.endswith(("\\", "\\\r"))
+        offset += len(line) + 1
+    return offsets, parents
+
+
+def _classify(block: _Block, start: int, line: str) -> tuple[PathT, PathT | None, bool]:
+    """Get the parent of statements on a logical line and of its indented body.
+
+    :returns: Parent of the statements on the line, parent of the statements of an
+        indented body (or None) and whether the body contains ``case`` clauses.
+    """
+    word = _first_word(line, 0)
+    path = (*block.parent, start)
+    if block.match and word == "case":
+        return path, path, False
+    if word in _CLAUSES and block.stmt is not None and block.chain is not None:
+        if word == "elif":
+            block.chain = (*block.chain, start)
+            body = block.chain
+        elif word == "else":
+            body = block.chain
+        elif word == "except":
+            body = (*block.stmt, start)
+        else:
+            body = block.stmt
+        return body, body, False
+    if word in _COMPOUND:
+        block.stmt = block.chain = path
+        return path, path, False
+    block.stmt = block.chain = None
+    if word == "match":  # Soft keyword, a header only if a ``case`` block follows
+        return block.parent, path, True
+    return block.parent, None, False
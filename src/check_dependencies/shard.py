@@ -0,0 +1,410 @@
+"""Deterministic sharding of a scan and merging of the partial results.
+
+A sharded run (``--shard I/N``) only scans the source files belonging to its shard
+and prints a partial result as JSON. ``check-dependencies merge`` combines the
+partial results of all ``N`` shards, restores the per-project usage and reports
+the same outputs (and exit code) as an unsharded run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import textwrap
+from dataclasses import asdict
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from check_dependencies.app_config import (
+    AppConfig,
+    OutputFormat,
+    ReadOptions,
+    Report,
+    Shard,
+)
+from check_dependencies.lib import Module, Package, Packages
+from check_dependencies.main import (
+    _project_outputs,
+    _ProjectRegistry,
+    _source_imports_iter,
+    _verbose_app_info,
+    iter_source_files,
+)
+from check_dependencies.outputs import (
+    FileError,
+    InfoMessage,
+    MissingModule,
+    NoPyprojectError,
+    OkDependency,
+    Output,
+    UnknownModule,
+    WithModule,
+    dump_location,
+    load_location,
+)
+from check_dependencies.pyproject_toml import NoPyProjectFileError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping, Sequence
+
+    from check_dependencies.main import RegistryEntry
+
+logger = logging.getLogger("check_dependencies.shard")
+
+_VERSION = 2
+_FINDINGS: dict[str, type[Output]] = {
+    cls.__name__: cls
+    for cls in (
+        OkDependency,
+        MissingModule,
+        UnknownModule,
+        FileError,
+        NoPyprojectError,
+    )
+}
+
+_PROJECT_FIELDS: dict[str, type] = {
+    "path": str,
+    "first": int,
+    "seen": list,
+    "optionals": list,
+}
+_OPTIONAL_FIELDS: dict[str, type] = {"path": str, "used": bool, "imported": list}
+_MODULE_FIELDS: dict[str, type] = {
+    "index": int,
+    "path": str,
+    "module": str,
+    "raw": object,
+    "location": list,
+}
+_FINDING_FIELDS: dict[type[Output], dict[str, type]] = {
+    OkDependency: _MODULE_FIELDS,
+    MissingModule: _MODULE_FIELDS,
+    UnknownModule: _MODULE_FIELDS,
+    FileError: {"index": int, "path": str, "message": str},
+    NoPyprojectError: {"index": int, "msg": str},
+}
+
+
+def partial_result(app_cfg: AppConfig, shard: Shard) -> dict[str, Any]:
+    """Scan the files of a single shard and return its partial result.
+
+    :param app_cfg: Application configuration, shared by all shards.
+    :param shard: The shard to scan.
+    :returns: JSON-serializable partial result.
+    """
+    findings: list[dict[str, Any]] = []
+    first_seen: dict[Path, int] = {}
+    try:
+        registry = _ProjectRegistry(app_cfg)
+    except NoPyProjectFileError as exc:
+        # The merge re-creates the registry and reports this error itself.
+        logger.error("Could not find pyproject.toml for %s", exc)  # noqa: TRY400
+        return _partial(app_cfg, shard, projects=[], findings=[])
+
+    for index, src_pth in enumerate(iter_source_files(app_cfg)):
+        if not shard.includes(src_pth):
+            continue
+        try:
+            current = registry.get(src_pth)
+        except NoPyProjectFileError as exc:  # pragma: no cover
+            findings.append(_dump_finding(index, NoPyprojectError(str(exc))))
+            break
+        first_seen.setdefault(current.project_cfg.path, index)
+        findings.extend(
+            _dump_finding(index, output)
+            for output in _source_imports_iter(
+                src_pth, current, options=app_cfg.read_options
+            )
+        )
+
+    return _partial(
+        app_cfg,
+        shard,
+        projects=[
+            _dump_project(entry, first_seen.get(path, -1))
+            for path, entry in registry.entry.items()
+        ],
+        findings=findings,
+    )
+
+
+def load_partials(
+    partials: Sequence[Mapping[str, Any]],
+    *,
+    verbose: bool = False,
+    output_format: OutputFormat = OutputFormat.CONCISE,
+    reports: Sequence[Report] = (),
+) -> AppConfig:
+    """Validate that the partial results form one complete run.
+
+    :param partials: Partial results of all shards.
+    :param verbose: Verbosity of the merged output.
+    :param output_format: Output format of the merged output.
+    :param reports: Additional outputs of the merge, see ``--report``.
+    :returns: The application configuration shared by all shards.
+    :raises ValueError: If the partial results are malformed, incompatible or
+        incomplete.
+    """
+    if not partials:
+        msg = "No partial results given"
+        raise ValueError(msg)
+    if any(
+        not isinstance(partial, dict) or partial.get("version") != _VERSION
+        for partial in partials
+    ):
+        msg = f"Unsupported partial result version, expected {_VERSION}"
+        raise ValueError(msg)
+    for partial in partials:
+        _check_partial(partial)
+    config = partials[0]["config"]
+    if any(partial["config"] != config for partial in partials):
+        msg = "Partial results were created with different configurations"
+        raise ValueError(msg)
+    shards = sorted(Shard(*partial["shard"]) for partial in partials)
+    count = shards[0].count
+    if shards != [Shard(i, count) for i in range(1, count + 1)]:
+        got = ", ".join(map(str, shards))
+        msg = f"Expected exactly one partial result per shard 1..{count}, got {got}"
+        raise ValueError(msg)
+    try:
+        return AppConfig(
+            file_names=[Path(name) for name in config["file_names"]],
+            known_extra=[Package(name) for name in config["known_extra"]],
+            known_missing=[Module(name) for name in config["known_missing"]],
+            provides=Packages(
+                packages=[
+                    (Package(pkg), Module(mod)) for pkg, mod in config["provides"]
+                ]
+            ),
+            include_dev=config["include_dev"],
+            verbose=verbose,
+            output_format=output_format,
+            reports=reports,
+            **asdict(ReadOptions.from_json(config["read_options"])),
+        )
+    except (KeyError, TypeError, ValueError) as exc:
+        msg = f"Malformed partial result config: {exc!r}"
+        raise ValueError(msg) from None
+
+
+def merge_outputs(
+    app_cfg: AppConfig, partials: Sequence[Mapping[str, Any]]
+) -> Iterator[Output]:
+    """Get the outputs of the unsharded run from the partial results.
+
+    The projects are restored before the outputs are yielded, so that errors are
+    raised by this call.
+
+    :param app_cfg: Application configuration as returned by `load_partials`.
+    :param partials: Partial results of all shards, validated by `load_partials`.
+    :raises ValueError: If the optional dependencies of a project changed since
+        the shards ran.
+    """
+    info = InfoMessage.from_iter(_verbose_app_info(app_cfg), verbose=True)
+    try:
+        registry = _ProjectRegistry(app_cfg)
+    except NoPyProjectFileError as exc:
+        logger.error("Could not find pyproject.toml for %s", exc)  # noqa: TRY400
+        return chain(info, [NoPyprojectError(str(exc))])
+
+    # Projects are restored first, in the order of the unsharded run, so that
+    # findings can refer to them.
+    for project in sorted(
+        (project for partial in partials for project in partial["projects"]),
+        key=lambda project: project["first"],
+    ):
+        _restore_project(registry.for_pyproject(Path(project["path"])), project)
+    return chain(info, _merged_outputs(registry, partials))
+
+
+def _merged_outputs(
+    registry: _ProjectRegistry, partials: Sequence[Mapping[str, Any]]
+) -> Iterator[Output]:
+    # Files are discovered in the same order by every shard, so the file index
+    # restores the order of the unsharded run. sorted() is stable within a file.
+    for finding in sorted(
+        (finding for partial in partials for finding in partial["findings"]),
+        key=lambda finding: finding["index"],
+    ):
+        output = _load_finding(finding, registry)
+        yield output
+        if isinstance(output, NoPyprojectError):  # pragma: no cover
+            return
+
+    yield from _project_outputs(registry)
+
+
+def merge_arg_parser() -> argparse.ArgumentParser:
+    """Get the argument parser for ``check-dependencies merge``."""
+    parser = argparse.ArgumentParser(
+        prog="check-dependencies merge",
+        description="Merge the partial results of a sharded run (--shard I/N)",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "partial",
+        type=Path,
+        nargs="+",
+        help="Partial result files, one per shard",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        default=False,
+        help="Show every import of a package",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=OutputFormat,
+        default=OutputFormat.CONCISE,
+        help=textwrap.dedent("""\
+            The format to use for printing diagnostic messages.
+            See `check-dependencies --help`.
+            """),
+    )
+    parser.add_argument(
+        "--report",
+        type=Report.parse,
+        action="append",
+        metavar="FORMAT[:PATH]",
+        default=[],
+        help=textwrap.dedent("""\
+            Also write the merged outputs in FORMAT to PATH (or stdout).
+            See `check-dependencies --help`.
+            """),
+    )
+    return parser
+
+
+def _partial(
+    app_cfg: AppConfig,
+    shard: Shard,
+    projects: list[dict[str, Any]],
+    findings: list[dict[str, Any]],
+) -> dict[str, Any]:
+    return {
+        "version": _VERSION,
+        "shard": [shard.index, shard.count],
+        "config": {
+            "file_names": [path.as_posix() for path in app_cfg.file_names],
+            "known_extra": [str(pkg) for pkg in app_cfg.known_extra],
+            "known_missing": [module.name for module in app_cfg.known_missing],
+            "provides": [
+                [str(pkg), module.name]
+                for pkg in sorted(app_cfg.provides.all_packages())
+                for module in sorted(app_cfg.provides.modules(pkg))
+            ],
+            "include_dev": app_cfg.include_dev,
+            "read_options": app_cfg.read_options.to_json(),
+        },
+        "projects": projects,
+        "findings": findings,
+    }
+
+
+def _check_partial(partial: Mapping[str, Any]) -> None:
+    """Check that a partial result has all the fields a merge reads.
+
+    :raises ValueError: If a field is missing or has the wrong type.
+    """
+    try:
+        Shard(*partial["shard"])
+        _check_fields(partial["config"], {"read_options": dict})
+        for project in partial["projects"]:
+            _check_fields(project, _PROJECT_FIELDS)
+            for option in project["optionals"]:
+                _check_fields(option, _OPTIONAL_FIELDS)
+        for finding in partial["findings"]:
+            _check_fields(finding, _FINDING_FIELDS[_FINDINGS[finding["kind"]]])
+    except (KeyError, TypeError, ValueError) as exc:
+        msg = f"Malformed partial result: {exc!r}"
+        raise ValueError(msg) from None
+
+
+def _check_fields(data: Mapping[str, Any], fields: Mapping[str, type]) -> None:
+    for name, type_ in fields.items():
+        if not isinstance(data[name], type_):
+            msg = f"Expected {type_.__name__} for {name!r}, got {data[name]!r}"
+            raise TypeError(msg)
+
+
+def _dump_project(entry: RegistryEntry, first: int) -> dict[str, Any]:
+    return {
+        "path": entry.project_cfg.path.as_posix(),
+        "first": first,
+        "seen": sorted(str(pkg) for pkg in entry.seen),
+        "optionals": [
+            {
+                "path": option.path.as_posix(),
+                "used": option.used,
+                "imported": sorted(str(pkg) for pkg in option.imported),
+            }
+            for option in entry.optionals
+        ],
+    }
+
+
+def _restore_project(entry: RegistryEntry, project: Mapping[str, Any]) -> None:
+    entry.restore(map(Package, project["seen"]))
+    if [option.path.as_posix() for option in entry.optionals] != [
+        state["path"] for state in project["optionals"]
+    ]:
+        msg = f"Optional dependencies of {entry.project_cfg.path} changed"
+        raise ValueError(msg)
+    for option, state in zip(entry.optionals, project["optionals"], strict=True):
+        option.restore(used=state["used"], imported=map(Package, state["imported"]))
+
+
+def _dump_finding(index: int, output: Output) -> dict[str, Any]:
+    finding: dict[str, Any] = {"kind": type(output).__name__, "index": index}
+    if isinstance(output, WithModule):
+        finding |= {
+            "path": output.path.as_posix(),
+            "module": output.module.name,
+            "raw": output.module.raw,
+            "location": dump_location(output.location),
+        }
+        if output.project_cfg is not None:
+            finding["project"] = output.project_cfg.path.as_posix()
+    elif isinstance(output, FileError):
+        finding |= {"path": output.path.as_posix(), "message": output.message}
+    elif isinstance(output, NoPyprojectError):  # pragma: no cover
+        finding |= {"msg": output.msg}
+    return finding
+
+
+def _load_finding(finding: Mapping[str, Any], registry: _ProjectRegistry) -> Output:
+    cls = _FINDINGS[finding["kind"]]
+    if issubclass(cls, WithModule):
+        project = finding.get("project")
+        return cls(
+            Path(finding["path"]),
+            load_location(finding["location"]),
+            Module(finding["module"], raw=finding["raw"]),
+            None
+            if project is None
+            else registry.for_pyproject(Path(project)).project_cfg,
+        )
+    if cls is FileError:
+        return FileError(Path(finding["path"]), finding["message"])
+    return NoPyprojectError(finding["msg"])  # pragma: no cover
+
+
+def dumps(partial: Mapping[str, Any]) -> str:
+    """Serialize a partial result."""
+    return json.dumps(partial, separators=(",", ":"))
+
+
+def load(path: Path) -> dict[str, Any]:
+    """Read a partial result from a file.
+
+    :raises ValueError: If the file is not a valid partial result.
+    """
+    try:
+        return json.loads(path.read_text("utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        msg = f"Could not read partial result {path.as_posix()}: {exc}"
+        raise ValueError(msg) from exc
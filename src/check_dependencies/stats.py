@@ -0,0 +1,107 @@
+"""Import statistics per project, counted while the source files are resolved.
+
+The counters are fed by the resolution of every file (see
+`check_dependencies.main`), so no output needs to be kept to compute them. Their
+memory only grows with the number of distinct modules and packages, plus a
+bounded list of the files with the most imports.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+    from pathlib import Path
+
+    from check_dependencies.app_config import ProjectConfig
+    from check_dependencies.lib import Module, Package, Packages
+
+TOP_FILES = 10
+
+
+@dataclass
+class ProjectStats:
+    """Counters of the files and imports of a single project."""
+
+    packages: Packages
+    files: int = 0
+    imports: int = 0
+    parse_errors: int = 0
+    unused: Sequence[Package] = ()
+    """Declared packages not imported by any file, set after all files."""
+    _modules: set[Module] = field(default_factory=set, init=False)
+    _package_imports: Counter[int] = field(default_factory=Counter, init=False)
+    _top_files: list[tuple[int, Path]] = field(default_factory=list, init=False)
+
+    def add_import(self, module: Module) -> None:
+        """Count an import of a module and of the packages providing it."""
+        self.imports += 1
+        self._modules.add(module)
+        if not module.raw:
+            # Count per package bitset, it is only split into packages once.
+            self._package_imports[self.packages.package_bits(module)] += 1
+
+    def add_file(self, path: Path, imports: int) -> None:
+        """Count a resolved file with its number of imports."""
+        self.files += 1
+        if len(self._top_files) < TOP_FILES:
+            heapq.heappush(self._top_files, (imports, path))
+        else:
+            heapq.heappushpop(self._top_files, (imports, path))
+
+    def add_error(self) -> None:
+        """Count a file which could not be read or parsed."""
+        self.files += 1
+        self.parse_errors += 1
+
+    @property
+    def modules(self) -> int:
+        """Get the number of distinct imported modules."""
+        return len(self._modules)
+
+    def package_imports(self) -> list[tuple[Package, int]]:
+        """Get the number of imports per package, the most imported first."""
+        counts: Counter[Package] = Counter()
+        for bits, count in self._package_imports.items():
+            for package in self.packages.from_bits(bits):
+                counts[package] += count
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def top_files(self) -> list[tuple[Path, int]]:
+        """Get the files with the most imports, at most `TOP_FILES`."""
+        return [
+            (path, count) for count, path in heapq.nlargest(TOP_FILES, self._top_files)
+        ]
+
+
+class Statistics:
+    """Import statistics of all projects of a run."""
+
+    def __init__(self) -> None:
+        """Initialize without projects."""
+        self.projects: dict[Path, ProjectStats] = {}
+
+    def for_project(self, project_cfg: ProjectConfig) -> ProjectStats:
+        """Get the counters of a project, by the path of its pyproject.toml."""
+        if (stats := self.projects.get(project_cfg.path)) is None:
+            stats = self.projects[project_cfg.path] = ProjectStats(project_cfg.packages)
+        return stats
+
+    def to_text(self) -> Iterator[str]:
+        """Get the statistics of every project as lines of text."""
+        for path, stats in self.projects.items():
+            yield f"##### {path} ###"
+            yield f"FILES={stats.files}"
+            yield f"IMPORTS={stats.imports}"
+            yield f"MODULES={stats.modules}"
+            yield f"PARSE_ERRORS={stats.parse_errors}"
+            for package, count in stats.package_imports():
+                yield f"PACKAGE {package} {count}"
+            for file, count in stats.top_files():
+                yield f"TOP_FILE {file.as_posix()} {count}"
+            for package in stats.unused:
+                yield f"UNUSED {package}"
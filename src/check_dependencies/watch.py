@@ -0,0 +1,249 @@
+"""Watch mode: keep the scan state in memory and re-check changed files.
+
+The watcher keeps the project registry (parsed configs) and the imports of every
+source file in memory. Changes are detected by polling the ``stat`` data of the
+source files, the ``pyproject.toml`` files below the watched paths and all config
+files of the known projects (including ``includes``).
+
+- Changed or added source files are parsed again. The registry forgets the
+  imports of changed and deleted files and only resolves the changed files again.
+- Config changes only re-parse the configs and re-resolve the cached imports.
+
+Only the outputs of changed files, and the per-project outputs if they changed,
+are reported again.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from check_dependencies.cache import StatT, _stat, _stat_result
+from check_dependencies.main import (
+    ImportsT,
+    _file_imports,
+    _project_outputs,
+    _ProjectRegistry,
+    _resolve_imports,
+    _verbose_app_info,
+    iter_source_files,
+)
+from check_dependencies.outputs import (
+    FileError,
+    InfoMessage,
+    NoPyprojectError,
+    Output,
+)
+from check_dependencies.pyproject_toml import (
+    NoPyProjectFileError,
+    config_files,
+    get_pyproject_toml,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Container, Iterable, Iterator
+
+    from check_dependencies.app_config import AppConfig
+
+logger = logging.getLogger("check_dependencies.watch")
+
+
+class Watcher:
+    """In-memory scan state of the watched files."""
+
+    def __init__(self, app_cfg: AppConfig) -> None:
+        """Initialize an empty watcher; call `scan` to start."""
+        self.app_cfg = app_cfg
+        self._registry: _ProjectRegistry | None = None
+        self._imports: dict[Path, ImportsT] = {}
+        self._sources: dict[Path, StatT] = {}
+        self._configs: dict[Path, StatT] = {}
+        self._pyprojects: dict[Path, StatT] = {}
+        self._outputs: dict[Path, list[Output]] = {}
+        self._project_outputs: list[Output] = []
+
+    def cycles(self, interval: float) -> Iterator[list[Output]]:
+        """Yield the outputs of the initial scan and then of every change."""
+        yield self.scan()
+        while True:
+            time.sleep(interval)
+            if outputs := self.poll():
+                yield outputs
+
+    def scan(self) -> list[Output]:
+        """Scan all files and return all outputs, like a regular run."""
+        self._sources, self._pyprojects = self._snapshot()
+        self._imports = {
+            src_pth: self._file_imports(src_pth)
+            for src_pth in iter_source_files(self.app_cfg)
+        }
+        self._load_registry()
+        self._resolve(self._imports)
+        return [
+            *InfoMessage.from_iter(_verbose_app_info(self.app_cfg), verbose=True),
+            *(output for outputs in self._outputs.values() for output in outputs),
+            *self._project_outputs,
+        ]
+
+    def poll(self) -> list[Output]:
+        """Re-check changed files, return the outputs affected by the changes."""
+        sources, pyprojects = self._snapshot()
+        changed = [
+            path for path, st in sources.items() if self._sources.get(path) != st
+        ]
+        deleted = [path for path in self._sources if path not in sources]
+        # Added or removed pyproject.toml files can change the project of any file.
+        configs_changed = pyprojects.keys() != self._pyprojects.keys() or any(
+            _stat(path) != st for path, st in self._configs.items()
+        )
+        if not (changed or deleted or configs_changed):
+            return []
+
+        self._sources, self._pyprojects = sources, pyprojects
+        self._forget([*deleted, *changed])
+        for path in deleted:
+            self._imports.pop(path, None)
+        self._imports.update((path, self._file_imports(path)) for path in changed)
+        previous_project_outputs = self._project_outputs
+        if configs_changed:
+            logger.info("Config files changed, resolving all files again")
+            get_pyproject_toml.cache_clear()
+            self._load_registry()
+            affected = list(self._imports)
+        else:
+            affected = changed
+        self._resolve(affected)
+        return [
+            *(
+                InfoMessage(f"DELETED {path.as_posix()}", verbose=True)
+                for path in deleted
+            ),
+            *(
+                output
+                for path in affected
+                for output in (
+                    InfoMessage(f"CHECKED {path.as_posix()}", verbose=True),
+                    *self._outputs[path],
+                )
+            ),
+            *(
+                self._project_outputs
+                if configs_changed or self._project_outputs != previous_project_outputs
+                else []
+            ),
+        ]
+
+    def _load_registry(self) -> None:
+        """Parse all project configs again, all files need to be resolved again."""
+        self._outputs = {}
+        try:
+            self._registry = _ProjectRegistry(self.app_cfg)
+        except NoPyProjectFileError as exc:
+            logger.error("Could not find pyproject.toml for %s", exc)  # noqa: TRY400
+            self._registry = None
+            self._project_outputs = [NoPyprojectError(str(exc))]
+            return
+        self._configs = {}
+
+    def _forget(self, paths: Iterable[Path]) -> None:
+        """Remove the outputs and the imports of files from the registry."""
+        for path in paths:
+            self._outputs.pop(path, None)
+            if self._registry is not None:
+                with contextlib.suppress(NoPyProjectFileError):
+                    self._registry.get(path).forget(path)
+
+    def _resolve(self, paths: Iterable[Path]) -> None:
+        """Resolve the cached imports of files, without parsing any source file."""
+        registry = self._registry
+        if registry is None:
+            self._outputs.update((path, []) for path in paths)
+            self._configs = {path: _stat(path) for path in self._configs}
+            return
+        projects = len(registry.entry)
+        self._outputs.update(
+            (
+                path,
+                list(
+                    self._resolve_file(
+                        registry, path, self._imports[path], self.app_cfg.output_kinds
+                    )
+                ),
+            )
+            for path in paths
+        )
+        self._project_outputs = list(_project_outputs(registry))
+        if len(registry.entry) != projects or not self._configs:
+            self._configs = {
+                path: _stat(path)
+                for pyproject in registry.entry
+                for path in config_files(pyproject)
+            }
+
+    @staticmethod
+    def _resolve_file(
+        registry: _ProjectRegistry,
+        path: Path,
+        imports: ImportsT,
+        kinds: Container[type[Output]] | None = None,
+    ) -> Iterator[Output]:
+        try:
+            current = registry.get(path)
+        except NoPyProjectFileError as exc:
+            yield NoPyprojectError(str(exc))
+            return
+        if isinstance(imports, FileError):
+            yield imports
+            return
+        yield from _resolve_imports(path, imports, current, kinds)
+
+    def _file_imports(self, path: Path) -> ImportsT:
+        """Read a source file, with the size from the last snapshot."""
+        st = self._sources.get(path)
+        return _file_imports(
+            path, self.app_cfg.read_options, None if st is None else st[1]
+        )
+
+    def _snapshot(self) -> tuple[dict[Path, StatT], dict[Path, StatT]]:
+        """Get the stat data of all source and pyproject.toml files."""
+        sources: dict[Path, StatT] = {}
+        pyprojects: dict[Path, StatT] = {}
+        for root in self.app_cfg.file_names:
+            if root.is_dir():
+                _walk(root.as_posix(), sources, pyprojects)
+            elif (st := _stat(root)) is not None:
+                sources[root] = st
+        return sources, pyprojects
+
+
+def watch_outputs(app_cfg: AppConfig, interval: float) -> Iterable[list[Output]]:
+    """Yield the outputs of the initial scan and then of every change.
+
+    :param app_cfg: Application configuration.
+    :param interval: Seconds between two polls.
+    """
+    return Watcher(app_cfg).cycles(interval)
+
+
+def _walk(
+    directory: str, sources: dict[Path, StatT], pyprojects: dict[Path, StatT]
+) -> None:
+    """Collect stat data recursively, reusing the data of the directory scan."""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                _walk(entry.path, sources, pyprojects)
+            elif entry.name.endswith(".py"):
+                sources[Path(entry.path)] = _stat_result(entry.stat())
+            elif entry.name == "pyproject.toml":
+                pyprojects[Path(entry.path)] = _stat_result(entry.stat())
+        except OSError:  # noqa: PERF203 - File deleted during the walk
+            continue
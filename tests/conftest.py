@@ -1,9 +1,13 @@
 """Common fixtures and constants for tests."""
 
+import json
+import os
+from collections.abc import Iterable, Mapping
 from pathlib import Path
 
 import pytest
 
+from check_dependencies import cache as cache_module
 from check_dependencies.pyproject_toml import get_pyproject_toml
 
 DATA = (Path(__file__).parent / "data").resolve()
@@ -24,6 +28,33 @@ PYPROJECT_EMPTY = DATA / "pyproject_empty.toml"
 PYPROJECT_PROVIDES = DATA / "pyproject_pep631_provides.toml"
 
 
+def touch(path: Path, content: str) -> None:
+    """Write a file and make sure its stat data changes."""
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(content, "utf-8")
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def write_project(
+    root: Path,
+    dependencies: Iterable[str] = (),
+    files: Mapping[str, str] | None = None,
+) -> Path:
+    """Write a pyproject.toml with the dependencies and the files below root.
+
+    :param files: Content of every file by its path relative to root.
+    :returns: The path of the pyproject.toml.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    (pyproject := root / "pyproject.toml").write_text(
+        f"[project]\ndependencies = {json.dumps(list(dependencies))}\n", "utf-8"
+    )
+    for name, content in (files or {}).items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(content, "utf-8")
+    return pyproject
+
+
 @pytest.fixture(autouse=True)
 def clear_pyproject_cache() -> None:
     """Clear the get_pyproject_toml LRU cache before each test.
@@ -44,3 +75,22 @@ def pyproject(request: pytest.FixtureRequest) -> Path:
 def pyproject_extra(request: pytest.FixtureRequest) -> Path:
     """Fixture for testing extra requirements."""
     return request.param
+
+
+@pytest.fixture(autouse=True)
+def no_step_summary(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Do not append the summaries of tests to the job summary of a CI run."""
+    monkeypatch.delenv("GITHUB_STEP_SUMMARY", raising=False)
+
+
+@pytest.fixture
+def parsed(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    """Record the source files parsed by a cache."""
+    parsed: list[Path] = []
+    file_imports = cache_module._file_imports
+    monkeypatch.setattr(
+        cache_module,
+        "_file_imports",
+        lambda file, *args: parsed.append(file) or file_imports(file, *args),
+    )
+    return parsed
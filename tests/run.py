@@ -1,5 +1,6 @@
 """Run module to run tests against CLI."""
 
+import io
 from collections.abc import Iterable, Sequence
 from pathlib import Path
 from unittest.mock import patch
@@ -14,13 +15,13 @@ def run(
     comment: bool = False,
 ) -> tuple[list[str], int]:
     """Run tests against CLI."""
-    lines: list[str] = []
     if isinstance(args, str):
         args = args.split()
     with (
         patch("sys.argv", ["check-dependencies", *args, *map(str, files)]),
         patch("check_dependencies.pyproject_toml._PYPROJECT_TOML", pyproject_toml),
-        patch("check_dependencies.__main__._writer", lines.extend),
+        patch("sys.stdout", io.StringIO()) as stdout,
     ):
         exit_status = main()
+    lines = stdout.getvalue().splitlines()
     return [line for line in lines if comment or not line.startswith("#")], exit_status
@@ -14,10 +14,14 @@ from check_dependencies.app_config import (
     AppConfig,
     OutputFormat,
     ProjectConfig,
+    ReadOptions,
+    Report,
     _get_version,
     _MultiSepAction,
+    _parse_size,
 )
 from check_dependencies.lib import Module, Package
+from check_dependencies.outputs import OkDependency
 from check_dependencies.pyproject_toml import PyProjectToml
 
 if TYPE_CHECKING:
@@ -91,6 +95,37 @@ def test_project_cfg(tmp_path: Path) -> None:
     )
 
 
+def test_project_cfgs_share_identical_parts(tmp_path: Path) -> None:
+    """Projects with the same dependencies share them and their package index."""
+    cfgs, app, shared = [], app_cfg(), {}
+    for name, dependency in (
+        ("a", "Shared-Dep"),
+        ("b", "Shared-Dep"),
+        ("c", "shared_dep"),
+    ):
+        (path := tmp_path / name).mkdir()
+        (path / "pyproject.toml").write_text(
+            f'[project]\nname = "{name}"\ndependencies = ["{dependency}"]\n', "utf-8"
+        )
+        proj = PyProjectToml.for_path(path / "pyproject.toml")
+        cfgs.append(ProjectConfig.from_config(app, proj, shared))
+    first, second, other = cfgs
+    assert second.packages is first.packages
+    assert second.defined_dependencies is first.defined_dependencies
+    assert second.allowed_dependencies is first.allowed_dependencies
+    assert second.known_missing is not first.known_missing
+    assert Package("b") in second.missing_dependencies
+    assert Package("b") not in first.missing_dependencies
+    assert second.allowed_bits & second.packages.bit(Package("b"))
+    assert not first.allowed_bits & first.packages.bit(Package("b"))
+    # Only configs built with the same mapping share their parts
+    unshared = ProjectConfig.from_config(app, proj)
+    assert unshared.packages is not other.packages
+    # Equal, but differently spelled packages keep their original names
+    assert other.defined_dependencies is not first.defined_dependencies
+    assert [str(pkg) for pkg in other.defined_dependencies] == ["shared_dep"]
+
+
 def test_app_cfg_from_argv(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test AppConfig.from_argv() with monkeypatching."""
     monkeypatch.setattr("sys.argv", ["check-dependencies", "src"])
@@ -98,6 +133,68 @@ def test_app_cfg_from_argv(monkeypatch: pytest.MonkeyPatch) -> None:
     assert cfg.file_names == [Path("src")]
 
 
+@pytest.mark.parametrize(
+    "value, expected", [("100", 100), ("2k", 2048), ("8M", 8 * 1024**2)]
+)
+def test_parse_size(value: str, expected: int) -> None:
+    """Sizes are given in bytes, with an optional binary unit."""
+    assert _parse_size(value) == expected
+
+
+def test_read_options_from_argv() -> None:
+    """Read options are collected from the CLI options."""
+    cfg = AppConfig.from_argv(
+        [
+            *("--max-file-size", "64M", "--large-file-timeout", "2.5"),
+            *("--parse-memory", "1G", "src"),
+        ]
+    )
+    assert cfg.read_options == ReadOptions(
+        max_file_size=64 * 1024**2, large_file_timeout=2.5, parse_memory=1024**3
+    )
+    assert cfg.read_options.isolated
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("full", Report(OutputFormat.FULL)),
+        ("jsonl:out/deps.jsonl", Report(OutputFormat.JSONL, Path("out/deps.jsonl"))),
+        ("sarif:C:/a.sarif", Report(OutputFormat.SARIF, Path("C:/a.sarif"))),
+    ],
+)
+def test_report_parse(value: str, expected: Report) -> None:
+    """Reports have a format and an optional path, which may contain colons."""
+    assert Report.parse(value) == expected
+    assert Report.parse(str(expected)) == expected
+
+
+def test_report_parse_invalid() -> None:
+    """Unknown formats are rejected with the possible formats."""
+    with pytest.raises(ValueError, match="one of github, full"):
+        Report.parse("xml:out.xml")
+
+
+def test_reports_from_argv() -> None:
+    """Every report gets its own config, all of them share a single scan."""
+    cfg = AppConfig.from_argv(
+        [
+            "--output-format",
+            "github",
+            "--report",
+            "full:full.txt",
+            "--report",
+            "sarif",
+            "src",
+        ]
+    )
+    assert OkDependency in cfg.output_kinds
+    assert [(c.output_format, c.output, c.reports) for c in cfg.report_configs()] == [
+        (OutputFormat.FULL, Path("full.txt"), ()),
+        (OutputFormat.SARIF, None, ()),
+    ]
+
+
 class TestMultiSepAction:
     """Test _MultiSepAction."""
 
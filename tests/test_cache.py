@@ -0,0 +1,112 @@
+"""Tests for the cache module."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from check_dependencies import cache as cache_module
+from check_dependencies.cache import Cache
+from check_dependencies.lib import Module
+from check_dependencies.outputs import FileError
+from tests.conftest import touch
+
+if TYPE_CHECKING:
+    import pytest
+
+
+def test_imports_are_cached_until_changed(tmp_path: Path, parsed: list[Path]) -> None:
+    """Unchanged files are not parsed again."""
+    touch(src := tmp_path / "a.py", "import a\n")
+    cache = Cache()
+    assert [m for m, _ in cache.imports(src)] == [Module("a")]  # ty:ignore[not-iterable]
+    assert [m for m, _ in cache.imports(src)] == [Module("a")]  # ty:ignore[not-iterable]
+    assert parsed == [src]
+
+    touch(src, "import b\n")
+    assert [m for m, _ in cache.imports(src)] == [Module("b")]  # ty:ignore[not-iterable]
+    assert parsed == [src, src]
+    assert len(cache) == 1
+
+
+def test_file_errors_use_the_given_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Errors are cached per file, but reported for the path of the current run."""
+    (tmp_path / "broken.py").write_text("()foo", "utf-8")
+    cache = Cache()
+    assert isinstance(cache.imports(tmp_path / "broken.py"), FileError)
+    monkeypatch.chdir(tmp_path)
+    error = cache.imports(Path("broken.py"))
+    assert isinstance(error, FileError)
+    assert error.path == Path("broken.py")
+
+
+def test_pyproject_is_reloaded_when_includes_change(tmp_path: Path) -> None:
+    """Changes of included config files invalidate the parsed pyproject.toml."""
+    touch(
+        pyproject := tmp_path / "pyproject.toml",
+        '[tool.check-dependencies]\nincludes = ["extra.toml"]\n',
+    )
+    touch(extra := tmp_path / "extra.toml", "")
+    cache = Cache()
+    first = cache.pyproject(pyproject, include_dev=False)
+    assert cache.pyproject(pyproject, include_dev=False) is first
+    assert cache.pyproject(pyproject, include_dev=True) is not first
+
+    touch(extra, '[tool.check-dependencies]\nknown-missing = ["foo"]\n')
+    assert cache.pyproject(pyproject, include_dev=False).known_missing == {
+        Module("foo")
+    }
+
+
+def test_env_mappings_are_cached(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The environment is only queried again if the executable changes."""
+    calls: list[str] = []
+    (site := tmp_path / "site-packages").mkdir()
+    monkeypatch.setattr(
+        cache_module, "site_paths", lambda _: calls.append("paths") or [site]
+    )
+    monkeypatch.setattr(
+        cache_module,
+        "mappings_for_paths",
+        lambda _: calls.append("mappings") or [("pkg", "mod")],
+    )
+    touch(python := tmp_path / "python", "")
+    cache = Cache()
+    assert cache.env_mappings(None) == []
+    assert cache.env_mappings(python) == [("pkg", "mod")]
+    assert cache.env_mappings(python) == [("pkg", "mod")]
+    assert calls == ["paths", "mappings"]
+
+    (site / "new.dist-info").mkdir()
+    assert cache.env_mappings(python) == [("pkg", "mod")]
+    assert calls == ["paths", "mappings", "mappings"]
+
+    touch(python, "#")
+    cache.env_mappings(python)
+    assert calls == ["paths", "mappings", "mappings", "paths"]
+
+
+def test_invalidate(tmp_path: Path) -> None:
+    """Invalidated files and the files below invalidated directories are forgotten."""
+    (tmp_path / "sub").mkdir()
+    for name in ["a.py", "sub/b.py", "sub/c.py"]:
+        (tmp_path / name).write_text("import a\n", "utf-8")
+    (pyproject := tmp_path / "pyproject.toml").write_text("[project]\n", "utf-8")
+    cache = Cache()
+    for name in ["a.py", "sub/b.py", "sub/c.py"]:
+        cache.imports(tmp_path / name)
+    proj = cache.pyproject(pyproject, include_dev=False)
+
+    cache.invalidate([tmp_path / "sub" / "b.py"])
+    assert len(cache) == len(["a.py", "sub/c.py"])
+    cache.invalidate([tmp_path / "sub"])
+    assert len(cache) == len(["a.py"])
+    assert cache.pyproject(pyproject, include_dev=False) is proj
+    cache.invalidate([pyproject])
+    assert cache.pyproject(pyproject, include_dev=False) is not proj
+    cache.invalidate()
+    assert len(cache) == 0
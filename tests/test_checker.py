@@ -0,0 +1,129 @@
+"""Tests for the checker module."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from check_dependencies import cache as cache_module
+from check_dependencies.app_config import AppConfig
+from check_dependencies.checker import Checker
+from check_dependencies.lib import Module, Package
+from check_dependencies.outputs import (
+    ExtraPackage,
+    FileError,
+    MissingModule,
+    NoPyprojectError,
+    OkDependency,
+)
+from tests.conftest import write_project
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    """Create a project with a missing import and an unused dependency."""
+    write_project(
+        tmp_path, ["dep_a", "dep_b"], {"a.py": "import dep_a\nimport missing\n"}
+    )
+    return tmp_path
+
+
+def test_check(project: Path, parsed: list[Path]) -> None:
+    """Checks return the outputs and reuse the imports of unchanged files."""
+    missing_module_exit_code, extra_package_exit_code = 2, 4
+    checker = Checker(AppConfig(file_names=[]))
+    for _ in range(2):
+        result = checker.check([project])
+        assert result.exit_code == missing_module_exit_code | extra_package_exit_code
+        missing, extra = result.findings
+        assert isinstance(missing, MissingModule)
+        assert missing.module == Module("missing")
+        assert isinstance(extra, ExtraPackage)
+        assert extra.package == Package("dep_b")
+    assert parsed == [project / "a.py"]
+
+
+def test_check_default_paths(project: Path) -> None:
+    """Without paths, the file names of the config are checked."""
+    checker = Checker.from_argv(["--output-format", "full", "--extra", "dep_b"])
+    assert checker.check().outputs == []
+    checker = Checker(AppConfig.from_argv(["--output-format", "full", str(project)]))
+    assert [type(output) for output in checker.check().outputs] == [
+        OkDependency,
+        MissingModule,
+        ExtraPackage,
+    ]
+
+
+def test_invalidate(project: Path, parsed: list[Path]) -> None:
+    """Invalidated files are parsed again, new pyproject.toml files are found."""
+    (project / "sub").mkdir()
+    (project / "sub" / "b.py").write_text("import dep_c\n", "utf-8")
+    checker = Checker(AppConfig(file_names=[project]))
+    assert len(checker.check().findings) == len(["missing", "dep_b", "dep_c"])
+
+    write_project(project / "sub", ["dep_c"])
+    checker.invalidate([project / "sub"])
+    assert len(checker.check().findings) == len(["missing", "dep_b"])
+    assert parsed == [
+        project / "a.py",
+        project / "sub" / "b.py",
+        project / "sub" / "b.py",
+    ]
+
+    checker.invalidate()
+    checker.check()
+    assert len(parsed) == len(["a.py", "b.py"]) * 2 + 1
+
+
+def test_check_sources(project: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sources are checked by their virtual paths, unchanged sources are cached."""
+    parsed: list[Path] = []
+    source_imports = cache_module.source_imports
+    monkeypatch.setattr(
+        cache_module,
+        "source_imports",
+        lambda source, file, *args: (
+            parsed.append(file) or source_imports(source, file, *args)
+        ),
+    )
+    buffer, generated = project / "a.py", project / "gen" / "generated.py"
+    checker = Checker(AppConfig(file_names=[]))
+    for source in [b"import dep_a, missing\n", "import dep_a, missing\n"]:
+        result = checker.check_sources([(buffer, source), (generated, b"import x")])
+        assert [
+            (out.path, out.module.name)
+            for out in result.findings
+            if isinstance(out, MissingModule)
+        ] == [(buffer, "missing"), (generated, "x")]
+        assert len(result.findings) == len(["missing", "x"])
+    assert parsed == [buffer, generated]
+    assert not generated.exists()
+
+
+def test_check_sources_project(project: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sources of a given project are reported with unused dependencies if asked."""
+    monkeypatch.chdir(project)
+    checker = Checker(AppConfig(file_names=[]))
+    (extra,) = checker.check_sources(
+        [("a.py", b"import dep_a\n")], unused=True
+    ).findings
+    assert isinstance(extra, ExtraPackage)
+    assert extra.package == Package("dep_b")
+
+    (error,) = checker.check_sources(
+        [("sub/a.py", b"import dep_a\n(")], project / "pyproject.toml"
+    ).findings
+    assert isinstance(error, FileError)
+    assert error.path == Path("sub/a.py")
+
+
+def test_check_sources_missing_project(tmp_path: Path) -> None:
+    """A given pyproject.toml which does not exist is reported for the sources."""
+    missing = tmp_path / "pyproject.toml"
+    result = Checker(AppConfig(file_names=[])).check_sources(
+        [("a.py", b"import dep_a\n")], missing
+    )
+    assert result.findings == [NoPyprojectError(missing.as_posix())]
+    assert result.exit_code
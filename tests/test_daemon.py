@@ -0,0 +1,170 @@
+"""Tests for the daemon module."""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from check_dependencies import daemon
+from check_dependencies.__main__ import _main
+from tests.conftest import DATA, POETRY, write_project
+from tests.run import run
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+    from typing import Any
+
+ARGS = "--output-format full --verbose"
+
+
+@pytest.fixture
+def socket_path() -> Iterator[Path]:
+    """Short socket path, tmp_path can exceed the length limit of Unix sockets."""
+    with tempfile.TemporaryDirectory() as directory:
+        yield Path(directory) / "daemon.sock"
+
+
+@pytest.fixture
+def server(socket_path: Path) -> Iterator[Path]:
+    """Serve in a thread, yield the socket path."""
+    thread = threading.Thread(target=daemon.serve, args=(socket_path, _main))
+    thread.start()
+    while daemon.request(socket_path, {"op": "status"}) is None:
+        assert thread.is_alive()
+    yield socket_path
+    daemon.request(socket_path, {"op": "stop"})
+    thread.join(timeout=10)
+    assert not socket_path.exists()
+
+
+def _run_request(
+    path: Path, argv: list[str], cwd: Path, env: Mapping[str, str]
+) -> dict[str, Any]:
+    """Send a run request and get the final response with exit code and stderr."""
+    with daemon._connect(path) as sock, sock.makefile("rwb") as stream:
+        daemon._send(stream, {"op": "run", "argv": argv, "cwd": str(cwd), "env": env})
+        return next(r for r in map(json.loads, stream) if "exit" in r)
+
+
+@pytest.mark.parametrize("args", [ARGS, "", "--include-dev --output-format github"])
+def test_daemon_equals_cold_run(server: Path, args: str) -> None:
+    """Outputs and exit code of cold and warm runs are the same as without daemon."""
+    cold = run([DATA], POETRY, args, comment=True)
+    for _ in range(2):
+        warm = run([DATA], POETRY, f"daemon --socket {server} run {args}", comment=True)
+        assert warm == cold
+    assert daemon.request(server, {"op": "status"})["files"] > 0  # ty:ignore[not-subscriptable]
+
+
+def test_changed_files_are_checked_again(server: Path, tmp_path: Path) -> None:
+    """Cached imports and configs are only used while the files are unchanged."""
+    write_project(tmp_path, ["dep_a"], {"a.py": "import dep_a\n"})
+    src = tmp_path / "a.py"
+    args = f"daemon --socket {server} run"
+    assert run([src], tmp_path / "pyproject.toml", args) == ([], 0)
+
+    src.write_text("import dep_a\nimport dep_b\n", "utf-8")
+    assert run([src], tmp_path / "pyproject.toml", args) == (["! dep_b"], 2)
+
+    write_project(tmp_path, ["dep_a", "dep_b"])
+    assert run([src], tmp_path / "pyproject.toml", args) == ([], 0)
+
+
+@pytest.mark.parametrize(
+    "args, error",
+    [
+        ("--unknown-option", "unrecognized arguments"),
+        ("worker localhost:1", "worker cannot be run by the daemon"),
+        ("--watch", "--watch and --coordinator cannot be run by the daemon"),
+    ],
+)
+def test_run_errors(
+    server: Path, args: str, error: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Errors of a forwarded run are reported by the client."""
+    assert run([DATA], POETRY, f"daemon --socket {server} run {args}") == ([], 2)
+    assert error in capsys.readouterr().err
+
+
+def test_run_logs(server: Path, tmp_path: Path) -> None:
+    """The log messages of a run are sent to the client."""
+    write_project(tmp_path, [], {"a.py": "import (\n"})
+    response = _run_request(server, ["a.py"], tmp_path, {})
+    assert "Could not parse a.py" in response["stderr"]
+
+
+@pytest.mark.parametrize("client", [True, False])
+def test_run_client_env(
+    server: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, client: bool
+) -> None:
+    """The step summary defaults to the variable of the client, not of the daemon."""
+    write_project(tmp_path, [], {"a.py": "import missing\n"})
+    daemon_summary, client_summary = tmp_path / "daemon.md", tmp_path / "client.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(daemon_summary))
+    env = {"GITHUB_STEP_SUMMARY": str(client_summary)} if client else {}
+    argv = ["--output-format", "github", "a.py"]
+    assert _run_request(server, argv, tmp_path, env)["exit"]
+    assert client_summary.exists() == client
+    assert not daemon_summary.exists()
+    assert os.environ["GITHUB_STEP_SUMMARY"] == str(daemon_summary)
+
+
+def test_run_without_daemon(socket_path: Path) -> None:
+    """Without a daemon, the check runs in the client."""
+    cold = run([DATA], POETRY, ARGS)
+    assert run([DATA], POETRY, f"daemon --socket {socket_path} run {ARGS}") == cold
+
+
+@pytest.mark.parametrize("command", ["status", "stop"])
+def test_no_daemon_running(
+    socket_path: Path, command: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Status and stop fail without a daemon."""
+    assert run([], POETRY, f"daemon --socket {socket_path} {command}") == ([], 1)
+    assert "No daemon running" in capsys.readouterr().err
+
+
+def test_stale_socket_is_replaced(socket_path: Path) -> None:
+    """A socket file left behind by a killed daemon does not block a new one."""
+    with daemon._Server(socket_path, _main):
+        pass  # Closed without removing the socket file
+    assert socket_path.is_socket()
+    thread = threading.Thread(target=daemon.serve, args=(socket_path, _main))
+    thread.start()
+    while daemon.request(socket_path, {"op": "status"}) is None:
+        assert thread.is_alive()
+    assert daemon.request(socket_path, {"op": "stop"}) == {"exit": 0}
+    thread.join(timeout=10)
+
+
+def test_start_status_stop(socket_path: Path) -> None:
+    """The daemon runs in the background until it is stopped."""
+
+    def cli(command: str) -> subprocess.CompletedProcess[str]:
+        return subprocess.run(  # noqa: S603
+            [
+                sys.executable,
+                *("-m", "check_dependencies", "daemon"),
+                *("--socket", socket_path.as_posix(), command),
+            ],
+            capture_output=True,
+            text=True,
+            check=False,
+            timeout=30,
+        )
+
+    assert cli("start").returncode == 0
+    try:
+        assert "already running" in cli("start").stderr
+        assert "files cached" in cli("status").stdout
+    finally:
+        assert cli("stop").returncode == 0
+    assert cli("status").returncode == 1
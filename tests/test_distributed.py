@@ -0,0 +1,161 @@
+"""Tests for the distributed module."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from check_dependencies import distributed
+from check_dependencies.app_config import Address
+from tests.conftest import DATA, POETRY
+from tests.run import run
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+ARGS = "--output-format full --verbose"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def address(monkeypatch: pytest.MonkeyPatch) -> Address:
+    """Coordinator address with small batches, so every worker gets some work."""
+    monkeypatch.setattr(distributed, "_BATCH_SIZE", 1)
+    return Address("localhost", _free_port())
+
+
+@pytest.fixture
+def workers(address: Address) -> Iterator[list[int]]:
+    """Start three workers, yield the number of files processed by each."""
+    n_files: list[int] = []
+
+    def worker() -> None:
+        # Workers connecting after the coordinator finished all batches are reset.
+        with contextlib.suppress(ConnectionError):
+            n_files.append(distributed.run_worker(address))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    yield n_files
+    for thread in threads:
+        thread.join(timeout=10)
+
+
+def _lost_worker(address: Address, *, keep_open: threading.Event | None) -> None:
+    """Take a single batch and never return it."""
+    sock = distributed._connect(address, timeout=10)
+    with sock, sock.makefile("rwb") as stream:
+        distributed._send(stream, {"op": "next"})
+        assert json.loads(stream.readline())["op"] == "batch"
+        if keep_open:
+            keep_open.wait(timeout=10)
+
+
+@pytest.mark.usefixtures("workers")
+def test_coordinator_equals_local_run(address: Address) -> None:
+    """Outputs and exit code are the same as for a local run."""
+    local = run([DATA], POETRY, ARGS, comment=True)
+    remote = run([DATA], POETRY, f"{ARGS} --coordinator {address}", comment=True)
+    assert remote == local
+
+
+@pytest.mark.parametrize("keep_open", [False, True])
+def test_lost_worker_batches_are_reassigned(address: Address, keep_open: bool) -> None:
+    """Batches of dead (disconnected) or slow (timed out) workers are reassigned."""
+    local = run([DATA], POETRY, ARGS, comment=True)
+    release = threading.Event() if keep_open else None
+    lost = threading.Thread(
+        target=_lost_worker, args=(address,), kwargs={"keep_open": release}
+    )
+    lost.start()
+    worker = threading.Thread(
+        target=distributed.run_worker, args=(address,), daemon=True
+    )
+    worker.start()
+    remote = run(
+        [DATA],
+        POETRY,
+        f"{ARGS} --coordinator {address} --worker-timeout 0.2",
+        comment=True,
+    )
+    if release:
+        release.set()
+    lost.join(timeout=10)
+    worker.join(timeout=10)
+    assert remote == local
+
+
+def test_late_results_are_dropped() -> None:
+    """The first result of a reassigned batch wins."""
+    batches = distributed._Batches([Path("a.py")], timeout=0)
+    assert batches.take() == 0
+    assert batches.take() == 0  # Expired immediately, so reassigned
+    batches.complete(0, [{"imports": []}])
+    batches.complete(0, [{"error": "late"}])
+    assert batches.result(0) == [{"imports": []}]
+    assert batches.take() is None
+
+
+def test_wrong_number_of_results() -> None:
+    """Results must match the files of a batch."""
+    batches = distributed._Batches([Path("a.py")], timeout=60)
+    with pytest.raises(ValueError, match="Expected 1 results"):
+        batches.complete(batches.take() or 0, [])
+
+
+def test_no_worker(address: Address, capsys: pytest.CaptureFixture[str]) -> None:
+    """The coordinator fails if no worker connects in time."""
+    usage_exit_code = 2
+    args = f"{ARGS} --coordinator {address} --worker-connect-timeout 0.1"
+    assert run([DATA], POETRY, args) == ([], usage_exit_code)
+    assert "No worker connected" in capsys.readouterr().err
+
+
+def test_all_workers_lost(address: Address, capsys: pytest.CaptureFixture[str]) -> None:
+    """The coordinator fails if no worker takes the batches of lost workers in time."""
+    usage_exit_code = 2
+    lost = threading.Thread(
+        target=_lost_worker, args=(address,), kwargs={"keep_open": None}
+    )
+    lost.start()
+    args = f"{ARGS} --coordinator {address} --worker-connect-timeout 2"
+    assert run([DATA], POETRY, args) == ([], usage_exit_code)
+    lost.join(timeout=10)
+    assert "All workers were lost" in capsys.readouterr().err
+
+
+def test_file_facts_error(tmp_path: Path) -> None:
+    """Files that cannot be parsed are returned as an error."""
+    (broken := tmp_path / "broken.py").write_text("()foo", "utf-8")
+    assert "error" in distributed._file_facts(broken)
+
+
+def test_worker_cli_without_coordinator() -> None:
+    """A worker exits with an error if no coordinator can be reached."""
+    address = f"localhost:{_free_port()}"
+    assert run([address], POETRY, "worker --connect-timeout 0") == ([], 1)
+
+
+@pytest.mark.parametrize("value", ["localhost", "localhost:port"])
+def test_address_parse_invalid(value: str) -> None:
+    """Addresses need a numeric port."""
+    with pytest.raises(ValueError, match=r"."):
+        Address.parse(value)
+
+
+def test_address_parse() -> None:
+    """The host defaults to localhost."""
+    assert Address.parse(":1234") == Address("localhost", 1234)
+    assert str(Address.parse("example.com:1")) == "example.com:1"
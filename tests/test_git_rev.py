@@ -0,0 +1,116 @@
+"""Tests for the git_rev module."""
+
+from __future__ import annotations
+
+import contextlib
+import gc
+import shutil
+import subprocess
+import weakref
+from pathlib import Path
+
+import pytest
+
+from check_dependencies.app_config import AppConfig
+from check_dependencies.git_rev import GitError, GitRevision, _RevisionRegistry
+from tests.run import run
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(  # noqa: S603
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],  # noqa: S607
+        cwd=repo,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Create a repository with a tagged and a later commit and a dirty tree."""
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\ndependencies = ["dep_a"]\n'
+        '[tool.check-dependencies]\nincludes = ["deps.toml"]\n',
+        "utf-8",
+    )
+    (tmp_path / "deps.toml").write_text(
+        '[tool.check-dependencies]\nknown-missing = ["known"]\n', "utf-8"
+    )
+    (tmp_path / "src" / "pkg" / "a.py").write_text(
+        "import dep_a\nimport known\nimport old_missing\n", "utf-8"
+    )
+    (tmp_path / "src" / "pkg" / "data.txt").write_text("import not_python\n", "utf-8")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-qm", "first")
+    _git(tmp_path, "tag", "v1")
+    (tmp_path / "src" / "pkg" / "a.py").write_text("import dep_a\n", "utf-8")
+    (tmp_path / "src" / "pkg" / "b.py").write_text("import dep_b\n", "utf-8")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-qm", "second")
+    (tmp_path / "src" / "pkg" / "b.py").write_text("import uncommitted\n", "utf-8")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "rev, files, expected",
+    [
+        pytest.param("v1", ["src"], ["! old_missing"], id="tag"),
+        pytest.param("HEAD", ["src"], ["! dep_b"], id="head"),
+        pytest.param("HEAD~", ["src/pkg/a.py"], ["! old_missing"], id="file"),
+        pytest.param("v1", ["src/pkg/b.py"], ["!! src/pkg/b.py"], id="not-in-rev"),
+    ],
+)
+def test_rev(repo: Path, rev: str, files: list[str], expected: list[str]) -> None:
+    """Files and configs are read from the revision, not from the working tree."""
+    status = _git(repo, "status", "--porcelain")
+    result, exit_code = run(files, Path("pyproject.toml"), ["--rev", rev])
+    assert [line.split(":")[-1].strip() for line in result] == expected
+    assert exit_code
+    assert _git(repo, "status", "--porcelain") == status
+
+
+def test_rev_subdirectory(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Paths are relative to the working directory, also below the top level."""
+    monkeypatch.chdir(repo / "src")
+    with contextlib.closing(GitRevision("v1")) as revision:
+        assert revision.kind(Path()) == "tree"
+        assert revision.read(Path("pkg/a.py")) == (
+            b"import dep_a\nimport known\nimport old_missing\n"
+        )
+        assert revision.read(repo / "deps.toml") is not None
+        assert revision.read(Path("pkg/b.py")) is None
+        assert revision.read(Path("../..")) is None
+        assert [path for path, _ in revision.source_files([Path("pkg")])] == [
+            Path("pkg/a.py")
+        ]
+
+
+def test_rev_unknown(repo: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Unknown revisions are reported without outputs."""
+    with pytest.raises(GitError, match="Unknown git revision: nope"):
+        GitRevision("nope", repo)
+    usage_exit_code = 2
+    result, exit_code = run(["src"], Path("pyproject.toml"), ["--rev", "nope"])
+    assert (result, exit_code) == ([], usage_exit_code)
+    assert "Unknown git revision: nope" in capsys.readouterr().err
+
+
+def test_rev_registry_is_freed(repo: Path) -> None:
+    """A registry and its revision are freed after the check, with their caches."""
+    with contextlib.closing(GitRevision("v1", repo)) as revision:
+        app_cfg = AppConfig(file_names=[Path("src")])
+        registry = _RevisionRegistry(app_cfg, revision, {Path("src")})
+        assert registry.get(Path("src/pkg/a.py")).project_cfg.path == Path(
+            "pyproject.toml"
+        )
+        refs = [weakref.ref(registry), weakref.ref(revision)]
+        del registry
+    del revision
+    gc.collect()
+    assert [ref() for ref in refs] == [None, None]
@@ -0,0 +1,131 @@
+"""Tests for the github_annotations module."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from check_dependencies import outputs
+from check_dependencies.github_annotations import GithubAnnotations
+from check_dependencies.lib import Module
+from tests.run import run
+
+LOCATION = outputs.Location(1, 0, 1, 1)
+
+
+def _missing(file: str, module: str = "missing") -> outputs.MissingModule:
+    return outputs.MissingModule(Path(file), LOCATION, Module(module))
+
+
+def _files(lines: list[str]) -> list[str]:
+    return [line.split(",file=")[1].split(",")[0].rpartition("/")[2] for line in lines]
+
+
+@pytest.mark.parametrize(
+    "max_annotations, max_file_annotations, expected",
+    [
+        (0, 0, ["a.py", "a.py", "a.py", "b.py", "c.py"]),
+        (0, 2, ["a.py", "a.py", "b.py", "c.py"]),
+        (2, 0, ["a.py", "a.py"]),
+        (3, 1, ["a.py", "b.py", "c.py"]),
+    ],
+)
+def test_annotations_are_capped(
+    max_annotations: int, max_file_annotations: int, expected: list[str]
+) -> None:
+    """At most the given number of findings is annotated per file and in total."""
+    annotations = GithubAnnotations(
+        max_annotations=max_annotations, max_file_annotations=max_file_annotations
+    )
+    files = ["a.py", "a.py", "a.py", "b.py", "c.py"]
+    lines = [line for file in files for line in annotations(_missing(file))]
+    assert _files(lines) == expected
+    end = list(annotations.end())
+    if not_annotated := len(files) - len(expected):
+        notice = (
+            f"::notice title=check-dependencies::{not_annotated} more finding(s) not"
+            f" annotated (at most {max_file_annotations} per file and"
+            f" {max_annotations} in total), see the job summary"
+        )
+        assert end == [notice]
+    else:
+        assert end == []
+
+
+def test_annotations_without_file() -> None:
+    """Findings without a file only count for the total."""
+    annotations = GithubAnnotations(max_annotations=2, max_file_annotations=1)
+    no_pyproject = outputs.NoPyprojectError("no pyproject.toml")
+    info = outputs.InfoMessage("message", verbose=True)
+    lines = [
+        line
+        for output in [no_pyproject, info, no_pyproject, no_pyproject]
+        for line in annotations(output)
+    ]
+    assert lines == [*no_pyproject.as_github(), *no_pyproject.as_github()]
+    assert annotations.annotations == len(lines)
+
+
+def test_summary(tmp_path: Path) -> None:
+    """All findings are summarized per check and appended to the summary file."""
+    summary = tmp_path / "summary.md"
+    summary.write_text("previous step\n", "utf-8")
+    annotations = GithubAnnotations(max_file_annotations=1, summary=summary)
+    for output in [
+        _missing("a.py", "mod1"),
+        _missing("a.py", "mod2"),
+        outputs.UnknownModule(Path("a.py"), LOCATION, Module("mod3")),
+        outputs.OkDependency(Path("b.py"), LOCATION, Module("mod4")),
+    ]:
+        list(annotations(output))
+    list(annotations.end())
+    assert summary.read_text("utf-8").splitlines() == [
+        "previous step",
+        "### check-dependencies",
+        "",
+        "| Check | Description | Findings | Not annotated |",
+        "| --- | --- | ---: | ---: |",
+        "| `!NA` | Imported module is not provided by a dependency | 2 | 1 |",
+        "| `?UNKNOWN` | Package of the imported module is unknown | 1 | 1 |",
+        "",
+    ]
+
+
+def test_summary_without_findings(tmp_path: Path) -> None:
+    """The summary of a run without findings says so."""
+    summary = tmp_path / "summary.md"
+    annotations = GithubAnnotations(summary=summary)
+    assert list(annotations.end()) == []
+    assert summary.read_text("utf-8") == "### check-dependencies\n\nNo findings.\n"
+
+
+def test_step_summary_option(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The github format caps the annotations and writes $GITHUB_STEP_SUMMARY."""
+    summary = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary))
+    (tmp_path / "pyproject.toml").write_text("[project]\ndependencies=[]\n", "utf-8")
+    (src := tmp_path / "src.py").write_text("import a, b, c", "utf-8")
+    lines, exit_code = run(
+        [src],
+        tmp_path / "pyproject.toml",
+        ["--output-format", "github", "--max-file-annotations", "2"],
+    )
+    assert exit_code
+    assert _files(lines[:-1]) == ["src.py", "src.py"]
+    assert lines[-1].startswith("::notice title=check-dependencies::1 more finding")
+    assert "| `!NA` | Imported module is not provided by a dependency | 3 | 1 |" in (
+        summary.read_text("utf-8").splitlines()
+    )
+
+
+@pytest.mark.parametrize("option", ["--max-annotations", "--max-file-annotations"])
+def test_negative_limits(option: str, capsys: pytest.CaptureFixture[str]) -> None:
+    """Negative limits are rejected instead of dropping all annotations."""
+    usage_exit_code = 2
+    with pytest.raises(SystemExit) as exc:
+        run([], Path("pyproject.toml"), ["--output-format", "github", option, "-1"])
+    assert exc.value.code == usage_exit_code
+    assert "must be at least 0" in capsys.readouterr().err
+    with pytest.raises(ValueError, match="at least 0"):
+        GithubAnnotations(max_file_annotations=-1)
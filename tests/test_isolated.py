@@ -0,0 +1,80 @@
+"""Tests for the isolated module."""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from check_dependencies.isolated import Isolated, IsolationError
+from tests.conftest import DATA, POETRY, write_project
+from tests.run import run
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_results_and_exceptions() -> None:
+    """Results are returned, exceptions are reported, the child is kept."""
+    isolated = Isolated(divmod)
+    assert isolated(7, 2) == (3, 1)
+    with pytest.raises(IsolationError, match="ZeroDivisionError: integer division"):
+        isolated(1, 0)
+    process = isolated._child
+    assert isolated(9, 4) == (2, 1)
+    assert isolated._child is process
+    isolated.close()
+
+
+def test_timeout_restarts_child() -> None:
+    """A call running too long is aborted, the next call gets a new child."""
+    isolated = Isolated(time.sleep, timeout=0.5)
+    with pytest.raises(IsolationError, match=r"No result within 0.5s"):
+        isolated(60)
+    assert isolated._child is None
+    assert isolated(0) is None
+    isolated.close()
+
+
+def test_timeout_excludes_start() -> None:
+    """Short timeouts only limit the calls, not the start of a new child."""
+    isolated = Isolated(divmod, timeout=0.01)
+    assert isolated(7, 2) == (3, 1)
+    isolated.close()
+
+
+def test_cli_short_parse_timeout(tmp_path: Path) -> None:
+    """A trivial file is parsed within a short timeout."""
+    write_project(tmp_path, [], {"a.py": "import missing\n"})
+    args = ["--parse-timeout", "0.05"]
+    assert run([tmp_path / "a.py"], tmp_path / "pyproject.toml", args) == (
+        ["! missing"],
+        2,
+    )
+
+
+def test_crash() -> None:
+    """A dying child is reported with its exit code."""
+    with pytest.raises(IsolationError, match=r"exit code 3"):
+        Isolated(os._exit)(3)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="No resource limits")
+def test_memory_limit() -> None:
+    """Allocations beyond the memory limit fail in the child only."""
+    isolated = Isolated(bytearray, memory_limit=1024**3)
+    with pytest.raises(IsolationError, match="MemoryError"):
+        isolated(2 * 1024**3)
+    assert isolated(b"ok") == bytearray(b"ok")
+    isolated.close()
+
+
+def test_cli_isolated_parsing() -> None:
+    """Outputs are the same with isolated parsing."""
+    args = "--output-format full --verbose"
+    assert run([DATA], POETRY, f"{args} --parse-timeout 30") == run(
+        [DATA], POETRY, args
+    )
@@ -3,13 +3,22 @@
 from __future__ import annotations
 
 import ast
+import gc
+import pickle
+import weakref
 from pathlib import Path
 
 import pytest
 
 from check_dependencies.app_config import AppConfig, OutputFormat
-from check_dependencies.lib import Module, Package, Packages, _canonical
-from check_dependencies.outputs import MissingModule, OkDependency, WithModule
+from check_dependencies.lib import (
+    Module,
+    Package,
+    Packages,
+    _canonical,
+    bit_ids,
+)
+from check_dependencies.outputs import Location, MissingModule, OkDependency, WithModule
 
 
 class TestModule:
@@ -56,14 +65,23 @@ class TestModule:
     )
     def test_parents(self, module: Module, expected: list[str]) -> None:
         """Test the parents property."""
-        assert module.parents == [Module(name) for name in expected]
+        assert module.parents == tuple(Module(name) for name in expected)
 
     def test_parents_raw(self) -> None:
         """Test the parents property for raw modules."""
         module = Module("foo.bar.baz", raw=True)
-        assert module.parents == [module]
+        assert module.parents == (module,)
         assert module.parents[0] is module
 
+    def test_interned(self) -> None:
+        """Equal modules are the same instance, also after pickling."""
+        module = Module(" foo.bar ")
+        assert module is Module("foo.bar")
+        assert module.parents[1] is Module("foo")
+        assert Module("foo.bar", raw=True) is not module
+        assert pickle.loads(pickle.dumps(module)) is module  # noqa: S301
+        assert not hasattr(module, "__dict__")
+
 
 class TestPackage:
     """Test suite for the Package value object."""
@@ -126,6 +144,14 @@ class TestPackage:
         assert str(package) == expected_str
         assert bool(package) is expected_bool
 
+    def test_interned(self) -> None:
+        """Packages with the same name are the same instance, also after pickling."""
+        package = Package("Foo-Bar ")
+        assert package is Package("Foo-Bar")
+        assert package is not Package("foo_bar")
+        assert package == Package("foo_bar")
+        assert pickle.loads(pickle.dumps(package)) is package  # noqa: S301
+
     def test_eq_not_implemented(self) -> None:
         """Test that we return NotImplemented for unknown comparison."""
         assert Package("foo").__eq__(0) is NotImplemented
@@ -193,6 +219,35 @@ class TestPackages:
         assert packages.packages(mod_a_only) == {pkg_a}
         assert packages.packages(mod_b_only) == {pkg_b}
         assert packages.packages(mod_c_only) == {pkg_c}
+        assert packages.package_bits(mod_common) == packages.bits([pkg_a, pkg_b])
+
+
+class TestBitset:
+    """Test suite for bitsets of packages."""
+
+    def test_packages_round_trip(self) -> None:
+        """Packages with the same canonical name share a bit of the index."""
+        packages = Packages([], [(Package("Bit-A"), Module("bit_a"))])
+        bits = packages.bits([Package("bit-b"), Package("bit_a"), Package("Bit-B")])
+        assert list(bit_ids(bits)) == [0, 1]
+        assert packages.from_bits(bits) == [Package("Bit-A"), Package("bit-b")]
+        assert str(packages.from_bits(bits)[0]) == "Bit-A"
+        assert packages.from_bits(0) == []
+
+    def test_ids_per_index(self) -> None:
+        """Every index assigns its own compact ids."""
+        first, second = Packages(), Packages()
+        first.bits([Package("id_a"), Package("id_b")])
+        assert second.bit(Package("id_b")) == 1
+        assert first.bit(Package("id_b")) == 1 << 1
+
+    def test_unused_are_freed(self) -> None:
+        """Interned modules and packages are freed when they are no longer used."""
+        refs = [weakref.ref(Module("unused.module")), weakref.ref(Package("unused"))]
+        gc.collect()
+        assert [ref() for ref in refs] == [None, None]
+        assert ("unused.module", False) not in Module._interned
+        assert "unused" not in Package._interned
 
 
 class TestNormalizePkg:
@@ -219,12 +274,12 @@ class TestMkSrcFormatter:
     """Test suite for the mk_src_formatter function."""
 
     @pytest.fixture
-    def stmt(self) -> ast.stmt:
-        """AST import statement fixture."""
-        return ast.parse("import foo.bar").body[0]
+    def location(self) -> Location:
+        """Location of an import statement."""
+        return Location.of(ast.parse("import foo.bar").body[0])
 
     @pytest.mark.parametrize("verbose", [True, False])
-    def test_no_show_all_on_status_ok(self, stmt: ast.stmt, verbose: bool) -> None:
+    def test_no_show_all_on_status_ok(self, location: Location, verbose: bool) -> None:
         """If the import is expected, we do not show it."""
         cfg = AppConfig(
             file_names=[Path()],
@@ -236,7 +291,9 @@ class TestMkSrcFormatter:
         )
         formatter = cfg.mk_formatter()
         lines = formatter(
-            OkDependency(path=Path("src.py"), stmt=stmt, module=Module("foo.bar"))
+            OkDependency(
+                path=Path("src.py"), location=location, module=Module("foo.bar")
+            )
         )
         assert list(lines) == []
 
@@ -253,7 +310,7 @@ class TestMkSrcFormatter:
     )
     def test(  # pylint: disable=too-many-arguments
         self,
-        stmt: ast.stmt,
+        location: Location,
         verbose: bool,
         output_format: str,
         cause: type[WithModule],
@@ -269,20 +326,26 @@ class TestMkSrcFormatter:
             output_format=OutputFormat(output_format),
         )
         formatter = cfg.mk_formatter()
-        lines = formatter(cause(path=Path("src.py"), stmt=stmt, module=Module("foo")))
+        lines = formatter(
+            cause(path=Path("src.py"), location=location, module=Module("foo"))
+        )
         assert next(lines) == expected
         assert list(lines) == []
 
-    def test_cache(self, stmt: ast.stmt) -> None:
+    def test_cache(self, location: Location) -> None:
         """Test the cache mechanism for the formatter."""
         cfg = AppConfig(file_names=[Path()])
         formatter = cfg.mk_formatter()
         lines = [
             *formatter(
-                MissingModule(path=Path("src.py"), stmt=stmt, module=Module("foo"))
+                MissingModule(
+                    path=Path("src.py"), location=location, module=Module("foo")
+                )
             ),
             *formatter(
-                MissingModule(path=Path("src.py"), stmt=stmt, module=Module("foo"))
+                MissingModule(
+                    path=Path("src.py"), location=location, module=Module("foo")
+                )
             ),
         ]
 
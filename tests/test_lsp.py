@@ -0,0 +1,216 @@
+"""Tests for the lsp module."""
+
+from __future__ import annotations
+
+import io
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from check_dependencies import lsp
+from check_dependencies.app_config import AppConfig
+from tests.conftest import touch, write_project
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+MessageT = dict[str, Any]
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    """Create a project, return the path of a (not yet saved) source file."""
+    write_project(tmp_path, ["dep_a"])
+    return tmp_path / "a.py"
+
+
+@pytest.fixture
+def sent() -> list[MessageT]:
+    """Messages sent by the server."""
+    return []
+
+
+@pytest.fixture
+def server(sent: list[MessageT]) -> lsp.Server:
+    """Get a server collecting its messages in `sent`."""
+    return lsp.Server(AppConfig(file_names=[]), sent.append)
+
+
+def _open(path: Path, text: str) -> MessageT:
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didOpen",
+        "params": {
+            "textDocument": {"uri": path.as_uri(), "languageId": "python", "text": text}
+        },
+    }
+
+
+def _change(path: Path, text: str) -> MessageT:
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didChange",
+        "params": {
+            "textDocument": {"uri": path.as_uri(), "version": 2},
+            "contentChanges": [{"text": text}],
+        },
+    }
+
+
+def _diagnostics(sent: list[MessageT]) -> list[tuple[str, int, int, int, int]]:
+    """Get (message, line, character, end line, end character) of the last publish."""
+    assert sent[-1]["method"] == "textDocument/publishDiagnostics"
+    return [
+        (
+            diagnostic["message"],
+            diagnostic["range"]["start"]["line"],
+            diagnostic["range"]["start"]["character"],
+            diagnostic["range"]["end"]["line"],
+            diagnostic["range"]["end"]["character"],
+        )
+        for diagnostic in sent[-1]["params"]["diagnostics"]
+    ]
+
+
+def test_diagnostics_of_unsaved_buffer(
+    server: lsp.Server, sent: list[MessageT], project: Path
+) -> None:
+    """Missing and unknown modules of the buffer text are published with ranges."""
+    server.handle_batch(
+        [_open(project, "import dep_a\nimport dep_b\n__import__(name)\n")]
+    )
+    assert not project.exists()
+    assert _diagnostics(sent) == [
+        ("module dep_b", 1, 0, 1, 12),
+        ("module __import__(...)", 2, 0, 2, 16),
+    ]
+    severities = [d["severity"] for d in sent[-1]["params"]["diagnostics"]]
+    assert severities == [1, 2]
+
+
+def test_ranges_use_utf16_columns(
+    server: lsp.Server, sent: list[MessageT], project: Path
+) -> None:
+    """Columns are converted from UTF-8 bytes to UTF-16 code units."""
+    server.handle_batch([_open(project, 'x = "é😀"; import dep_b\n')])
+    assert _diagnostics(sent) == [("module dep_b", 0, 11, 0, 23)]
+
+
+def test_ranges_of_lines_with_other_breaks(
+    server: lsp.Server, sent: list[MessageT], project: Path
+) -> None:
+    """Only CR and LF end lines, as for the parser, not e.g. form feeds."""
+    text = "\x0cimport dep_b  # \x85\u2028\nimport dep_c\n"
+    server.handle_batch([_open(project, text)])
+    assert _diagnostics(sent) == [
+        ("module dep_b", 0, 1, 0, 13),
+        ("module dep_c", 1, 0, 1, 12),
+    ]
+
+
+def test_changes_are_coalesced(
+    server: lsp.Server, sent: list[MessageT], project: Path
+) -> None:
+    """Only the last text of a batch of changes is checked.
+
+    Unchanged results are not published again, syntax errors keep the last
+    diagnostics.
+    """
+    server.handle_batch([_open(project, "import dep_a\n")])
+    assert _diagnostics(sent) == []
+    server.handle_batch(
+        [_change(project, "import dep_b\n"), _change(project, "import dep_c\n")]
+    )
+    assert _diagnostics(sent) == [("module dep_c", 0, 0, 0, 12)]
+    n_sent = len(sent)
+    server.handle_batch([_change(project, "import dep_c\n\n")])
+    server.handle_batch([_change(project, "import dep_c\nimport (\n")])
+    assert len(sent) == n_sent
+
+    server.handle_batch(
+        [
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/didClose",
+                "params": {"textDocument": {"uri": project.as_uri()}},
+            }
+        ]
+    )
+    assert _diagnostics(sent) == []
+    assert server.documents == {}
+
+
+@pytest.mark.parametrize("error", [RecursionError, MemoryError])
+def test_unparsable_buffer(
+    server: lsp.Server,
+    sent: list[MessageT],
+    project: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    error: type[Exception],
+) -> None:
+    """Buffers too deeply nested or too large to parse are reported, not fatal."""
+
+    def _parse_imports(*_args: object) -> None:
+        raise error
+
+    monkeypatch.setattr(lsp, "parse_imports", _parse_imports)
+    server.handle_batch([_open(project, "import dep_a\n")])
+    ((message, *range_),) = _diagnostics(sent)
+    assert "pars" in message
+    assert range_ == [0, 0, 0, 0]
+
+
+def test_config_changes_are_picked_up(
+    server: lsp.Server, sent: list[MessageT], project: Path
+) -> None:
+    """A changed pyproject.toml is parsed again."""
+    server.handle_batch([_open(project, "import dep_b\n")])
+    assert _diagnostics(sent) == [("module dep_b", 0, 0, 0, 12)]
+    touch(
+        project.parent / "pyproject.toml",
+        '[project]\ndependencies = ["dep_a", "dep_b"]\n',
+    )
+    server.handle_batch([_change(project, "import dep_b\nimport dep_a\n")])
+    assert _diagnostics(sent) == []
+
+
+def test_file_without_project(
+    server: lsp.Server, sent: list[MessageT], tmp_path: Path
+) -> None:
+    """Files outside of any project have no diagnostics."""
+    server.handle_batch([_open(tmp_path / "a.py", "import dep_b\n")])
+    assert _diagnostics(sent) == []
+
+
+@pytest.mark.parametrize("shutdown, exit_code", [(True, 0), (False, 1)])
+def test_main(project: Path, shutdown: bool, exit_code: int) -> None:
+    """Messages are read from stdin and written to stdout with headers."""
+    stdin, stdout = io.BytesIO(), io.BytesIO()
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        _open(project, "import dep_b\n"),
+        {"jsonrpc": "2.0", "id": 2, "method": "workspace/symbol", "params": {}},
+        *([{"jsonrpc": "2.0", "id": "end", "method": "shutdown"}] if shutdown else []),
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    for message in messages:
+        lsp.write_message(stdin, message)
+    stdin.seek(0)
+
+    assert lsp.main([], stdin=stdin, stdout=stdout) == exit_code
+
+    stdout.seek(0)
+    responses = []
+    while (message := lsp.read_message(stdout)) is not None:
+        responses.append(message)
+    by_id = {response.get("id"): response for response in responses}
+    assert by_id[1]["result"]["capabilities"]["textDocumentSync"]["change"] == 1
+    assert by_id[2]["error"]["code"] == lsp._METHOD_NOT_FOUND
+    assert ("end" in by_id) is shutdown
+
+
+def test_read_message_requires_content_length() -> None:
+    """Messages without a Content-Length header end the stream."""
+    stream = io.BytesIO(b"Content-Type: x\r\n\r\n")
+    assert lsp.read_message(stream) is None
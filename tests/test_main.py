@@ -3,6 +3,8 @@
 from __future__ import annotations
 
 import ast
+import json
+import os
 import re
 import sys
 import textwrap
@@ -10,30 +12,43 @@ import time
 from pathlib import Path
 from textwrap import dedent
 from typing import TYPE_CHECKING
-from unittest.mock import MagicMock
 
 import pytest
 
+import check_dependencies.main
 import check_dependencies.pyproject_toml
 from check_dependencies.__main__ import main as cli_main
 from check_dependencies.app_config import (
     AppConfig,
     OutputFormat,
+    Parser,
     ProjectConfig,
+    ReadOptions,
 )
 from check_dependencies.lib import Module, Package, Packages
 from check_dependencies.main import (
+    FileBudgetError,
     InfoMessage,
+    OptionalDependencyConfig,
     Output,
     RegistryEntry,
+    _file_imports,
     _imports_iter,
     _ProjectRegistry,
     _source_imports_iter,
+    iter_source_files,
+    limit_findings,
+    parse_imports,
+    read_imports,
+    scoped_imports,
+    source_imports,
     yield_outputs,
 )
 from check_dependencies.outputs import (
     ExtraPackage,
     FileError,
+    ImportScope,
+    Location,
     MissingModule,
     OkDependency,
     WithModule,
@@ -152,6 +167,57 @@ def test__main__failing(args: str, expected: str, tmp_path: Path) -> None:
         assert re.search(line, lines), line
 
 
+def test__main__sarif(tmp_path: Path) -> None:
+    """The SARIF log is a single JSON document with a result per problem."""
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\ndependencies=["dep1", "dep2"]\n', "utf-8"
+    )
+    (src_path := tmp_path / "src.py").write_text("import dep1, missing", "utf-8")
+    out, exit_status = run(
+        [src_path], tmp_path / "pyproject.toml", args="--output-format sarif"
+    )
+    missing_and_extra_exit_code = 2 | 4
+    assert exit_status == missing_and_extra_exit_code
+    (run_,) = json.loads("\n".join(out))["runs"]
+    assert [result["ruleId"] for result in run_["results"]] == [
+        "MissingModule",
+        "ExtraPackage",
+    ]
+
+
+def test__main__reports(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """All reports are written from a single scan, as by separate runs."""
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\ndependencies=["dep1", "dep2"]\n', "utf-8"
+    )
+    (src_path := tmp_path / "src.py").write_text(
+        "import dep1, missing\nimport missing", "utf-8"
+    )
+    formats = ["full", "concise", "jsonl", "sarif"]
+    separate = [
+        run([src_path], tmp_path / "pyproject.toml", ["--output-format", fmt])
+        for fmt in ["github", *formats]
+    ]
+
+    parsed: list[Path] = []
+    file_imports = check_dependencies.main._file_imports
+    monkeypatch.setattr(
+        check_dependencies.main,
+        "_file_imports",
+        lambda file, *args: parsed.append(file) or file_imports(file, *args),
+    )
+    reports = [f"--report={fmt}:{tmp_path / fmt}" for fmt in formats]
+    out, exit_status = run(
+        [src_path],
+        tmp_path / "pyproject.toml",
+        ["--output-format", "github", *reports],
+    )
+    assert parsed == [src_path]
+    assert (out, exit_status) == separate[0]
+    for fmt, (lines, _) in zip(formats, separate[1:], strict=True):
+        assert (tmp_path / fmt).read_text("utf-8").splitlines() == lines, fmt
+
+
 def test__main__version(
     monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
 ) -> None:
@@ -202,9 +268,7 @@ def test__main__provides_parsing(
     """Test that --provides flags are parsed, merged, and normalized correctly."""
     captured: dict[str, Packages] = {}
 
-    def _mock_yield(
-        app_cfg: AppConfig,
-    ) -> Generator[Output, None, int]:
+    def _mock_yield(app_cfg: AppConfig, **_: object) -> Generator[Output, None, int]:
         # Consume the first pair to get the AppConfig
         captured["provides"] = app_cfg.provides
         yield InfoMessage("_mock_yield", verbose=False)
@@ -727,6 +791,157 @@ def test_imports_iter(stmt: str, expected: list[str]) -> None:
     assert [x.name for x, _ in _imports_iter(parsed.body)] == expected
 
 
+@pytest.mark.parametrize("stmt, expected", TEST_IMPORTS)
+def test_parse_imports_prefilter(stmt: str, expected: list[str]) -> None:
+    """Skipping expressions of sources without __import__ finds the same imports."""
+    source = dedent(stmt).encode()
+    imports = parse_imports(source, Path("test.py"))
+    assert [module.name for module, _ in imports] == expected
+
+
+LARGE = ReadOptions(large_file_size=16)
+
+
+def test_read_imports_large_file(tmp_path: Path) -> None:
+    """Large files are scanned like small files are parsed."""
+    (src := tmp_path / "large.py").write_text(
+        "import a\nif x:\n    from b import c\nDATA = b'import d'\n", "utf-8"
+    )
+    expected = read_imports(src)
+    assert read_imports(src, LARGE) == expected
+
+
+@pytest.mark.parametrize(
+    "source, options, message",
+    [
+        ("import a\n__import__('b')\n", LARGE, "cannot be scanned"),
+        ("import a\n" * 10, ReadOptions(max_file_size=16), "exceeds the maximum"),
+        (
+            "import a\n" * 10,
+            ReadOptions(large_file_size=16, large_file_timeout=-1),
+            "not scanned within",
+        ),
+    ],
+)
+def test_read_imports_budgets(
+    tmp_path: Path, source: str, options: ReadOptions, message: str
+) -> None:
+    """Files over a budget are reported instead of parsed."""
+    (src := tmp_path / "large.py").write_text(source, "utf-8")
+    with pytest.raises(FileBudgetError, match=message):
+        read_imports(src, options)
+    # The size of the discovery is trusted, it is not taken again.
+    assert [m.name for m, _ in read_imports(src, options, size=0)][:1] == ["a"]
+
+
+@pytest.mark.parametrize(
+    "source, options, message",
+    [
+        ("import a\n" * 10, ReadOptions(), None),
+        ("import a\n" * 10, LARGE, None),
+        ("import a\n" * 10, ReadOptions(max_file_size=16), "exceeds the maximum"),
+        ("import a\n__import__('b')\n", LARGE, "cannot be scanned"),
+        ("import a\n)", ReadOptions(), "unmatched ')'"),
+    ],
+)
+def test_source_imports(
+    tmp_path: Path, source: str, options: ReadOptions, message: str | None
+) -> None:
+    """In-memory sources have the imports and errors of files of the same size."""
+    virtual = tmp_path / "virtual.py"
+    imports = source_imports(source.encode(), virtual, options)
+    assert not virtual.exists()
+    if message is None:
+        (src := tmp_path / "src.py").write_text(source, "utf-8")
+        assert imports == read_imports(src, options)
+    else:
+        assert isinstance(imports, FileError)
+        assert imports.path == virtual
+        assert message in imports.message
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("x = " + "a." * 100_000 + "b\n", "Too deeply nested"),
+        ("x = " + "-" * 100_000 + "1\n", "Out of memory"),
+    ],
+)
+def test_file_imports_pathological_sources(
+    tmp_path: Path, source: str, message: str
+) -> None:
+    """Recursion and memory errors of the parser are reported for the file."""
+    (src := tmp_path / "deep.py").write_text(source, "utf-8")
+    error = _file_imports(src)
+    assert isinstance(error, FileError)
+    assert error.message.startswith(message)
+
+
+def test_file_imports_isolated() -> None:
+    """Files read in an isolated process have the same imports."""
+    options = ReadOptions(parse_timeout=30)
+    expected = read_imports(Path(SRC))
+    assert _file_imports(Path(SRC), options) == expected
+
+
+def test_parse_imports_nfkc_identifiers() -> None:
+    """Identifiers are normalized, so non-ASCII sources are not prefiltered."""
+    source = "__\uff49mport__('foo')\n"  # Fullwidth i
+    assert [m.name for m, _ in parse_imports(source, Path("test.py"))] == ["foo"]
+
+
+def test_scoped_imports() -> None:
+    """The scope of guarded and nested imports is recorded."""
+    source = dedent("""\
+        import a
+        if TYPE_CHECKING:
+            import b
+        else:
+            import c
+        try:
+            import d
+        except (ValueError, ModuleNotFoundError):
+            import e
+        finally:
+            import f
+        try:
+            import g
+        except ValueError:
+            pass
+        def func():
+            if typing.TYPE_CHECKING:
+                import h
+            return lambda: __import__("i")
+        """)
+    scopes = {
+        module.name: scope
+        for module, _, scope in scoped_imports(ast.parse(source).body)
+    }
+    assert scopes == {
+        "a": ImportScope.MODULE,
+        "b": ImportScope.TYPE_CHECKING,
+        "c": ImportScope.MODULE,
+        "d": ImportScope.IMPORT_ERROR,
+        "e": ImportScope.IMPORT_ERROR,
+        "f": ImportScope.MODULE,
+        "g": ImportScope.MODULE,
+        "h": ImportScope.FUNCTION | ImportScope.TYPE_CHECKING,
+        "i": ImportScope.FUNCTION,
+    }
+
+
+def test_parse_imports_scope() -> None:
+    """Only imports parsed with ast know their scope."""
+    source = "import a\nif TYPE_CHECKING:\n    import b\n"
+    imports = parse_imports(source, Path("test.py"), Parser.AST)
+    assert [location.scope for _, location in imports] == [
+        ImportScope.MODULE,
+        ImportScope.TYPE_CHECKING,
+    ]
+    imports = parse_imports(source, Path("test.py"), Parser.FAST)
+    assert [location.scope for _, location in imports] == [None, None]
+
+
 def project_cfg(
     known_missing: Collection[Module] = (),
     defined_dependencies: Collection[Package] = (),
@@ -746,11 +961,38 @@ def project_cfg(
     )
 
 
-def test_missing_import_iter_silent_on_invalid_python_code() -> None:
+def test_registry_entry_forget() -> None:
+    """Forgetting a file only removes the packages no other file imports."""
+    dep_a, dep_b, opt = Package("dep_a"), Package("dep_b"), Package("opt")
+    cfg = project_cfg(defined_dependencies=[dep_a, dep_b])
+    entry = RegistryEntry(
+        cfg, [OptionalDependencyConfig(Path("tests"), {opt}, cfg.packages)]
+    )
+    for path, packages in (
+        (Path("src/a.py"), [dep_a, dep_b]),
+        (Path("src/b.py"), [dep_a]),
+        (Path("tests/t.py"), [opt]),
+    ):
+        entry.mark_used(path)
+        entry._add_imports(path, cfg.packages.bits(packages))
+    assert entry.seen == {dep_a, dep_b}
+    assert entry.optionals[0].used
+    assert entry.get_superfluous_dependencies() == []
+
+    entry.forget(Path("src/a.py"))
+    assert entry.seen == {dep_a}
+    assert entry.get_superfluous_dependencies() == [dep_b]
+    entry.forget(Path("tests/t.py"))
+    assert not entry.optionals[0].used
+    assert entry.optionals[0].imported == frozenset()
+    entry.forget(Path("unknown.py"))
+    assert entry.seen == {dep_a}
+
+
+def test_missing_import_iter_silent_on_invalid_python_code(tmp_path: Path) -> None:
     """Test that missing imports iterator catches invalid Python code."""
-    my_path = MagicMock()
-    my_path.as_posix.return_value = "dummy.py"
-    my_path.read_bytes.return_value = b"()foo"
+    my_path = tmp_path / "dummy.py"
+    my_path.write_bytes(b"()foo")
     entry = RegistryEntry(project_cfg(), [])
     res = list(_source_imports_iter(my_path, entry))
     assert len(res) == 1
@@ -896,6 +1138,27 @@ def test_source_imports_iter_unicode_file(tmp_path: Path) -> None:
     assert statuses["café.something"] == MissingModule
 
 
+@pytest.mark.parametrize("output_format", OutputFormat)
+def test_yield_outputs_kinds(output_format: OutputFormat) -> None:
+    """Outputs the format does not need are not built; the rest stays the same."""
+    cfg = AppConfig(file_names=[SRC_MODULE], output_format=output_format)
+    everything = list(yield_outputs(cfg))
+    needed = list(yield_outputs(cfg, kinds=cfg.output_kinds))
+    assert needed == [
+        output
+        for output in everything
+        if not isinstance(output, WithModule) or type(output) in cfg.output_kinds
+    ]
+    assert any(isinstance(output, OkDependency) for output in everything)
+    assert (OkDependency in cfg.output_kinds) == (
+        output_format in (OutputFormat.FULL, OutputFormat.JSONL)
+    )
+    shown, all_shown = cfg.mk_formatter(), cfg.mk_formatter()
+    assert [line for output in needed for line in shown(output)] == [
+        line for output in everything for line in all_shown(output)
+    ]
+
+
 @pytest.mark.performance
 def test_performance_large_project(tmp_path: Path) -> None:
     """Test the performance of yield_outputs on a large project."""
@@ -910,3 +1173,72 @@ def test_performance_large_project(tmp_path: Path) -> None:
     duration = time.time() - start
 
     assert duration < max_duration_per_file * n_files
+
+
+@pytest.mark.parametrize(
+    "max_findings, n_outputs, skipped",
+    [
+        (None, 5, None),
+        (1, 2, "remaining files"),
+        (2, 4, "remaining files"),
+        (3, 5, "remaining unused dependencies"),
+        (4, 5, None),
+    ],
+)
+def test_limit_findings(
+    caplog: pytest.LogCaptureFixture,
+    max_findings: int | None,
+    n_outputs: int,
+    skipped: str | None,
+) -> None:
+    """Outputs stop after a number of failing ones, skipped checks are logged."""
+    location = Location(1, 0, 1, 1)
+    outputs = [
+        OkDependency(Path("a.py"), location, Module("ok")),
+        MissingModule(Path("a.py"), location, Module("a")),
+        OkDependency(Path("b.py"), location, Module("ok")),
+        MissingModule(Path("b.py"), location, Module("b")),
+        ExtraPackage(project_cfg(), Package("extra")),
+    ]
+    source = (output for output in outputs)
+    assert list(limit_findings(source, max_findings)) == outputs[:n_outputs]
+    assert list(source) == []  # closed
+    assert skipped in caplog.text if skipped else not caplog.text
+
+
+@pytest.mark.parametrize("max_findings", ["0", "-3"])
+def test_max_findings_invalid(
+    max_findings: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Limits below 1 are rejected instead of hiding findings."""
+    usage_exit_code = 2
+    with pytest.raises(SystemExit) as exc:
+        run([SRC], POETRY, ["--max-findings", max_findings])
+    assert exc.value.code == usage_exit_code
+    assert "must be at least 1" in capsys.readouterr().err
+    with pytest.raises(ValueError, match="at least 1"):
+        list(limit_findings(iter([]), int(max_findings)))
+
+
+def test_fail_fast_changed_first(tmp_path: Path) -> None:
+    """The most recently changed file is scanned first and stops the run."""
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\ndependencies=["extra"]\n', "utf-8"
+    )
+    for i in range(3):
+        (src := tmp_path / f"src_{i}.py").write_text(f"import missing_{i}", "utf-8")
+        os.utime(src, ns=(i, (3 - i) * 10**9))
+    app_cfg = AppConfig(file_names=[tmp_path], changed_first=True)
+    assert [p.name for p in iter_source_files(app_cfg)] == [
+        "src_0.py",
+        "src_1.py",
+        "src_2.py",
+    ]
+    out, exit_status = run(
+        [tmp_path / "src_2.py", tmp_path],
+        tmp_path / "pyproject.toml",
+        "--fail-fast --changed-first --verbose",
+    )
+    missing_module_exit_code = 2
+    assert exit_status == missing_module_exit_code
+    assert [line.rpartition(" ")[2] for line in out] == ["missing_0"]
@@ -0,0 +1,133 @@
+"""Tests for the output_stream module."""
+
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+from check_dependencies.app_config import FlushPolicy
+from check_dependencies.output_stream import OutputStream, open_output
+from tests.run import run
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class _Stream(io.StringIO):
+    """String stream recording its writes."""
+
+    def __init__(self, *, tty: bool = False) -> None:
+        super().__init__()
+        self.tty = tty
+        self.writes: list[str] = []
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    def write(self, s: str) -> int:
+        self.writes.append(s)
+        return super().write(s)
+
+
+class _ClosedPipe(_Stream):
+    """Stream of a pipe whose reader is gone."""
+
+    def write(self, s: str) -> int:
+        super().write(s)
+        raise BrokenPipeError
+
+
+def test_lines_are_written_in_chunks() -> None:
+    """Lines are joined and only written once the buffer is full."""
+    stream = _Stream()
+    output = OutputStream(stream, buffer_size=len("a\nbb\n"))
+    output(["a"])
+    output([])
+    assert stream.writes == []
+    output(["bb", "ccc"])
+    assert stream.writes == ["a\nbb\nccc\n"]
+    output(["d"])
+    output.flush()
+    assert stream.getvalue() == "a\nbb\nccc\nd\n"
+
+
+@pytest.mark.parametrize(
+    "flush, tty, expected",
+    [
+        (FlushPolicy.AUTO, True, ["a\n", "b\nc\n"]),
+        (FlushPolicy.AUTO, False, []),
+        (FlushPolicy.OUTPUT, False, ["a\n", "b\nc\n"]),
+        (FlushPolicy.BUFFER, True, []),
+    ],
+)
+def test_flush_policy(flush: FlushPolicy, tty: bool, expected: list[str]) -> None:
+    """Every output is written at once on terminals or if asked for."""
+    stream = _Stream(tty=tty)
+    output = OutputStream(stream, flush=flush)
+    output(["a"])
+    output([])
+    output(["b", "c"])
+    assert stream.writes == expected
+
+
+def test_broken_pipe() -> None:
+    """A closed pipe is reported once, later lines are dropped quietly."""
+    stream = _ClosedPipe()
+    output = OutputStream(stream)
+    output(["a"])
+    with pytest.raises(BrokenPipeError):
+        output.flush()
+    output(["b"])
+    output.flush()
+    assert stream.writes == ["a\n"]
+    assert output.broken
+
+
+def test_broken_pipe_exit(tmp_path: Path) -> None:
+    """The check stops without a traceback when the reader closes the pipe."""
+    (tmp_path / "pyproject.toml").write_text("[project]\ndependencies=[]\n", "utf-8")
+    for i in range(100):
+        (tmp_path / f"src{i}.py").write_text(
+            "".join(f"import missing{j}\n" for j in range(100)), "utf-8"
+        )
+    proc = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "check_dependencies", "--verbose", str(tmp_path)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if proc.stdout is None or proc.stderr is None:  # pragma: no cover
+        pytest.fail("no pipes")
+    assert proc.stdout.readline()
+    proc.stdout.close()
+    stderr = proc.stderr.read()
+    proc.stderr.close()
+    assert proc.wait() == 1
+    assert b"Traceback" not in stderr
+    assert b"BrokenPipeError" not in stderr
+
+
+def test_open_output_writes_file(tmp_path: Path) -> None:
+    """The buffered lines are written to the file when the context exits."""
+    path = tmp_path / "out.txt"
+    path.write_text("old\n", "utf-8")
+    with open_output(path) as output:
+        output(["ä", "b"])
+        assert path.read_text("utf-8") == ""
+    assert path.read_text("utf-8") == "ä\nb\n"
+
+
+def test_output_option(tmp_path: Path) -> None:
+    """A check writes its output to the --output file instead of stdout."""
+    (tmp_path / "pyproject.toml").write_text("[project]\ndependencies=[]\n", "utf-8")
+    (src := tmp_path / "src.py").write_text("import missing", "utf-8")
+    out_file = tmp_path / "out.txt"
+    lines, exit_code = run(
+        [src], tmp_path / "pyproject.toml", args=["--output", str(out_file)]
+    )
+    assert lines == []
+    assert exit_code
+    assert out_file.read_text("utf-8") == "! missing\n"
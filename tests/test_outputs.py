@@ -1,6 +1,7 @@
 """Tests for outputs module."""
 
 import ast
+import json
 from itertools import chain
 from pathlib import Path
 from typing import NamedTuple
@@ -14,7 +15,7 @@ from check_dependencies.lib import Module, Package, Packages
 PATH = Path("foo.py")
 MODULE = Module("my_module")
 PACKAGE = Package("MyPackage")
-STMT = ast.Pass(lineno=1, col_offset=3, end_lineno=1, end_col_offset=7)
+LOCATION = outputs.Location(lineno=1, col_offset=3, end_lineno=1, end_col_offset=7)
 PRJ_CFG = ProjectConfig(
     known_missing=(),
     defined_dependencies=(),
@@ -25,15 +26,19 @@ PRJ_CFG = ProjectConfig(
     optional_dependencies={},
 )
 
-OUT_OK = outputs.OkDependency(PATH, STMT, MODULE)
+OUT_OK = outputs.OkDependency(PATH, LOCATION, MODULE)
 OUT_NO_PYPROJECT = outputs.NoPyprojectError("/foo/pyproject.toml")
 OUT_EXTRA = outputs.ExtraPackage(PRJ_CFG, PACKAGE)
 OUT_FILE_ERROR = outputs.FileError(PATH, "Parsing failure")
 OUT_INFO = outputs.InfoMessage("message", verbose=False)
 OUT_INFO_VERBOSE = outputs.InfoMessage("message", verbose=True)
-OUT_MISSING = outputs.MissingModule(PATH, STMT, MODULE)
+OUT_MISSING = outputs.MissingModule(PATH, LOCATION, MODULE)
 OUT_UNKNOWN = outputs.UnknownModule(
-    PATH, ast.Call(ast.Constant("my_module"), [], [], lineno=1, col_offset=3), MODULE
+    PATH,
+    outputs.Location.of(
+        ast.Call(ast.Constant("my_module"), [], [], lineno=1, col_offset=3)
+    ),
+    MODULE,
 )
 
 
@@ -83,6 +88,17 @@ def test_as_github(output: outputs.Output, expected: str) -> None:
     )
 
 
+def test_as_github_working_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Relative paths are annotated in the current working directory."""
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        monkeypatch.chdir(tmp_path / name)
+        (annotation,) = OUT_MISSING.as_github()
+        assert f"file={((tmp_path / name).resolve() / PATH).as_posix()}," in annotation
+
+
 class TextResult(NamedTuple):
     """All possible results of an output."""
 
@@ -166,3 +182,130 @@ def test_to_text_no_verbose_nor_show_all(output: outputs.Output, expected: list[
     assert res == expected
     if res:
         assert seen
+
+
+def test_location_of_statement() -> None:
+    """Locations keep the source range of a statement, but not the statement."""
+    stmt = ast.parse("x = 1\nimport foo").body[1]
+    location = outputs.Location.of(stmt)
+    assert location == outputs.Location(2, 0, 2, 10)
+    assert not hasattr(location, "__dict__")
+    assert outputs.load_location(outputs.dump_location(location)) == location
+
+
+@pytest.mark.parametrize(
+    "scope", [None, outputs.ImportScope.MODULE, *outputs.ImportScope]
+)
+def test_location_scope(scope: outputs.ImportScope | None) -> None:
+    """The scope of a location is kept by dump and load, but not compared."""
+    location = outputs.Location(2, 0, 2, 10, scope)
+    loaded = outputs.load_location(
+        json.loads(json.dumps(outputs.dump_location(location)))
+    )
+    assert loaded.scope is scope
+    assert loaded == outputs.Location(2, 0, 2, 10)
+
+
+JSONL_KEYS = ["kind", "file", "range", "module", "package", "project"]
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        (
+            outputs.MissingModule(PATH, LOCATION, MODULE, PRJ_CFG),
+            ["MissingModule", "foo.py", [1, 3, 1, 7], "my_module", "my_module"],
+        ),
+        (OUT_OK, ["OkDependency", "foo.py", [1, 3, 1, 7], "my_module", None]),
+        (
+            OUT_EXTRA,
+            ["ExtraPackage", "foo/pyproject.toml", None, None, "MyPackage"],
+        ),
+        (OUT_FILE_ERROR, ["FileError", "foo.py", None, None, None]),
+        (OUT_NO_PYPROJECT, ["NoPyprojectError", None, None, None, None]),
+        (OUT_INFO_VERBOSE, ["InfoMessage", None, None, None, None]),
+    ],
+)
+def test_as_jsonl(output: outputs.Output, expected: list) -> None:
+    """Every output is a single JSON object with the same keys in the same order."""
+    (line,) = output.as_jsonl(verbose=False)
+    record = json.loads(line)
+    assert "\n" not in line
+    assert list(record) == [*JSONL_KEYS, "message", "exit_code"]
+    assert [record[key] for key in JSONL_KEYS[:-1]] == expected
+    assert record["exit_code"] == output.exit_code
+    if isinstance(output, (outputs.ExtraPackage, outputs.WithModule)):
+        assert record["project"] == (
+            None if output.project_cfg is None else "foo/pyproject.toml"
+        )
+
+
+def test_as_jsonl_escapes_and_info() -> None:
+    """Strings are escaped and info messages are only written when verbose."""
+    output = outputs.FileError(Path('déjà/"x".py'), "line\nbreak")
+    (line,) = output.as_jsonl(verbose=False)
+    assert json.loads(line)["file"] == 'déjà/"x".py'
+    assert json.loads(line)["message"] == "line\nbreak"
+    assert list(OUT_INFO.as_jsonl(verbose=False)) == []
+    assert len(list(OUT_INFO.as_jsonl(verbose=True))) == 1
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        (OUT_MISSING, ["MissingModule", "error", "foo.py", [1, 4, 1, 8]]),
+        (OUT_UNKNOWN, ["UnknownModule", "warning", "foo.py", [1, 4, 1, 5]]),
+        (OUT_EXTRA, ["ExtraPackage", "error", "foo/pyproject.toml", [1, 1, 1, 2]]),
+        (OUT_FILE_ERROR, ["FileError", "error", "foo.py", None]),
+        (OUT_NO_PYPROJECT, ["NoPyprojectError", "error", None, None]),
+    ],
+)
+def test_as_sarif(output: outputs.Output, expected: list) -> None:
+    """Problems are SARIF results of their rule, located at their 1-based range."""
+    start, end = outputs.sarif_log("1.0")
+    (line,) = output.as_sarif()
+    log = json.loads(f"{start}{line}{end}")
+    rules = log["runs"][0]["tool"]["driver"]["rules"]
+    (result,) = log["runs"][0]["results"]
+    assert "\n" not in line
+    assert [rule["id"] for rule in rules] == [
+        "MissingModule",
+        "UnknownModule",
+        "ExtraPackage",
+        "FileError",
+        "NoPyprojectError",
+    ]
+    assert rules[result["ruleIndex"]]["id"] == result["ruleId"]
+    assert rules[result["ruleIndex"]]["properties"]["exit_code"] == output.exit_code
+    locations = result.get("locations", [{}])
+    artifact = locations[0].get("physicalLocation", {})
+    region = artifact.get("region")
+    assert [
+        result["ruleId"],
+        result["level"],
+        artifact.get("artifactLocation", {}).get("uri"),
+        region
+        and [
+            region["startLine"],
+            region["startColumn"],
+            region["endLine"],
+            region["endColumn"],
+        ],
+    ] == expected
+
+
+@pytest.mark.parametrize("output", [OUT_OK, OUT_INFO, OUT_INFO_VERBOSE])
+def test_as_sarif_not_a_result(output: outputs.Output) -> None:
+    """Correct imports and info messages are not SARIF results."""
+    assert list(output.as_sarif()) == []
+
+
+def test_as_sarif_uri() -> None:
+    """Relative paths are quoted, absolute paths are file URIs."""
+    for path, expected in [
+        (Path("a b/c.py"), "a%20b/c.py"),
+        (Path("/a b/c.py").absolute(), Path("/a b/c.py").absolute().as_uri()),
+    ]:
+        (line,) = outputs.FileError(path, "").as_sarif()
+        (location,) = json.loads(line)["locations"]
+        assert location["physicalLocation"]["artifactLocation"]["uri"] == expected
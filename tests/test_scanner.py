@@ -0,0 +1,134 @@
+"""Tests for the scanner module."""
+
+from __future__ import annotations
+
+import mmap
+from pathlib import Path
+
+import pytest
+
+from check_dependencies.app_config import Parser
+from check_dependencies.main import parse_imports
+from check_dependencies.outputs import Location
+from check_dependencies.scanner import scan_imports
+from tests.conftest import DATA, POETRY
+from tests.run import run
+
+SRC = Path(__file__).parents[1] / "src"
+
+SOURCES = [
+    "import a\nif x:\n    import b\nelse:\n    import c\n",
+    (
+        "try:\n    if y:\n        import deep\n    import shallow\n"
+        "except ImportError:\n    import handler\nelse:\n    import orelse\n"
+        "finally:\n    import fin\n"
+    ),
+    (
+        "if a:\n    if b:\n        import x\nelif c:\n    import y\nelif d:\n"
+        "    import z\nelse:\n    import w\nimport v\n"
+    ),
+    (
+        "def f():\n    import a\n    def g():\n        import b\n    import c\n"
+        "class C:\n    import d\n    def m(self): import e\n"
+    ),
+    "match x:\n    case 1:\n        import a\n    case _: import b\nimport c\n",
+    "match = 1\nimport a\nif match:\n    import b\n",
+    "x = (\n1)\nif y:\n  import a\nimport b\n",
+    (
+        "def f():\n    x = foo(\n1, 2)\n    import y\n    if z:\n        import w\n"
+        "    import v\n"
+    ),
+    "import a; import b\nif x: import c; import d\n",
+    "from a import (b,\n  c as d, # comment )\n  e,)\n",
+    "from . import x\nfrom .a import b\nfrom a.b import *\nfrom a \\\n  import b\n",
+    "import a.b as c, d . e\n",
+    's = """\nimport fake\n"""\nimport real\n',
+    "x = '#'; import a  # import b\n",
+    (
+        "for i in x:\n    import a\nelse:\n    import b\nwhile y:\n    pass\n"
+        "else:\n    import c\n"
+    ),
+    "async def f():\n    async with x:\n        import a\n    import b\n",
+    "if x:\n\timport a\n\tif y:\n\t\timport b\n\timport c\n",
+    "class A:\n    '''doc'''\n    if x:\n        import a\n    import b\n",
+    "@dec\ndef f():\n    import a\n",
+    "if True:\n    x = 1 \\\n        + 2\n    import a\n",
+    "s = 'é'; import ü_mod\nimport \uff4dodule\n",
+    "if x:\n    pass\n# comment\n    # indented comment\nelse:\n    import y\n",
+    "import a\n\x0cimport b\n",
+    "f'{x!r:>{w}}'; import y\n",
+    "x = 1\n",
+]
+
+
+def _summary(imports: object) -> list[tuple[str, Location]]:
+    """Get the names and locations of the imports."""
+    assert isinstance(imports, list)
+    return [(module.name, location) for module, location in imports]
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_scan_equals_ast(source: str) -> None:
+    """Imports, their order and locations are the same as with `ast`."""
+    expected = _summary(parse_imports(source, Path("t.py")))
+    assert _summary(scan_imports(source)) == expected
+    assert _summary(scan_imports(source.encode())) == expected
+
+
+@pytest.mark.parametrize(
+    "path",
+    [*sorted(SRC.rglob("*.py")), *sorted(DATA.rglob("*.py"))],
+    ids=lambda path: path.name,
+)
+def test_scan_equals_ast_for_files(path: Path) -> None:
+    """Real files are scanned the same as parsed, or parsed as a fallback."""
+    source = path.read_bytes()
+    expected = _summary(parse_imports(source, path))
+    assert _summary(parse_imports(source, path, Parser.FAST)) == expected
+
+
+def test_scan_memory_mapped_file(tmp_path: Path) -> None:
+    """Memory-mapped sources are decoded as declared by their coding cookie."""
+    source = "# coding: latin-1\nimport caf\u00e9\nx = '\u00e9'\n".encode("latin-1")
+    (path := tmp_path / "a.py").write_bytes(source)
+    with (
+        path.open("rb") as stream,
+        mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+    ):
+        assert _summary(scan_imports(mapped)) == _summary(scan_imports(source))
+    assert _summary(scan_imports(source)) == [("caf\u00e9", Location(2, 0, 2, 12))]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "x = __import__('a')\n",
+        "x = __\uff49mport__('a')\n",
+        's = """\nimport a\n',
+        "x = f'{d['k']}'\nimport a\n",
+    ],
+)
+def test_uncertain_sources(source: str) -> None:
+    """Dynamic imports and literals that cannot be delimited are not scanned."""
+    assert scan_imports(source) is None
+
+
+def test_parse_imports_falls_back_to_ast() -> None:
+    """Sources the scanner is uncertain about are parsed."""
+    source = "import a\n__import__('b')\n"
+    imports = parse_imports(source, Path("t.py"), Parser.FAST)
+    assert [module.name for module, _ in imports] == ["a", "b"]
+
+
+def test_syntax_errors_are_tolerated() -> None:
+    """Statements are found without parsing the whole file."""
+    assert _summary(scan_imports("print 'py2'\nimport os\n")) == [
+        ("os", Location(2, 0, 2, 9))
+    ]
+
+
+def test_cli_parser_option() -> None:
+    """Outputs are the same with both parsers."""
+    args = "--output-format full --verbose"
+    expected = run([DATA], POETRY, args)
+    assert run([DATA], POETRY, f"{args} --parser fast") == expected
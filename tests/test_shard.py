@@ -0,0 +1,169 @@
+"""Tests for the shard module."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from check_dependencies import shard
+from check_dependencies.app_config import AppConfig, OutputFormat, Parser, Shard
+from tests.conftest import DATA, POETRY, PYPROJECT_CFG
+from tests.run import run
+
+N_SHARDS = 3
+
+
+def _sharded(
+    files: list[Path], pyproject_toml: Path, args: str, tmp_path: Path
+) -> tuple[list[str], int]:
+    """Run all shards, then merge the partial results."""
+    partials = []
+    for index in range(1, N_SHARDS + 1):
+        lines, exit_code = run(
+            files, pyproject_toml, f"--shard {index}/{N_SHARDS}", comment=True
+        )
+        assert exit_code == 0
+        (partial := tmp_path / f"partial-{index}.json").write_text("\n".join(lines))
+        partials.append(partial)
+    return run(partials, pyproject_toml, f"merge {args}", comment=True)
+
+
+@pytest.fixture
+def monorepo(tmp_path: Path) -> Path:
+    """Two projects, one with optional dependencies mapped to a path."""
+    for name, deps in (("proj_a", '["dep_a", "unused_a"]'), ("proj_b", '["dep_b"]')):
+        (proj := tmp_path / "repo" / name).mkdir(parents=True)
+        (proj / "pyproject.toml").write_text(
+            dedent(f"""\
+            [project]
+            name = "{name}"
+            dependencies = {deps}
+            [project.optional-dependencies]
+            opt = ["opt_used", "opt_unused"]
+            [tool.check-dependencies.optional-dependencies]
+            opt = ["src/opt"]
+            """),
+            "utf-8",
+        )
+        (proj / "src" / "opt").mkdir(parents=True)
+        (proj / "src" / "opt" / "mod.py").write_text("import opt_used\n", "utf-8")
+        for i in range(10):
+            (proj / "src" / f"mod_{i}.py").write_text(
+                f"import dep_a\nimport dep_b\nimport missing_{i}\n"
+                f"__import__(name{i})\n",
+                "utf-8",
+            )
+    (tmp_path / "repo" / "proj_a" / "src" / "broken.py").write_text("()foo", "utf-8")
+    return tmp_path / "repo"
+
+
+@pytest.mark.parametrize("output_format", OutputFormat)
+@pytest.mark.parametrize("verbose", ["", "--verbose"])
+def test_merge_equals_unsharded(
+    monorepo: Path, tmp_path: Path, output_format: OutputFormat, verbose: str
+) -> None:
+    """Merged output and exit code are the same as for an unsharded run."""
+    args = f"--output-format {output_format.value} {verbose}"
+    files = [monorepo / "proj_b", monorepo / "proj_a"]
+    unsharded = run(files, Path("pyproject.toml"), args, comment=True)
+    assert unsharded[1]
+    assert _sharded(files, Path("pyproject.toml"), args, tmp_path) == unsharded
+
+
+@pytest.mark.parametrize("pyproject_toml", [POETRY, PYPROJECT_CFG])
+def test_merge_equals_unsharded_data(pyproject_toml: Path, tmp_path: Path) -> None:
+    """Merged output equals the unsharded output on the test data."""
+    args = "--output-format full --verbose"
+    unsharded = run([DATA], pyproject_toml, args, comment=True)
+    assert _sharded([DATA], pyproject_toml, args, tmp_path) == unsharded
+
+
+def test_merge_reports(monorepo: Path, tmp_path: Path) -> None:
+    """A merge writes the reports of the merged outputs, too."""
+    files = [monorepo / "proj_b", monorepo / "proj_a"]
+    full = run(files, Path("pyproject.toml"), "--output-format full", comment=True)
+    report = tmp_path / "full.txt"
+    merged = _sharded(
+        files, Path("pyproject.toml"), f"--report full:{report}", tmp_path
+    )
+    assert merged[1] == full[1]
+    assert report.read_text("utf-8").splitlines() == full[0]
+
+
+def test_shards_partition_files(monorepo: Path) -> None:
+    """Every file belongs to exactly one shard."""
+    files = list(monorepo.rglob("*.py"))
+    shards = [Shard(i, N_SHARDS) for i in range(1, N_SHARDS + 1)]
+    assert all(sum(s.includes(file) for s in shards) == 1 for file in files)
+
+
+@pytest.mark.parametrize("value", ["1", "0/2", "3/2", "a/b"])
+def test_shard_parse_invalid(value: str) -> None:
+    """Shards are 1-based and need both index and count."""
+    with pytest.raises(ValueError, match=r"."):
+        Shard.parse(value)
+
+
+def test_shard_str() -> None:
+    """The string representation can be parsed again."""
+    assert Shard.parse(str(Shard(2, 5))) == Shard(2, 5)
+
+
+def _partial(
+    index: int, count: int, config: str = "src", parser: Parser = Parser.AST
+) -> dict:
+    app_cfg = AppConfig(file_names=[Path(config)], parser=parser)
+    return json.loads(shard.dumps(shard._partial(app_cfg, Shard(index, count), [], [])))
+
+
+@pytest.mark.parametrize(
+    "partials, match",
+    [
+        ([], "No partial results"),
+        ([_partial(1, 2)], "one partial result per shard"),
+        ([_partial(1, 2), _partial(1, 2)], "one partial result per shard"),
+        ([_partial(1, 2), _partial(2, 2, "other")], "different configurations"),
+        (
+            [_partial(1, 2), _partial(2, 2, parser=Parser.FAST)],
+            "different configurations",
+        ),
+        ([{**_partial(1, 1), "version": 0}], "Unsupported partial result version"),
+        ([[]], "Unsupported partial result version"),
+        ([{**_partial(1, 1), "findings": [{"kind": "Other"}]}], "Malformed"),
+        ([{**_partial(1, 1), "projects": [{"path": "a"}]}], "Malformed"),
+        ([{**_partial(1, 1), "findings": [{"kind": "FileError"}]}], "Malformed"),
+    ],
+)
+def test_load_partials_invalid(partials: list[dict], match: str) -> None:
+    """Incomplete or incompatible partial results are rejected."""
+    with pytest.raises(ValueError, match=match):
+        shard.load_partials(partials)
+
+
+def test_merge_cli_changed_optionals(monorepo: Path, tmp_path: Path) -> None:
+    """Partial results of changed optional dependencies are rejected cleanly."""
+    files = [monorepo / "proj_a"]
+    lines, _ = run(files, Path("pyproject.toml"), "--shard 1/1", comment=True)
+    (partial := tmp_path / "partial.json").write_text("\n".join(lines), "utf-8")
+    pyproject = monorepo / "proj_a" / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text("utf-8").split("[project.optional-dependencies]")[0],
+        "utf-8",
+    )
+    assert run([partial], Path("pyproject.toml"), "merge") == ([], 1)
+
+
+def test_changed_first_shard(capsys: pytest.CaptureFixture[str]) -> None:
+    """Changed files first would change the file order a merge relies on."""
+    usage_exit_code = 2
+    assert run([DATA], POETRY, "--shard 1/2 --changed-first") == ([], usage_exit_code)
+    assert "--changed-first cannot be combined" in capsys.readouterr().err
+
+
+def test_merge_cli_invalid_file(tmp_path: Path) -> None:
+    """Unreadable partial results exit with an error."""
+    (partial := tmp_path / "partial.json").write_text("{", "utf-8")
+    assert run([partial], POETRY, "merge") == ([], 1)
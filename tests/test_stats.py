@@ -0,0 +1,76 @@
+"""Tests for the stats module."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from check_dependencies import stats as stats_module
+from check_dependencies.lib import Module, Package, Packages
+from check_dependencies.stats import ProjectStats
+from tests.run import run
+
+
+def test_project_stats() -> None:
+    """Imports are counted per module, package and file."""
+    stats = ProjectStats(Packages(packages=[(Package("Pillow"), Module("PIL"))]))
+    file_imports = {
+        "a.py": ["PIL.Image", "PIL", "os"],
+        "b.py": ["PIL.Image"],
+        "c.py": ["os.path", "os.path"],
+    }
+    for file, modules in file_imports.items():
+        for module in modules:
+            stats.add_import(Module(module))
+        stats.add_file(Path(file), len(modules))
+    stats.add_import(Module("__import__(name)", raw=True))
+    stats.add_error()
+    expected_counts = (len(file_imports) + 1, 7, 5, 1)
+    assert (
+        stats.files,
+        stats.imports,
+        stats.modules,
+        stats.parse_errors,
+    ) == expected_counts
+    assert stats.package_imports() == [(Package("os"), 3), (Package("Pillow"), 3)]
+    assert [(str(path), n) for path, n in stats.top_files()] == [
+        ("a.py", 3),
+        ("c.py", 2),
+        ("b.py", 1),
+    ]
+
+
+def test_top_files_are_bounded() -> None:
+    """Only the files with the most imports are kept."""
+    stats = ProjectStats(Packages())
+    for i in range(2 * stats_module.TOP_FILES):
+        stats.add_file(Path(f"{i}.py"), i)
+    assert [n for _, n in stats.top_files()] == list(
+        range(2 * stats_module.TOP_FILES - 1, stats_module.TOP_FILES - 1, -1)
+    )
+
+
+def test_stats_file(tmp_path: Path) -> None:
+    """The statistics of a check are written to the stats file."""
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\ndependencies=["dep1", "dep2"]\n', "utf-8"
+    )
+    (tmp_path / "a.py").write_text("import dep1, os\nimport dep1.sub", "utf-8")
+    (tmp_path / "b.py").write_text("import os\n", "utf-8")
+    (tmp_path / "broken.py").write_text("()foo", "utf-8")
+    stats_file = tmp_path / "stats.txt"
+    run(
+        [tmp_path / "a.py", tmp_path / "b.py", tmp_path / "broken.py"],
+        tmp_path / "pyproject.toml",
+        ["--stats-file", str(stats_file)],
+    )
+    assert stats_file.read_text("utf-8").splitlines()[1:] == [
+        "FILES=3",
+        "IMPORTS=4",
+        "MODULES=3",
+        "PARSE_ERRORS=1",
+        "PACKAGE dep1 2",
+        "PACKAGE os 2",
+        f"TOP_FILE {(tmp_path / 'a.py').as_posix()} 3",
+        f"TOP_FILE {(tmp_path / 'b.py').as_posix()} 1",
+        "UNUSED dep2",
+    ]
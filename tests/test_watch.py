@@ -0,0 +1,174 @@
+"""Tests for the watch module."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from check_dependencies.app_config import AppConfig
+from check_dependencies.watch import Watcher
+from tests.conftest import touch, write_project
+from tests.run import run
+
+if TYPE_CHECKING:
+    from check_dependencies.outputs import Output
+
+
+def _text(outputs: list[Output]) -> list[str]:
+    seen = set()
+    return [
+        line
+        for output in outputs
+        for line in output.to_text(verbose=False, show_all=False, seen=seen)
+    ]
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    """Create a project with two source files."""
+    write_project(
+        tmp_path,
+        ["dep_a", "dep_b"],
+        {"src/a.py": "import dep_a\n", "src/b.py": "import dep_b\nimport missing_b\n"},
+    )
+    return tmp_path / "src"
+
+
+@pytest.fixture
+def watcher(project: Path) -> Watcher:
+    """Get a watcher after the initial scan."""
+    watcher = Watcher(AppConfig(file_names=[project]))
+    watcher.scan()
+    return watcher
+
+
+def test_scan_equals_run(project: Path) -> None:
+    """The initial scan reports the same as a regular run."""
+    lines, _ = run([project], Path("pyproject.toml"))
+    watcher = Watcher(AppConfig(file_names=[project]))
+    assert _text(watcher.scan()) == lines
+
+
+def test_poll_no_change(watcher: Watcher) -> None:
+    """Nothing is reported if nothing changed."""
+    assert watcher.poll() == []
+
+
+def test_poll_changed_file(watcher: Watcher, project: Path) -> None:
+    """Only the changed file and changed project outputs are reported."""
+    touch(project / "b.py", "import missing_b2\n")
+    assert _text(watcher.poll()) == [
+        f"# CHECKED {(project / 'b.py').as_posix()}",
+        "! missing_b2",
+        "+ dep_b",
+    ]
+    assert watcher.poll() == []
+
+
+def test_poll_added_and_deleted_file(watcher: Watcher, project: Path) -> None:
+    """Added files are parsed, deleted files are forgotten."""
+    (project / "a.py").unlink()
+    touch(project / "c.py", "import dep_a\nimport missing_c\n")
+    assert _text(watcher.poll()) == [
+        f"# DELETED {(project / 'a.py').as_posix()}",
+        f"# CHECKED {(project / 'c.py').as_posix()}",
+        "! missing_c",
+    ]
+
+
+def test_poll_only_resolves_changed_files(
+    watcher: Watcher, project: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Removing the last import of a package reports it as extra.
+
+    Files that did not change are not resolved again.
+    """
+    resolved: list[Path] = []
+    resolve_file = Watcher._resolve_file
+    monkeypatch.setattr(
+        Watcher,
+        "_resolve_file",
+        staticmethod(
+            lambda registry, path, *args: (
+                resolved.append(path) or resolve_file(registry, path, *args)
+            )
+        ),
+    )
+    (project / "a.py").unlink()
+    assert _text(watcher.poll()) == [
+        f"# DELETED {(project / 'a.py').as_posix()}",
+        "+ dep_a",
+    ]
+    touch(project / "c.py", "import dep_a\n")
+    assert _text(watcher.poll()) == [f"# CHECKED {(project / 'c.py').as_posix()}"]
+    assert resolved == [project / "c.py"]
+
+
+def test_poll_config_changed(
+    watcher: Watcher, project: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Config changes re-resolve all files without parsing them again."""
+    monkeypatch.setattr(
+        "check_dependencies.watch._file_imports",
+        lambda path: pytest.fail(f"{path} parsed again"),
+    )
+    touch(
+        project.parent / "pyproject.toml",
+        '[project]\ndependencies = ["dep_a", "dep_b", "missing_b", "dep_c"]\n',
+    )
+    assert _text(watcher.poll()) == [
+        f"# CHECKED {(project / 'a.py').as_posix()}",
+        f"# CHECKED {(project / 'b.py').as_posix()}",
+        "+ dep_c",
+    ]
+
+
+def test_poll_include_changed(watcher: Watcher, project: Path) -> None:
+    """Edits of included config files are detected."""
+    (include := project.parent / "include.toml").write_text("", "utf-8")
+    touch(
+        project.parent / "pyproject.toml",
+        '[project]\ndependencies = ["dep_a", "dep_b"]\n'
+        '[tool.check-dependencies]\nincludes = ["include.toml"]\n',
+    )
+    assert "! missing_b" in _text(watcher.poll())
+    touch(include, '[tool.check-dependencies]\nknown-missing = ["missing_b"]\n')
+    assert "! missing_b" not in _text(watcher.poll())
+
+
+def test_poll_new_pyproject(watcher: Watcher, project: Path) -> None:
+    """A new pyproject.toml below the watched path moves files to a new project."""
+    (sub := project / "sub").mkdir()
+    touch(sub / "pyproject.toml", '[project]\ndependencies = ["dep_sub"]\n')
+    touch(sub / "d.py", "import dep_sub\n")
+    assert _text(watcher.poll())[-1] == f"# CHECKED {(sub / 'd.py').as_posix()}"
+
+
+def test_poll_removed_pyproject(watcher: Watcher, project: Path) -> None:
+    """Losing the pyproject.toml is reported until it is restored."""
+    content = (pyproject := project.parent / "pyproject.toml").read_text("utf-8")
+    pyproject.unlink()
+    assert _text(watcher.poll())[-1].startswith("!E ")
+    assert watcher.poll() == []
+    touch(pyproject, content)
+    assert _text(watcher.poll())[-1] == "! missing_b"
+
+
+def test_cli(project: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The CLI prints the outputs of every cycle until interrupted."""
+    cycles = iter([[], KeyboardInterrupt()])
+
+    def _poll(_self: Watcher) -> list[Output]:
+        result = next(cycles)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    monkeypatch.setattr(Watcher, "poll", _poll)
+    lines, exit_code = run(
+        [project], Path("pyproject.toml"), "--watch --watch-interval 0"
+    )
+    assert lines == ["! missing_b"]
+    assert exit_code == 2  # noqa: PLR2004